@@ -0,0 +1,240 @@
+"""
+Offline relevance evaluation for SearchEngine.
+
+Runs every query of a judged query file through SearchEngine in-process (no
+HTTP) once per configuration and reports P@k, recall@k, MAP and nDCG@k next
+to the latency of that configuration, so ranking changes can be compared on
+both quality and speed.
+
+Judged query file format (see benchmarks/judgments/rawg_top_games.json):
+    {"queries": [{"id": "...", "q": "...", "platform": null, "genre": null,
+                  "min_rating": null, "judgments": {"<game_id>": <grade>}}]}
+
+Configuration file format (optional, defaults to DEFAULT_CONFIGS):
+    [{"name": "...", "engine": {<SearchEngine kwargs>},
+      "search": {<search() kwargs, e.g. sort_by>}, "snapshot": "<path>"}]
+
+A configuration with "snapshot" ranks on that index snapshot (see
+data/index_snapshot.py) instead of the inverted_index collection.
+--snapshot adds SNAPSHOT_CONFIGS on the given file: exact scoring and the
+budgeted impact-ordered top-k (data/impact_index.py), which is only used
+for a page of a plain relevance query.
+
+Examples:
+    python benchmarks/evaluate.py benchmarks/judgments/rawg_top_games.json
+    python benchmarks/evaluate.py judged.json --configs configs.json --k 5 10 --output eval.json
+    python benchmarks/evaluate.py judged.json --snapshot data/index.snap
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'data'))
+
+from run_benchmarks import git_revision, latency_summary  # noqa: E402
+
+DEFAULT_CONFIGS = [
+    {'name': 'relevance', 'engine': {}, 'search': {'sort_by': 'relevance'}},
+    {'name': 'relevance_boosted', 'engine': {'boosts': {'popularity': 0.5, 'ratings': 0.25, 'freshness': 0.1}},
+     'search': {'sort_by': 'relevance'}},
+    {'name': 'rating', 'engine': {}, 'search': {'sort_by': 'rating'}},
+    {'name': 'release_date', 'engine': {}, 'search': {'sort_by': 'release_date'}}
+]
+
+# Added with --snapshot; a page of results, so the impact path applies
+SNAPSHOT_CONFIGS = [
+    {'name': 'snapshot', 'engine': {'impact_budget': 0},
+     'search': {'sort_by': 'relevance', 'page': 1, 'page_size': 100}},
+    {'name': 'snapshot_impact', 'engine': {'impact_budget': 64 * 1024},
+     'search': {'sort_by': 'relevance', 'page': 1, 'page_size': 100}}
+]
+
+
+def precision_at_k(ranked, grades, k):
+    """Fraction of the top k results that are relevant"""
+    if k <= 0:
+        return 0.0
+    return sum(1 for game_id in ranked[:k] if grades.get(game_id, 0) > 0) / k
+
+
+def recall_at_k(ranked, grades, k=None):
+    """Fraction of the relevant games found in the top k (or all) results"""
+    relevant = sum(1 for grade in grades.values() if grade > 0)
+    if relevant == 0:
+        return 0.0
+    top = ranked if k is None else ranked[:k]
+    return sum(1 for game_id in top if grades.get(game_id, 0) > 0) / relevant
+
+
+def average_precision(ranked, grades):
+    """Mean of the precision values at the rank of each relevant result"""
+    relevant = sum(1 for grade in grades.values() if grade > 0)
+    if relevant == 0:
+        return 0.0
+    hits = 0
+    total = 0.0
+    for rank, game_id in enumerate(ranked, start=1):
+        if grades.get(game_id, 0) > 0:
+            hits += 1
+            total += hits / rank
+    return total / relevant
+
+
+def ndcg_at_k(ranked, grades, k):
+    """Normalized discounted cumulative gain with graded judgments"""
+    def dcg(gains):
+        return sum((2 ** gain - 1) / math.log2(rank + 2) for rank, gain in enumerate(gains))
+
+    ideal = dcg(sorted(grades.values(), reverse=True)[:k])
+    if ideal == 0:
+        return 0.0
+    return dcg([grades.get(game_id, 0) for game_id in ranked[:k]]) / ideal
+
+
+def load_judged_queries(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    queries = []
+    for query in data['queries']:
+        queries.append({
+            'id': query.get('id', query['q']),
+            'q': query['q'],
+            'platform': query.get('platform'),
+            'genre': query.get('genre'),
+            'min_rating': query.get('min_rating'),
+            'grades': {int(game_id): grade for game_id, grade in query['judgments'].items()}
+        })
+    return queries
+
+
+async def evaluate_config(engine, queries, search_options, ks):
+    per_query = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        results = await engine.search(
+            query['q'], query['platform'], query['genre'], query['min_rating'], **search_options
+        )
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+        ranked = [result.id for result in results]
+        grades = query['grades']
+        metrics = {
+            'id': query['id'],
+            'hits': len(ranked),
+            'recall': recall_at_k(ranked, grades),
+            'average_precision': average_precision(ranked, grades)
+        }
+        for k in ks:
+            metrics[f'p@{k}'] = precision_at_k(ranked, grades, k)
+            metrics[f'recall@{k}'] = recall_at_k(ranked, grades, k)
+            metrics[f'ndcg@{k}'] = ndcg_at_k(ranked, grades, k)
+        per_query.append(metrics)
+
+    metric_names = [name for name in per_query[0] if name not in ('id', 'hits')] if per_query else []
+    summary = {
+        name: sum(metrics[name] for metrics in per_query) / len(per_query)
+        for name in metric_names
+    }
+    summary['map'] = summary.pop('average_precision', 0.0)
+    return summary, latency_summary(latencies), per_query
+
+
+def open_snapshot(path, database):
+    from index_snapshot import IndexSnapshot
+
+    snapshot = IndexSnapshot(path)
+    if snapshot.meta.get('catalog_version') != database.version:
+        print(f"Warning: {path} was exported from version {snapshot.meta.get('catalog_version')} "
+              f"of catalog {database.catalog}, evaluating version {database.version}")
+    return snapshot
+
+
+def print_table(results, ks):
+    columns = ['map', 'recall'] + [f'{name}@{k}' for k in ks for name in ('p', 'ndcg')]
+    header = f"{'config':<20}" + ''.join(f"{column:>10}" for column in columns)
+    header += f"{'p50 ms':>10}{'p95 ms':>10}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        row = f"{result['name']:<20}"
+        row += ''.join(f"{result['metrics'][column]:>10.4f}" for column in columns)
+        row += f"{result['latency']['p50_ms']:>10.2f}{result['latency']['p95_ms']:>10.2f}"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate SearchEngine ranking quality against judged queries')
+    parser.add_argument('judgments', help='Judged query file')
+    parser.add_argument('--configs', default=None, help='JSON file with configurations to compare')
+    parser.add_argument('--k', nargs='+', type=int, default=[5, 10], help='Cutoffs for P@k, recall@k and nDCG@k')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/')
+    parser.add_argument('--db-name', default='game_search_engine')
+    parser.add_argument('--catalog', default='default', help='Catalog to evaluate (see data/catalogs.py)')
+    parser.add_argument('--snapshot', default=None, help='Also evaluate SNAPSHOT_CONFIGS on this index snapshot')
+    parser.add_argument('--output', default=None, help='Write full results, including per-query metrics, as JSON')
+    args = parser.parse_args()
+
+    from api import SearchEngine
+    from catalogs import CatalogRegistry
+    from connection import get_connection
+
+    connection = get_connection(args.mongo_uri)
+    registry = CatalogRegistry(connection.database(args.db_name), connection.search_database(args.db_name))
+    database = registry.live(args.catalog)
+    if database is None:
+        sys.exit(f"Catalog {args.catalog} has not been published")
+    queries = load_judged_queries(args.judgments)
+
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        with open(args.configs, 'r', encoding='utf-8') as file:
+            configs = json.load(file)
+    if args.snapshot:
+        configs = configs + [dict(config, snapshot=args.snapshot) for config in SNAPSHOT_CONFIGS]
+
+    snapshots = {}
+    results = []
+    for config in configs:
+        path = config.get('snapshot')
+        if path and path not in snapshots:
+            snapshots[path] = open_snapshot(path, database)
+        engine = SearchEngine(database=database, snapshot=snapshots.get(path), **config.get('engine', {}))
+        # Warm up caches and connections so the first query isn't penalized
+        asyncio.run(evaluate_config(engine, queries[:1], config.get('search', {}), args.k))
+        metrics, latency, per_query = asyncio.run(
+            evaluate_config(engine, queries, config.get('search', {}), args.k)
+        )
+        results.append({
+            'name': config['name'],
+            'config': config,
+            'metrics': metrics,
+            'latency': latency,
+            'queries': per_query
+        })
+
+    for snapshot in snapshots.values():
+        snapshot.close()
+
+    print_table(results, args.k)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'git_revision': git_revision(),
+                'judgments': args.judgments,
+                'results': results
+            }, file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
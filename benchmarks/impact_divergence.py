@@ -0,0 +1,75 @@
+"""
+How far budgeted impact-ordered scoring diverges from exact scoring.
+
+Opens an index snapshot, samples term queries from its dictionary (or takes
+them from a judged query file) and, for every budget, compares the top k of
+ImpactScorer with exact float scoring: top-k overlap, nDCG@k with the exact
+scores as gains, the share of postings read and the mean latency of both.
+Use it to pick GAME_IMPACT_BUDGET_KB for the API.
+
+Examples:
+    python benchmarks/impact_divergence.py data/index.snap
+    python benchmarks/impact_divergence.py data/index.snap --budgets 4 16 64 --k 20
+    python benchmarks/impact_divergence.py data/index.snap --judgments benchmarks/judgments/rawg_top_games.json
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'data'))
+
+from run_benchmarks import git_revision  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare impact-ordered top-k scoring with exact scoring')
+    parser.add_argument('snapshot', help='Index snapshot exported by GameDataProcessor.export_snapshot')
+    parser.add_argument('--budgets', nargs='+', type=int, default=[4, 16, 64, 256],
+                        help='Per-query posting budgets to compare, in KB')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200, help='Number of sampled queries')
+    parser.add_argument('--judgments', default=None,
+                        help='Take queries from a judged query file instead of sampling')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help='Write full results, including per-query metrics, as JSON')
+    args = parser.parse_args()
+
+    from index_snapshot import IndexSnapshot
+    from impact_index import ranking_divergence, sample_queries
+
+    snapshot = IndexSnapshot(args.snapshot)
+    if args.judgments:
+        with open(args.judgments, 'r', encoding='utf-8') as file:
+            queries = [query['q'].lower().split() for query in json.load(file)['queries']]
+    else:
+        queries = sample_queries(snapshot, args.queries, args.seed)
+
+    results = []
+    header = f"{'budget KB':>10}{'overlap@' + str(args.k):>12}{'ndcg@' + str(args.k):>10}{'read':>10}" \
+             f"{'exact ms':>10}{'impact ms':>10}"
+    print(header)
+    print('-' * len(header))
+    for budget in args.budgets:
+        summary, per_query = ranking_divergence(snapshot, queries, args.k, budget * 1024)
+        results.append({'budget_kb': budget, 'summary': summary, 'queries': per_query})
+        print(f"{budget:>10}{summary['overlap']:>12.4f}{summary['ndcg']:>10.4f}{summary['read_fraction']:>10.2%}"
+              f"{summary['exact_ms']:>10.3f}{summary['impact_ms']:>10.3f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'git_revision': git_revision(),
+                'snapshot': args.snapshot,
+                'k': args.k,
+                'results': results
+            }, file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Replay a sampled query log (data/query_log.py) against one or two builds.
+
+Each target gets every logged /search/ request, in log order, at a fixed
+rate (--rate, queries per second; 0 replays as fast as --concurrency
+allows) with at most --concurrency requests in flight. Requests are sent
+on schedule whether or not earlier ones have returned, and latency counts
+from the scheduled time, so a build that falls behind shows it in its tail
+latency instead of quietly slowing the replay down.
+
+Targets:
+    http://host:port         a running API; start it with GAME_SEARCH_CLIENT_RATE=0,
+                             or replayed traffic is rate limited as one client
+    catalog:<name>           SearchEngine in-process on the live version of a catalog
+                             (and its index snapshot, see GAME_SEARCH_SNAPSHOT)
+    snapshot:<path>          SearchEngine in-process on an index snapshot file
+
+Per target, the report has throughput, latency percentiles, errors and hits.
+With two targets it also compares their results query by query: identical,
+same games in another order, or different (with the overlap of the top 10).
+
+Examples:
+    python benchmarks/replay.py queries.log http://localhost:8000
+    python benchmarks/replay.py queries.log http://localhost:8000 http://localhost:8001 --rate 50 --concurrency 16
+    python benchmarks/replay.py queries.log snapshot:old.snap snapshot:data/index.snap --output replay.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'data'))
+
+from run_benchmarks import git_revision, latency_summary  # noqa: E402
+from query_log import read_query_log  # noqa: E402
+
+# Logged fields that are /search/ parameters
+SEARCH_PARAMS = ('q', 'platform', 'genre', 'min_rating', 'sort_by', 'page', 'page_size', 'format', 'catalog')
+
+# Results compared for the top-k overlap
+DIFF_TOP_K = 10
+
+
+class HttpTarget:
+    def __init__(self, url, timeout):
+        self.name = url
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def search(self, record):
+        """(game ids, status) of one logged search"""
+        params = {name: record[name] for name in SEARCH_PARAMS if record.get(name) is not None}
+        url = f"{self.url}/search/?{urllib.parse.urlencode(params)}"
+        try:
+            with urllib.request.urlopen(url, timeout=self.timeout) as response:
+                body = response.read().decode('utf-8')
+        except urllib.error.HTTPError as e:
+            return None, e.code
+        if params.get('format') == 'ndjson':
+            games = [json.loads(line) for line in body.splitlines() if line]
+            if games and games[-1].get('truncated'):
+                # A stream cut short or shed after its headers were sent
+                return [game['id'] for game in games[:-1]], 'truncated'
+        else:
+            games = json.loads(body)
+        return [game['id'] for game in games], 200
+
+
+class EngineTarget:
+    """SearchEngine in this process; the logged catalog is ignored"""
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+
+    def search(self, record):
+        results = self.engine.run_search(
+            record['q'], record.get('platform'), record.get('genre'), record.get('min_rating'),
+            record.get('sort_by', 'relevance'), record.get('page'), record.get('page_size', 20)
+        )
+        return [result.id for result in results], 200
+
+
+def open_target(spec, args):
+    if spec.startswith(('http://', 'https://')):
+        return HttpTarget(spec, args.timeout)
+
+    import api
+    from catalogs import CatalogRegistry
+    from connection import get_connection
+    from index_snapshot import IndexSnapshot
+
+    connection = get_connection(args.mongo_uri)
+    registry = CatalogRegistry(connection.database(args.db_name), connection.search_database(args.db_name))
+    kind, _, value = spec.partition(':')
+    if kind == 'catalog':
+        namespace = registry.live(value)
+        if namespace is None:
+            sys.exit(f"Catalog {value} has not been published")
+        return EngineTarget(spec, api.open_catalog(namespace))
+    if kind == 'snapshot':
+        snapshot = IndexSnapshot(value)
+        catalog = snapshot.meta.get('catalog') or args.catalog
+        # Doc ids are those of the catalog version the snapshot was exported from
+        if 'catalog_version' in snapshot.meta:
+            namespace = registry.namespace(catalog, snapshot.meta['catalog_version'])
+        else:
+            namespace = registry.live(catalog)
+        return EngineTarget(spec, api.SearchEngine(database=namespace, snapshot=snapshot))
+    sys.exit(f"Unknown target {spec!r}; expected a URL, catalog:<name> or snapshot:<path>")
+
+
+def replay(target, records, rate, concurrency):
+    """
+    Send every record to `target` on schedule. Returns per-record
+    (game ids or None, status, latency ms) and the wall time of the run.
+    """
+    outcomes = [None] * len(records)
+    slots = threading.Semaphore(concurrency)
+
+    def run(i, scheduled):
+        try:
+            ids, status = target.search(records[i])
+        except Exception as e:
+            ids, status = None, type(e).__name__
+        outcomes[i] = (ids, status, (time.perf_counter() - scheduled) * 1000.0)
+        slots.release()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(len(records)):
+            scheduled = started + i / rate if rate else time.perf_counter()
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # Waiting for a free slot counts toward the latency of the late request
+            slots.acquire()
+            pool.submit(run, i, scheduled)
+    return outcomes, time.perf_counter() - started
+
+
+def summarize(outcomes, wall_s):
+    latencies = [latency for ids, status, latency in outcomes if status == 200]
+    errors = {}
+    for ids, status, latency in outcomes:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    hits = [len(ids) for ids, status, latency in outcomes if status == 200]
+    return {
+        'requests': len(outcomes),
+        'wall_s': wall_s,
+        'throughput_qps': len(latencies) / wall_s if wall_s > 0 else None,
+        'latency': latency_summary(latencies),
+        'errors': errors,
+        'avg_hits': sum(hits) / len(hits) if hits else 0
+    }
+
+
+def diff_results(records, baseline, candidate, k=DIFF_TOP_K):
+    """Query-by-query comparison of two targets' results"""
+    counts = {'identical': 0, 'reordered': 0, 'different': 0, 'failed': 0}
+    overlaps = []
+    changed = []
+    for record, (ids_a, _, _), (ids_b, _, _) in zip(records, baseline, candidate):
+        if ids_a is None or ids_b is None:
+            counts['failed'] += 1
+            continue
+        if ids_a == ids_b:
+            counts['identical'] += 1
+        elif sorted(ids_a) == sorted(ids_b):
+            counts['reordered'] += 1
+        else:
+            counts['different'] += 1
+        top_a, top_b = set(ids_a[:k]), set(ids_b[:k])
+        overlap = len(top_a & top_b) / len(top_a | top_b) if top_a | top_b else 1.0
+        overlaps.append(overlap)
+        if ids_a != ids_b:
+            changed.append({'q': record['q'], 'overlap': overlap, 'hits': [len(ids_a), len(ids_b)],
+                            'top': [ids_a[:k], ids_b[:k]]})
+    changed.sort(key=lambda entry: entry['overlap'])
+    return dict(counts, mean_overlap=sum(overlaps) / len(overlaps) if overlaps else None,
+                overlap_k=k, most_changed=changed[:20])
+
+
+def print_report(summaries, diff):
+    header = f"{'target':<40}{'qps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}"
+    print(header)
+    print('-' * len(header))
+    for name, summary in summaries:
+        latency = summary['latency']
+        row = f"{name[:39]:<40}{summary['throughput_qps'] or 0:>10.1f}"
+        row += ''.join(f"{latency[key] or 0:>10.2f}" for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms'))
+        row += f"{sum(summary['errors'].values()):>8}"
+        print(row)
+    if diff:
+        print(f"\nResults: {diff['identical']} identical, {diff['reordered']} reordered, "
+              f"{diff['different']} different, {diff['failed']} failed; "
+              f"mean top-{diff['overlap_k']} overlap {diff['mean_overlap'] or 0:.3f}")
+        for entry in diff['most_changed'][:5]:
+            print(f"  {entry['overlap']:.2f}  {entry['q']!r}  hits {entry['hits'][0]} -> {entry['hits'][1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a sampled query log against one or two builds')
+    parser.add_argument('log', help='Query log written by the API (GAME_QUERY_LOG)')
+    parser.add_argument('targets', nargs='+', help='One or two targets: URL, catalog:<name> or snapshot:<path>')
+    parser.add_argument('--rate', type=float, default=0, help='Queries per second (0: as fast as possible)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Most requests in flight')
+    parser.add_argument('--limit', type=int, default=None, help='Replay only the first N logged queries')
+    parser.add_argument('--include-errors', action='store_true',
+                        help='Also replay requests that failed when they were logged (e.g. shed with 503)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='HTTP timeout per request, seconds')
+    parser.add_argument('--mongo-uri', default=None, help='For in-process targets (default GAME_MONGO_URI)')
+    parser.add_argument('--db-name', default=None, help='For in-process targets (default GAME_MONGO_DB)')
+    parser.add_argument('--catalog', default='default',
+                        help='Catalog of a snapshot:<path> target whose snapshot does not record one')
+    parser.add_argument('--output', default=None, help='Write the full report as JSON')
+    args = parser.parse_args()
+    if len(args.targets) > 2:
+        parser.error('at most two targets')
+
+    records = [
+        record for record in read_query_log(args.log)
+        if args.include_errors or record.get('status', 200) == 200
+    ][:args.limit]
+    if not records:
+        sys.exit(f"No queries to replay in {args.log}")
+    logged = [record['latency_ms'] for record in records if 'latency_ms' in record]
+    print(f"Replaying {len(records)} queries (logged p50 {latency_summary(logged)['p50_ms'] or 0:.2f} ms)")
+
+    summaries = []
+    outcomes = []
+    for spec in args.targets:
+        target = open_target(spec, args)
+        # Warm up caches and connections so the first queries aren't penalized
+        replay(target, records[:min(len(records), args.concurrency)], 0, args.concurrency)
+        target_outcomes, wall_s = replay(target, records, args.rate, args.concurrency)
+        summaries.append((target.name, summarize(target_outcomes, wall_s)))
+        outcomes.append(target_outcomes)
+
+    diff = diff_results(records, *outcomes) if len(outcomes) == 2 else None
+    print_report(summaries, diff)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({
+                'timestamp': datetime.now().isoformat(),
+                'git_revision': git_revision(),
+                'log': args.log,
+                'queries': len(records),
+                'rate': args.rate,
+                'concurrency': args.concurrency,
+                'targets': [dict(summary, name=name) for name, summary in summaries],
+                'diff': diff,
+                'logged_latency': latency_summary(logged)
+            }, file, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
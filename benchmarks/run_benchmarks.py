@@ -0,0 +1,310 @@
+"""
+Benchmark harness for the ingest pipeline (data/mongo.py) and the search
+engine (data/api.py).
+
+Each run generates a deterministic synthetic corpus, ingests it into a
+dedicated benchmark database, and appends one JSON record per corpus size to
+the results file so numbers can be compared across commits.
+
+Examples:
+    python benchmarks/run_benchmarks.py --sizes 1k
+    python benchmarks/run_benchmarks.py --sizes 1k 100k --queries 2000
+    python benchmarks/run_benchmarks.py --backend mongomock --sizes 1k
+    python benchmarks/run_benchmarks.py --sizes 1k --api-url http://localhost:8000
+
+With --api-url, start the API with GAME_SEARCH_CLIENT_RATE=0 to measure it
+without the per-client rate limit; otherwise queries that hit it are
+retried and reported as search.rate_limited.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'data'))
+
+from synthetic import write_corpus, generate_queries  # noqa: E402
+
+SIZES = {
+    '1k': 1000,
+    '100k': 100000,
+    '1m': 1000000
+}
+
+BENCH_DB_NAME = 'game_search_engine_bench'
+
+# Client id HTTP benchmarks identify as (the API rate limits per client id)
+BENCH_CLIENT_ID = 'benchmark'
+
+# 429 responses retried per query before the benchmark gives up
+MAX_RATE_LIMIT_RETRIES = 5
+
+
+def install_mongomock():
+    """
+    Route every MongoClient (data/connection.py) to one shared in-memory
+    mongomock client. Must run before the data modules are imported.
+    """
+    import mongomock
+    import pymongo
+
+    shared_client = mongomock.MongoClient()
+    pymongo.MongoClient = lambda *args, **kwargs: shared_client
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def latency_summary(samples_ms):
+    return {
+        'count': len(samples_ms),
+        'mean_ms': sum(samples_ms) / len(samples_ms) if samples_ms else None,
+        'p50_ms': percentile(samples_ms, 50),
+        'p95_ms': percentile(samples_ms, 95),
+        'p99_ms': percentile(samples_ms, 99),
+        'max_ms': max(samples_ms) if samples_ms else None
+    }
+
+
+def collection_size(namespace, name):
+    """
+    Size of a collection of a catalog version (a CatalogNamespace).
+    `data_bytes` is the uncompressed BSON size, which is what has to fit in
+    the WiredTiger cache; `storage_bytes` and `index_bytes` are what the
+    collection takes on disk.
+    """
+    database = namespace.database
+    if type(database).__module__.startswith('mongomock'):
+        # mongomock doesn't implement collStats, so measure the BSON encoding
+        # of every document instead
+        import bson
+        documents = 0
+        data_bytes = 0
+        for doc in namespace[name].find():
+            documents += 1
+            data_bytes += len(bson.encode(doc))
+        return {
+            'documents': documents,
+            'data_bytes': data_bytes,
+            'storage_bytes': None,
+            'index_bytes': None
+        }
+
+    stats = database.command('collStats', namespace.prefix + name)
+    return {
+        'documents': stats.get('count', 0),
+        'data_bytes': stats.get('size', 0),
+        'storage_bytes': stats.get('storageSize', 0),
+        'index_bytes': stats.get('totalIndexSize', 0)
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss /= 1024
+    return rss / 1024.0
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def bench_ingest(processor, corpus_path, game_count):
+    """Run process_json_file, timing update_tf_idf_scores separately"""
+    timings = {}
+    update_tf_idf_scores = processor.update_tf_idf_scores
+
+    def timed_update_tf_idf_scores():
+        start = time.perf_counter()
+        update_tf_idf_scores()
+        timings['update_tf_idf_scores_s'] = time.perf_counter() - start
+
+    processor.update_tf_idf_scores = timed_update_tf_idf_scores
+
+    start = time.perf_counter()
+    published = processor.process_json_file(corpus_path, resume=False)
+    total = time.perf_counter() - start
+
+    processor.update_tf_idf_scores = update_tf_idf_scores
+    if not published:
+        raise RuntimeError(f"Ingest of {corpus_path} failed")
+
+    tf_idf_time = timings.get('update_tf_idf_scores_s', 0.0)
+    ingest_time = total - tf_idf_time
+    ingested = processor.games_collection.count_documents({})
+    return {
+        'games_requested': game_count,
+        'games_ingested': ingested,
+        'total_s': total,
+        'ingest_s': ingest_time,
+        'update_tf_idf_scores_s': tf_idf_time,
+        'ingest_games_per_s': ingested / ingest_time if ingest_time > 0 else None
+    }
+
+
+async def run_in_process_queries(engine, queries):
+    samples = []
+    hits = 0
+    for query in queries:
+        start = time.perf_counter()
+        results = await engine.search(
+            query['q'], query['platform'], query['genre'], query['min_rating'], query['sort_by']
+        )
+        samples.append((time.perf_counter() - start) * 1000.0)
+        hits += len(results)
+    return samples, hits
+
+
+def run_http_queries(api_url, queries, stats=None):
+    """
+    Time every query against a running API. The API rate limits each
+    client (GAME_SEARCH_CLIENT_RATE; start it with 0 to benchmark without
+    limits): a 429 is retried after its Retry-After, up to MAX_RATE_LIMIT_RETRIES
+    times, and counted in `stats`. Only the successful attempt is timed.
+    """
+    stats = stats if stats is not None else {}
+    samples = []
+    hits = 0
+    for query in queries:
+        params = {k: v for k, v in query.items() if v is not None}
+        url = f"{api_url.rstrip('/')}/search/?{urllib.parse.urlencode(params)}"
+        request = urllib.request.Request(url, headers={'X-Client-Id': BENCH_CLIENT_ID})
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    body = response.read()
+            except urllib.error.HTTPError as e:
+                if e.code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                stats['rate_limited'] = stats.get('rate_limited', 0) + 1
+                time.sleep(float(e.headers.get('Retry-After') or 1))
+                continue
+            samples.append((time.perf_counter() - start) * 1000.0)
+            hits += len(json.loads(body))
+            break
+    return samples, hits
+
+
+def bench_queries(processor, queries, warmup, api_url=None):
+    """Measure /search/ latency either over HTTP or against SearchEngine in-process"""
+    rate_limits = {}
+    if api_url:
+        run_http_queries(api_url, queries[:warmup], rate_limits)
+        samples, hits = run_http_queries(api_url, queries[warmup:], rate_limits)
+        mode = 'http'
+    else:
+        from api import SearchEngine
+        engine = SearchEngine(database=processor.db)
+        asyncio.run(run_in_process_queries(engine, queries[:warmup]))
+        samples, hits = asyncio.run(run_in_process_queries(engine, queries[warmup:]))
+        mode = 'in_process'
+
+    summary = latency_summary(samples)
+    summary['mode'] = mode
+    summary['avg_hits'] = hits / len(samples) if samples else 0
+    summary['rate_limited'] = rate_limits.get('rate_limited', 0)
+    return summary
+
+
+def run_size(label, game_count, args):
+    from mongo import GameDataProcessor
+
+    processor = GameDataProcessor(mongo_uri=args.mongo_uri, db_name=args.db_name)
+    processor.lazy_descriptions = args.lazy_descriptions
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_path = os.path.join(tmp_dir, f"games_{label}.json")
+        print(f"Generating {game_count} synthetic games...")
+        write_corpus(corpus_path, game_count, seed=args.seed)
+        corpus_bytes = os.path.getsize(corpus_path)
+
+        print(f"Ingesting {label} corpus...")
+        ingest = bench_ingest(processor, corpus_path, game_count)
+
+    index = {
+        'games': collection_size(processor.db, 'games'),
+        'inverted_index': collection_size(processor.db, 'inverted_index')
+    }
+
+    print(f"Running {args.queries} queries ({args.warmup} warmup)...")
+    queries = generate_queries(args.queries + args.warmup, seed=args.seed)
+    search = bench_queries(processor, queries, args.warmup, args.api_url)
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'backend': args.backend,
+        'size': label,
+        'seed': args.seed,
+        'lazy_descriptions': args.lazy_descriptions,
+        'corpus_bytes': corpus_bytes,
+        'ingest': ingest,
+        'index': index,
+        'search': search,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ingest, TF-IDF update and search latency')
+    parser.add_argument('--sizes', nargs='+', default=['1k'], choices=sorted(SIZES),
+                        help='Corpus sizes to benchmark')
+    parser.add_argument('--backend', default='mongod', choices=['mongod', 'mongomock'],
+                        help='Run against a local mongod or an in-memory mongomock stand-in')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/')
+    parser.add_argument('--db-name', default=BENCH_DB_NAME,
+                        help='Database to ingest into; it is dropped and rebuilt for every size')
+    parser.add_argument('--queries', type=int, default=500, help='Number of timed queries')
+    parser.add_argument('--warmup', type=int, default=50, help='Number of untimed warmup queries')
+    parser.add_argument('--api-url', default=None,
+                        help="Query a running API over HTTP instead of SearchEngine in-process "
+                             "(the API must be serving the benchmark database)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--lazy-descriptions', action='store_true',
+                        help='Ingest without stored/indexed descriptions (generated at response time)')
+    parser.add_argument('--output', default=os.path.join(BENCH_DIR, 'results.jsonl'),
+                        help='JSON-lines file that results are appended to')
+    args = parser.parse_args()
+
+    if args.backend == 'mongomock':
+        install_mongomock()
+
+    for label in args.sizes:
+        print(f"\n=== Benchmarking {label} ===")
+        result = run_size(label, SIZES[label], args)
+        print(json.dumps(result, indent=2))
+        with open(args.output, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(result) + '\n')
+
+    print(f"\nResults appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
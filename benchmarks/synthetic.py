@@ -0,0 +1,234 @@
+import json
+import random
+from datetime import date, timedelta
+
+# Vocabulary used to build RAWG-shaped games. Lists are ordered roughly by
+# popularity so that a Zipf-like draw gives realistic term skew.
+GENRES = [
+    'Action', 'Indie', 'Adventure', 'RPG', 'Strategy', 'Shooter', 'Casual',
+    'Simulation', 'Puzzle', 'Arcade', 'Platformer', 'Racing',
+    'Massively Multiplayer', 'Sports', 'Fighting', 'Family', 'Board Games',
+    'Educational', 'Card'
+]
+
+TAGS = [
+    'Singleplayer', 'Steam Achievements', 'Multiplayer', 'Full controller support',
+    'Atmospheric', 'Great Soundtrack', 'RPG', 'Co-op', 'Open World', 'Story Rich',
+    'First-Person', 'Third Person', 'Sci-fi', 'Fantasy', 'Horror', 'Survival',
+    'Sandbox', 'Exploration', 'Pixel Graphics', 'Difficult', 'Funny', 'Violent',
+    'Stealth', 'Crafting', 'Roguelike', 'Turn-Based', 'Space', 'Zombies',
+    'Post-apocalyptic', 'Female Protagonist', 'Local Multiplayer', 'Online Co-Op',
+    'Retro', 'Cyberpunk', 'Medieval', 'Dark Souls', 'Metroidvania', 'Tactical',
+    'Anime', 'Physics'
+]
+
+PLATFORMS = [
+    (4, 'PC', 'pc'), (187, 'PlayStation 5', 'playstation5'),
+    (18, 'PlayStation 4', 'playstation4'), (1, 'Xbox One', 'xbox-one'),
+    (186, 'Xbox Series S/X', 'xbox-series-x'), (7, 'Nintendo Switch', 'nintendo-switch'),
+    (3, 'iOS', 'ios'), (21, 'Android', 'android'), (5, 'macOS', 'macos'),
+    (6, 'Linux', 'linux'), (16, 'PlayStation 3', 'playstation3'),
+    (14, 'Xbox 360', 'xbox360')
+]
+
+PARENT_PLATFORMS = {
+    'pc': (1, 'PC', 'pc'), 'playstation5': (2, 'PlayStation', 'playstation'),
+    'playstation4': (2, 'PlayStation', 'playstation'),
+    'playstation3': (2, 'PlayStation', 'playstation'),
+    'xbox-one': (3, 'Xbox', 'xbox'), 'xbox-series-x': (3, 'Xbox', 'xbox'),
+    'xbox360': (3, 'Xbox', 'xbox'), 'nintendo-switch': (7, 'Nintendo', 'nintendo'),
+    'ios': (4, 'iOS', 'ios'), 'android': (8, 'Android', 'android'),
+    'macos': (5, 'Apple Macintosh', 'mac'), 'linux': (6, 'Linux', 'linux')
+}
+
+STORES = [
+    (1, 'Steam', 'steam', 'store.steampowered.com'),
+    (3, 'PlayStation Store', 'playstation-store', 'store.playstation.com'),
+    (2, 'Xbox Store', 'xbox-store', 'microsoft.com'),
+    (6, 'Nintendo Store', 'nintendo', 'nintendo.com'),
+    (4, 'App Store', 'apple-appstore', 'apps.apple.com'),
+    (8, 'Google Play', 'google-play', 'play.google.com'),
+    (5, 'GOG', 'gog', 'gog.com'), (11, 'Epic Games', 'epic-games', 'epicgames.com')
+]
+
+ESRB = [(1, 'Everyone', 'everyone'), (2, 'Everyone 10+', 'everyone-10-plus'),
+        (3, 'Teen', 'teen'), (4, 'Mature', 'mature')]
+
+TITLE_WORDS = [
+    'legend', 'dark', 'souls', 'witcher', 'hunt', 'star', 'wars', 'shadow',
+    'dragon', 'knight', 'city', 'war', 'space', 'dead', 'fall', 'rise', 'lost',
+    'kingdom', 'quest', 'hero', 'final', 'fantasy', 'tales', 'empire', 'night',
+    'blood', 'fire', 'ice', 'storm', 'iron', 'steel', 'ghost', 'zombie', 'racer',
+    'drift', 'galaxy', 'planet', 'island', 'escape', 'dungeon', 'castle', 'tower',
+    'battle', 'arena', 'chronicles', 'saga', 'origins', 'revenge', 'alien',
+    'robot', 'ninja', 'pirate', 'wild', 'frontier', 'machine', 'mystery',
+    'forest', 'ocean', 'sky', 'crown', 'sword', 'magic', 'spirit', 'dream'
+]
+
+RATING_TITLES = [(5, 'exceptional'), (4, 'recommended'), (3, 'meh'), (1, 'skip')]
+
+REQUIREMENTS = (
+    "Minimum:\nOS: Windows 10 64-bit\nProcessor: Intel Core i5-4460 or AMD FX-6300\n"
+    "Memory: 8 GB RAM\nGraphics: NVIDIA GeForce GTX 960 2GB or AMD Radeon R7 370 2GB\n"
+    "DirectX: Version 11\nStorage: 50 GB available space"
+)
+
+
+def zipf_choice(rng, items, s=1.1):
+    """Pick an item with probability proportional to 1 / rank^s"""
+    weights = [1.0 / ((rank + 1) ** s) for rank in range(len(items))]
+    return rng.choices(items, weights=weights, k=1)[0]
+
+
+def zipf_sample(rng, items, k, s=1.1):
+    """Pick k distinct items with Zipf-like skew"""
+    picked = []
+    k = min(k, len(items))
+    while len(picked) < k:
+        item = zipf_choice(rng, items, s)
+        if item not in picked:
+            picked.append(item)
+    return picked
+
+
+def make_game(rng, game_id):
+    """Build one game dict shaped like a RAWG /games result"""
+    title_words = [zipf_choice(rng, TITLE_WORDS, 0.8) for _ in range(rng.randint(1, 4))]
+    name = ' '.join(word.capitalize() for word in title_words)
+    if rng.random() < 0.15:
+        name += f" {rng.randint(2, 5)}"
+    slug = f"{'-'.join(title_words)}-{game_id}"
+
+    released = date(1990, 1, 1) + timedelta(days=rng.randint(0, 12500))
+    rating = round(rng.uniform(0, 5), 2) if rng.random() < 0.8 else 0
+    ratings_count = int(rng.paretovariate(1.2)) - 1
+    added = ratings_count * rng.randint(2, 8)
+
+    platforms = zipf_sample(rng, PLATFORMS, rng.randint(1, 5))
+    parent_platforms = []
+    for _, _, platform_slug in platforms:
+        parent = PARENT_PLATFORMS[platform_slug]
+        if parent not in parent_platforms:
+            parent_platforms.append(parent)
+
+    return {
+        'id': game_id,
+        'slug': slug,
+        'name': name,
+        'released': released.strftime('%Y-%m-%d'),
+        'tba': False,
+        'background_image': f"https://media.rawg.io/media/games/{game_id % 997:03d}/{slug}.jpg",
+        'rating': rating,
+        'rating_top': 5 if rating >= 3.5 else 4,
+        'ratings': [
+            {'id': rating_id, 'title': title, 'count': rng.randint(0, 5000),
+             'percent': round(rng.uniform(0, 100), 2)}
+            for rating_id, title in RATING_TITLES
+        ],
+        'ratings_count': ratings_count,
+        'reviews_text_count': rng.randint(0, 50),
+        'added': added,
+        'added_by_status': {
+            'yet': added // 20, 'owned': added // 2, 'beaten': added // 5,
+            'toplay': added // 30, 'dropped': added // 10, 'playing': added // 40
+        },
+        'metacritic': rng.randint(40, 97) if rng.random() < 0.3 else None,
+        'playtime': rng.randint(0, 120),
+        'suggestions_count': rng.randint(0, 800),
+        'updated': f"{released.isoformat()}T12:00:00",
+        'reviews_count': ratings_count,
+        'saturated_color': '0f0f0f',
+        'dominant_color': '0f0f0f',
+        'platforms': [
+            {
+                'platform': {'id': platform_id, 'name': platform_name, 'slug': platform_slug},
+                'released_at': released.strftime('%Y-%m-%d'),
+                'requirements_en': (
+                    {'minimum': REQUIREMENTS, 'recommended': REQUIREMENTS}
+                    if platform_slug == 'pc' else None
+                )
+            }
+            for platform_id, platform_name, platform_slug in platforms
+        ],
+        'parent_platforms': [
+            {'platform': {'id': parent_id, 'name': parent_name, 'slug': parent_slug}}
+            for parent_id, parent_name, parent_slug in parent_platforms
+        ],
+        'genres': [
+            {'id': GENRES.index(genre) + 1, 'name': genre, 'slug': genre.lower().replace(' ', '-'),
+             'games_count': 10000, 'image_background': ''}
+            for genre in zipf_sample(rng, GENRES, rng.randint(1, 3))
+        ],
+        'stores': [
+            {'id': game_id * 10 + store_id,
+             'store': {'id': store_id, 'name': store_name, 'slug': store_slug,
+                       'domain': domain, 'games_count': 50000, 'image_background': ''}}
+            for store_id, store_name, store_slug, domain in zipf_sample(rng, STORES, rng.randint(1, 3))
+        ],
+        'tags': [
+            {'id': TAGS.index(tag) + 1, 'name': tag, 'slug': tag.lower().replace(' ', '-'),
+             'language': 'eng', 'games_count': 20000, 'image_background': ''}
+            for tag in zipf_sample(rng, TAGS, rng.randint(0, 12))
+        ],
+        'esrb_rating': (
+            dict(zip(('id', 'name', 'slug'), rng.choice(ESRB))) if rng.random() < 0.5 else None
+        ),
+        'short_screenshots': [
+            {'id': game_id * 10 + shot, 'image': f"https://media.rawg.io/media/screenshots/{slug}-{shot}.jpg"}
+            for shot in range(rng.randint(1, 7))
+        ]
+    }
+
+
+def generate_games(count, seed=42):
+    """Yield `count` synthetic games; the same seed always yields the same corpus"""
+    rng = random.Random(seed)
+    # RAWG ids are sparse, so leave gaps between consecutive games
+    game_id = 0
+    for _ in range(count):
+        game_id += rng.randint(1, 40)
+        yield make_game(rng, game_id)
+
+
+def write_corpus(path, count, seed=42):
+    """Write a synthetic corpus as a JSON array, the format process_json_file expects"""
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('[')
+        for i, game in enumerate(generate_games(count, seed)):
+            if i:
+                file.write(',')
+            json.dump(game, file)
+        file.write(']')
+
+
+def generate_queries(count, seed=7):
+    """
+    Build a realistic query mix: mostly short title lookups, some genre/tag
+    browsing, a few multi-word and filtered queries
+    """
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        roll = rng.random()
+        query = {'platform': None, 'genre': None, 'min_rating': None, 'sort_by': 'relevance'}
+        if roll < 0.5:
+            # Title lookup, one or two words
+            words = [zipf_choice(rng, TITLE_WORDS, 0.8) for _ in range(rng.randint(1, 2))]
+            query['q'] = ' '.join(words)
+        elif roll < 0.75:
+            # Genre/tag browsing
+            query['q'] = zipf_choice(rng, GENRES + TAGS).lower()
+        elif roll < 0.9:
+            # Longer free-text query
+            words = [zipf_choice(rng, TITLE_WORDS, 0.8) for _ in range(3)]
+            words.append(zipf_choice(rng, GENRES).lower())
+            query['q'] = ' '.join(words)
+        else:
+            # Filtered and sorted query
+            query['q'] = zipf_choice(rng, TITLE_WORDS, 0.8)
+            query['platform'] = zipf_choice(rng, PLATFORMS)[1]
+            query['genre'] = zipf_choice(rng, GENRES)
+            query['min_rating'] = rng.choice([None, 3.0, 4.0])
+            query['sort_by'] = rng.choice(['relevance', 'rating', 'release_date'])
+        queries.append(query)
+    return queries
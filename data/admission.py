@@ -0,0 +1,267 @@
+"""
+Admission control for the search endpoints.
+
+- RateLimiter: a token bucket per client, so one noisy client is throttled
+  (429) without slowing everyone else down.
+- AdmissionController: a bounded number of searches run at once and a
+  bounded queue waits for a slot. When the queue is full, or a request has
+  waited too long, the request is shed with a 503. Latency then stays close
+  to the cost of one search instead of growing with the backlog.
+- SingleFlight: identical searches that arrive while one is running wait
+  for its result instead of running again, so load follows the number of
+  distinct queries rather than the number of requests.
+- Deadline: the time budget of one request. MongoDB operations get the
+  time that is left as `maxTimeMS`, so the server abandons them instead of
+  finishing work nobody will read. Searches that run out of budget return
+  what they have and record why (see SearchEngine in api.py).
+
+Each of them keeps counters that /metrics/ reports.
+"""
+import asyncio
+import threading
+import time
+from collections import Counter
+
+from caching import LRUCache
+
+
+class Overloaded(Exception):
+    def __init__(self, reason, retry_after=1):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate        # tokens added per second
+        self.burst = burst      # bucket size
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, cost=1):
+        """Take `cost` tokens if available; otherwise seconds until they will be"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token bucket per client key. Buckets live in an LRU cache, so memory is
+    bounded by `max_clients`; an evicted client starts again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = LRUCache(max_clients)
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def check(self, client, cost=1):
+        """Raises Overloaded when `client` is over its rate"""
+        if not self.enabled:
+            return
+        # A request costing more than the bucket holds (a large batch) takes a full bucket
+        cost = min(cost, self.burst)
+        with self._lock:
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self.buckets.put(client, bucket)
+            wait = bucket.take(cost)
+            if wait:
+                self.limited += 1
+                raise Overloaded('rate_limited', retry_after=max(1, round(wait)))
+            self.allowed += 1
+
+    def stats(self):
+        return {
+            'rate': self.rate,
+            'burst': self.burst,
+            'clients': len(self.buckets),
+            'allowed': self.allowed,
+            'limited': self.limited
+        }
+
+
+class AdmissionController:
+    """
+    At most `max_in_flight` requests hold a slot; up to `max_queued` more
+    wait for one, each for at most `queue_timeout` seconds. A
+    `max_in_flight` of 0 admits everything.
+    """
+
+    def __init__(self, max_in_flight, max_queued, queue_timeout):
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_in_flight = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.shed = Counter()
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    async def acquire(self):
+        """Wait for a slot; raises Overloaded if the request is shed"""
+        if self._slots is None:
+            self.admitted += 1
+            return
+        started = time.monotonic()
+        if not self._slots.locked():
+            # A slot is free; acquiring it does not yield
+            await self._slots.acquire()
+        elif self.queued >= self.max_queued:
+            self.shed['queue_full'] += 1
+            raise Overloaded('queue_full')
+        else:
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.shed['queue_timeout'] += 1
+                raise Overloaded('queue_timeout')
+            finally:
+                self.queued -= 1
+
+        waited = time.monotonic() - started
+        self.queue_wait_total += waited
+        self.queue_wait_max = max(self.queue_wait_max, waited)
+        self.admitted += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self):
+        """Give the slot back; must run on the event loop"""
+        if self._slots is None:
+            return
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {
+            'max_in_flight': self.max_in_flight,
+            'max_queued': self.max_queued,
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'peak_in_flight': self.peak_in_flight,
+            'peak_queued': self.peak_queued,
+            'admitted': self.admitted,
+            'shed': dict(self.shed),
+            'queue_wait_avg_ms': self.queue_wait_total / self.admitted * 1000.0 if self.admitted else 0.0,
+            'queue_wait_max_ms': self.queue_wait_max * 1000.0
+        }
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution. The execution
+    runs as its own task: a caller that goes away (client disconnect) does
+    not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def run(self, key, call):
+        """Result of `call()` (a coroutine function), shared with every concurrent caller of `key`"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark a failure as seen even if every caller went away
+            task.exception()
+
+    def stats(self):
+        total = self.executions + self.coalesced
+        return {
+            'in_flight': len(self._calls),
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'coalesced_ratio': self.coalesced / total if total else 0.0
+        }
+
+
+class Deadline:
+    """
+    Time budget of one request, counted from when it arrived (queueing
+    included). A budget of 0 never expires.
+    """
+
+    def __init__(self, budget_ms, started=None):
+        self.budget_ms = budget_ms
+        self.started = started if started is not None else time.monotonic()
+        self.degraded = []  # why results were cut short, in order
+
+    def remaining_ms(self):
+        if not self.budget_ms:
+            return None
+        return self.budget_ms - (time.monotonic() - self.started) * 1000.0
+
+    @property
+    def expired(self):
+        remaining = self.remaining_ms()
+        return remaining is not None and remaining <= 0
+
+    def max_time_ms(self, share=1.0):
+        """
+        maxTimeMS for the next MongoDB operation: `share` of the remaining
+        budget, at least 1 ms (0 would mean no limit). None without a budget.
+        """
+        remaining = self.remaining_ms()
+        if remaining is None:
+            return None
+        return max(1, int(remaining * share))
+
+    def degrade(self, reason):
+        if reason not in self.degraded:
+            self.degraded.append(reason)
+
+
+class DeadlineStats:
+    def __init__(self, budget_ms):
+        self.budget_ms = budget_ms
+        self.requests = 0
+        self.degraded = Counter()   # reason -> requests
+        self.degraded_requests = 0
+
+    def record(self, deadline):
+        self.requests += 1
+        if deadline.degraded:
+            self.degraded_requests += 1
+            self.degraded.update(deadline.degraded)
+
+    def stats(self):
+        return {
+            'budget_ms': self.budget_ms,
+            'requests': self.requests,
+            'degraded_requests': self.degraded_requests,
+            'degraded': dict(self.degraded)
+        }
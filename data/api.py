@@ -1,21 +1,68 @@
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pymongo import MongoClient
-from typing import List, Optional
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
+import numpy as np
+from pymongo.errors import ExecutionTimeout
+from contextlib import asynccontextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from itertools import islice
+import hashlib
+import hmac
+import json
 import math
-from datetime import datetime
+import os
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer
 import nltk
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from index_snapshot import IndexSnapshot, FIELD_BITS
+from caching import LRUCache
+from corpus_stats import CorpusStatistics
+from connection import get_connection
+from catalogs import DEFAULT_CATALOG, CatalogNamespace, CatalogRegistry, CatalogRouter, UnknownCatalog, catalog_snapshot_path
+import profiling
+from profiling import Profile, stage
+from admission import AdmissionController, Deadline, DeadlineStats, Overloaded, RateLimiter, SingleFlight
+from doc_values import PRIOR_SIGNALS, STATIC_PRIOR_COLLECTION, boost_scores, parse_boosts, prior_from_documents, prior_weights
+from dictionaries import Dictionaries
+from descriptions import describe_game
+from query_language import QueryEvaluator, QueryResult, query_terms
+from query_planner import QueryPlanner
+from sharding import (MAX_SHARD_RESULTS, GlobalStats, HttpShard, ShardCoordinator, ShardsUnavailable,
+                      global_idf_postings)
+from impact_index import ImpactScorer, disjunctive_terms
+from query_log import QueryLog, normalize_query
 
 # Download NLTK data
 nltk.download('punkt')
 nltk.download('stopwords')
 
-app = FastAPI(title="Game Search API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fail at startup rather than on the first search if MongoDB is unreachable
+    try:
+        await run_in_threadpool(mongo.ping)
+    except Exception as e:
+        print(f"Failed to connect to MongoDB: {str(e)}")
+        raise
+    # The default catalog is opened at startup, the others on first use
+    await run_in_threadpool(catalog_router.get, DEFAULT_CATALOG)
+    yield
+    if shard_coordinator is not None:
+        shard_coordinator.close()
+    if query_log is not None:
+        query_log.close()
+    catalog_router.close()
+    mongo.close()
+
+
+app = FastAPI(title="Game Search API", lifespan=lifespan)
 
 # Configure CORS with more specific settings
 origins = [
@@ -34,15 +81,123 @@ app.add_middleware(
     max_age=3600,
 )
 
-# MongoDB connection
-try:
-    client = MongoClient('mongodb://localhost:27017/')
-    db = client['game_search_engine']
-    # Test the connection
-    client.server_info()
-except Exception as e:
-    print(f"Failed to connect to MongoDB: {str(e)}")
-    raise HTTPException(status_code=500, detail="Database connection failed")
+# MongoDB connection pool, shared by every catalog (see connection.py).
+# Searches read with GAME_MONGO_SEARCH_READ_PREFERENCE (secondaries when
+# there are any); the catalog registry, and the statistics and
+# dictionaries an engine loads when it opens a version, from the primary
+mongo = get_connection()
+db = mongo.search_database()
+
+# Catalogs (see catalogs.py). Requests choose one with ?catalog=, otherwise
+# they go to the default catalog. Each catalog is opened on its first
+# request and its live version is looked up again every
+# CATALOG_REFRESH_INTERVAL seconds
+catalog_registry = CatalogRegistry(mongo.database(), read_database=db)
+CATALOG_REFRESH_INTERVAL = float(os.environ.get('GAME_CATALOG_REFRESH_INTERVAL', 30))
+
+# Index snapshot exported by GameDataProcessor.export_snapshot. When present,
+# ranking is served from the memory-mapped file instead of aggregating
+# inverted_index; every worker maps the same file and shares its pages.
+# Other catalogs' snapshots sit beside it as index.<catalog>.snap
+SNAPSHOT_PATH = os.environ.get(
+    'GAME_SEARCH_SNAPSHOT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.snap')
+)
+
+
+def load_snapshot(namespace: CatalogNamespace) -> Optional[IndexSnapshot]:
+    """The catalog's snapshot, if it was exported from the version being served"""
+    path = catalog_snapshot_path(SNAPSHOT_PATH, namespace.catalog)
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = IndexSnapshot(path)
+    except Exception as e:
+        print(f"Failed to load index snapshot, falling back to MongoDB: {str(e)}")
+        return None
+    if snapshot.meta.get('catalog_version') != namespace.version:
+        print(f"Ignoring index snapshot {path}: exported from version {snapshot.meta.get('catalog_version')} "
+              f"of catalog {namespace.catalog}, serving version {namespace.version}")
+        snapshot.close()
+        return None
+    print(f"Loaded index snapshot {path} ({snapshot.doc_count} games, {snapshot.term_count} terms)")
+    return snapshot
+
+
+# Pre-serialized /game/{game_id} payloads of every catalog, keyed by
+# (catalog, game_id). Entries older than the TTL are revalidated against the
+# game's `updated` field before being served again.
+DETAIL_CACHE_SIZE = int(os.environ.get('GAME_DETAIL_CACHE_SIZE', 2048))
+DETAIL_CACHE_TTL = float(os.environ.get('GAME_DETAIL_CACHE_TTL', 300))
+detail_cache = LRUCache(DETAIL_CACHE_SIZE)
+
+# Descriptions generated for games ingested with lazy_descriptions
+DESCRIPTION_CACHE_SIZE = int(os.environ.get('GAME_DESCRIPTION_CACHE_SIZE', 10000))
+
+# Unrestricted query terms in more than this share of games are dropped when
+# the query has more selective terms (see query_planner.py)
+MAX_TERM_DF = float(os.environ.get('GAME_SEARCH_MAX_DF', 0.5))
+QUERY_PLAN_CACHE_SIZE = int(os.environ.get('GAME_QUERY_PLAN_CACHE_SIZE', 4096))
+
+# Posting bytes a paged relevance query may read from the snapshot's
+# impact-ordered lists (see impact_index.py); 0 keeps exact scoring
+IMPACT_BUDGET_BYTES = int(os.environ.get('GAME_IMPACT_BUDGET_KB', 0)) * 1024
+
+# Static quality boosts blended into relevance scores, e.g.
+# "popularity=0.3,freshness=0.1" (see doc_values.PRIOR_SIGNALS); empty ranks by TF-IDF alone
+SEARCH_BOOSTS = parse_boosts(os.environ.get('GAME_SEARCH_BOOSTS', ''))
+
+# Admission control for /search/ (see admission.py). Searches beyond
+# MAX_IN_FLIGHT wait in a queue of at most MAX_QUEUED for QUEUE_TIMEOUT
+# seconds before being shed; 0 disables the limit
+MAX_IN_FLIGHT = int(os.environ.get('GAME_SEARCH_MAX_IN_FLIGHT', 8))
+MAX_QUEUED = int(os.environ.get('GAME_SEARCH_MAX_QUEUED', 32))
+QUEUE_TIMEOUT = float(os.environ.get('GAME_SEARCH_QUEUE_TIMEOUT', 1.0))
+
+# Searches (or batched queries) per second per client, and the burst allowed; 0 disables
+CLIENT_RATE = float(os.environ.get('GAME_SEARCH_CLIENT_RATE', 10))
+CLIENT_BURST = int(os.environ.get('GAME_SEARCH_CLIENT_BURST', 20))
+
+# Time budget of a search from arrival; MongoDB operations get what is left
+# as maxTimeMS and results are cut short when it runs out. 0 disables
+SEARCH_TIMEOUT_MS = int(os.environ.get('GAME_SEARCH_TIMEOUT_MS', 2000))
+
+# Time budget of a format=ndjson export, which may fetch every matching
+# game; the admission slot is only held while a chunk is being fetched
+STREAM_TIMEOUT_MS = int(os.environ.get('GAME_SEARCH_STREAM_TIMEOUT_MS', 60000))
+
+# Share of the remaining budget the ranking aggregation may use, leaving the
+# rest for a partial ranking and for fetching the games
+RANK_BUDGET_SHARE = 0.5
+
+# Document-partitioned shards (see sharding.py): comma-separated shard URLs,
+# e.g. "http://10.0.0.1:8000/?catalog=default-0of2,http://10.0.0.2:8000/?catalog=default-1of2";
+# "local:<catalog>" is a catalog of this process. When set, this process
+# coordinates: searches that don't name a catalog are scattered over the
+# shards and their top k merged. SHARD_TIMEOUT caps each shard call
+SEARCH_SHARDS = [url.strip() for url in os.environ.get('GAME_SEARCH_SHARDS', '').split(',') if url.strip()]
+SHARD_TIMEOUT = float(os.environ.get('GAME_SHARD_TIMEOUT', 2.0))
+
+# Secret shared by a coordinator and its shards. /shard/stats and
+# /shard/search only answer requests that carry it (X-Shard-Secret), and
+# are disabled while it is unset
+SHARD_SECRET = os.environ.get('GAME_SHARD_SECRET', '')
+
+# Most terms a coordinator asks a shard about at once
+MAX_SHARD_TERMS = 1000
+
+# Sampled log of /search/ requests for offline replay (see query_log.py and
+# benchmarks/replay.py); off unless GAME_QUERY_LOG names a file
+QUERY_LOG_PATH = os.environ.get('GAME_QUERY_LOG', '')
+QUERY_LOG_SAMPLE = float(os.environ.get('GAME_QUERY_LOG_SAMPLE', 0.01))
+QUERY_LOG_MAX_BYTES = int(os.environ.get('GAME_QUERY_LOG_MAX_MB', 100)) * 1024 * 1024
+
+# Per-request profiling (see profiling.py). When enabled, a request with an
+# X-Profile header or a profile=1 parameter is profiled: collapsed stacks go
+# to PROFILE_DIR and stage times come back in Server-Timing. When disabled
+# the middleware isn't installed at all
+PROFILING_ENABLED = os.environ.get('GAME_PROFILING', '0') == '1'
+PROFILE_DIR = os.environ.get('GAME_PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+PROFILE_INTERVAL = float(os.environ.get('GAME_PROFILE_INTERVAL_MS', 1)) / 1000.0
 
 # Models
 
@@ -52,7 +207,6 @@ class PlatformResponse(BaseModel):
     name: str
     slug: Optional[str]
     released_at: Optional[str]
-    requirements: Optional[dict]
 
 
 class GameResponse(BaseModel):
@@ -69,70 +223,466 @@ class GameResponse(BaseModel):
     matched_terms: List[str]
 
 
-class SearchEngine:
-    def __init__(self):
+# Upper bound on queries per /search/batch call
+MAX_BATCH_QUERIES = 500
+
+# Games fetched per round trip when streaming results
+STREAM_CHUNK_SIZE = 500
+
+# Fields GameResponse is built from; everything else in a games document is skipped
+RESPONSE_PROJECTION = {
+    '_id': 0, 'game_id': 1, 'doc_id': 1, 'name': 1, 'description': 1, 'released': 1,
+    'rating': 1, 'background_image': 1, 'platforms': 1, 'genres': 1, 'metacritic': 1,
+    'tags': 1, 'updated': 1  # For descriptions generated at response time
+}
+
+
+class SearchRequest(BaseModel):
+    q: str = Field(..., min_length=1)
+    platform: Optional[str] = None
+    genre: Optional[str] = None
+    min_rating: Optional[float] = None
+    sort_by: str = Field("relevance", pattern="^(relevance|rating|release_date)$")
+    page: Optional[int] = Field(None, ge=1)
+    page_size: int = Field(20, ge=1, le=100)
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchRequest] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+
+
+class ShardStatsRequest(BaseModel):
+    terms: List[str] = Field(..., max_length=MAX_SHARD_TERMS)
+
+
+class ShardSearchRequest(BaseModel):
+    """A coordinator's search on one shard, with the statistics of the whole catalog"""
+    q: str = Field(..., min_length=1)
+    platform: Optional[str] = None
+    genre: Optional[str] = None
+    min_rating: Optional[float] = None
+    sort_by: str = Field("relevance", pattern="^(relevance|rating|release_date)$")
+    limit: int = Field(MAX_SHARD_RESULTS, ge=1, le=MAX_SHARD_RESULTS)  # top k
+    total_docs: int = Field(..., ge=0)
+    document_frequency: Dict[str, int] = Field(..., max_length=MAX_SHARD_TERMS)
+    common_terms: List[str] = Field([], max_length=MAX_SHARD_TERMS)
+    budget_ms: Optional[int] = Field(None, ge=1)  # what is left of the coordinator's deadline
+
+
+class SharedResources:
+    """
+    Analyzer and caches used by the engines of every catalog. Cache keys
+    carry the catalog version, so one bound covers all catalogs.
+    """
+
+    def __init__(self, description_cache_size=DESCRIPTION_CACHE_SIZE, plan_cache_size=QUERY_PLAN_CACHE_SIZE):
         self.stemmer = PorterStemmer()
-        self.stop_words = set(stopwords.words('english'))
+        self.stop_words = frozenset(stopwords.words('english'))
+        self.descriptions = LRUCache(description_cache_size)
+        self.plans = LRUCache(plan_cache_size)
+
+    def stats(self):
+        return {'descriptions': self.descriptions.stats(), 'plans': self.plans.stats()}
+
+
+class SearchEngine:
+    def __init__(self, database=None, snapshot=None, dictionaries=None, impact_budget=IMPACT_BUDGET_BYTES,
+                 boosts=None, shared=None):
+        # The catalog router passes a catalog version's collections;
+        # benchmarks pass a database of their own
+        self.db = database if database is not None else catalog_registry.live(DEFAULT_CATALOG)
+        self.catalog = self.db.catalog if isinstance(self.db, CatalogNamespace) else DEFAULT_CATALOG
+        self.scope = (self.catalog, self.db.version) if isinstance(self.db, CatalogNamespace) else None
+        # What is read once, when the engine opens, comes from the primary
+        self.primary_db = self.db.primary if isinstance(self.db, CatalogNamespace) else self.db
+        self.snapshot = snapshot
+        self.dictionaries = dictionaries if dictionaries is not None else Dictionaries.load(self.primary_db)
+        shared = shared if shared is not None else SharedResources()
+        self.descriptions = shared.descriptions
+        self.stemmer = shared.stemmer
+        self.stop_words = shared.stop_words
+        # Without a snapshot, term statistics come from the latest ingest
+        stats = self.latest_stats() if snapshot is None else None
+        self.corpus_stats = CorpusStatistics.from_document(stats)
+        self.planner = QueryPlanner(self.stop_words, self.load_common_terms(), plans=shared.plans, scope=self.scope)
+        self.index_version = self.read_index_version()
+        # [index, count] when this index is one shard of a catalog (see sharding.py)
+        self.shard = (snapshot.meta if snapshot is not None else stats or {}).get('shard')
+        self.impact = ImpactScorer(snapshot, impact_budget) if snapshot is not None and impact_budget else None
+        self.boost_weights = prior_weights(SEARCH_BOOSTS if boosts is None else boosts)
+        self.prior = self.load_prior(stats) if self.boost_weights is not None else None
+
+    def read_index_version(self) -> Optional[str]:
+        """Identifies the index build being served; cached payloads from another build are stale"""
+        if self.snapshot is not None:
+            return self.snapshot.meta.get('created_at')
+        try:
+            latest = self.primary_db.collection_stats.find_one({}, {'timestamp': 1}, sort=[('timestamp', -1)])
+            return latest['timestamp'].isoformat() if latest else None
+        except Exception as e:
+            print(f"Failed to read index version: {str(e)}")
+            return None
+
+    def latest_stats(self) -> Optional[dict]:
+        try:
+            return self.primary_db.collection_stats.find_one(sort=[('timestamp', -1)])
+        except Exception as e:
+            print(f"Failed to read collection stats: {str(e)}")
+            return None
+
+    def load_common_terms(self) -> List[str]:
+        """Terms in more than MAX_TERM_DF of all games, from the snapshot or the inverted index"""
+        if self.snapshot is not None:
+            return self.snapshot.common_terms(MAX_TERM_DF)
+        if not self.corpus_stats.total_docs:
+            return []
+        try:
+            common = self.primary_db.inverted_index.find(
+                {'document_frequency': {'$gt': MAX_TERM_DF * self.corpus_stats.total_docs}}, {'term': 1}
+            )
+            return [term_doc['term'] for term_doc in common]
+        except Exception as e:
+            print(f"Failed to read common terms: {str(e)}")
+            return []
+
+    def document_frequencies(self, terms: List[str], deadline: Optional[Deadline] = None) -> dict:
+        """df of the `terms` this index has, from the snapshot or their inverted_index documents"""
+        if self.snapshot is not None:
+            term_ids = {term: self.snapshot.term_id(term) for term in terms}
+            return {
+                term: self.snapshot.document_frequency(term_id) for term, term_id in term_ids.items()
+                if term_id is not None
+            }
+        cursor = self.db.inverted_index.find({'term': {'$in': terms}}, {'term': 1, 'document_frequency': 1})
+        return {
+            term_doc['term']: term_doc.get('document_frequency', 0)
+            for term_doc in cursor.max_time_ms(self.max_time_ms(deadline))
+        }
+
+    def load_prior(self, stats: Optional[dict]) -> Optional[np.ndarray]:
+        """Static quality signals per doc id, from the snapshot or the static_prior collection"""
+        if self.snapshot is not None:
+            return self.snapshot.doc_values.prior
+        if stats and 'static_prior' in stats:
+            # Written into collection_stats by earlier ingests
+            return np.frombuffer(stats['static_prior'], dtype=np.uint8).reshape(-1, len(PRIOR_SIGNALS))
+        prior = prior_from_documents(self.primary_db[STATIC_PRIOR_COLLECTION].find())
+        if prior is None:
+            print("No static prior for this catalog; search boosts are disabled")
+        return prior
+
+    def boost(self, result: QueryResult) -> QueryResult:
+        """Blend the static prior into relevance scores (a no-op without boosts)"""
+        if self.prior is None or len(result) == 0:
+            return result
+        return QueryResult(result.docs, boost_scores(self.prior, result.docs, result.scores, self.boost_weights),
+                           result.matched)
+
+    def plan(self, query: str, stats: Optional[GlobalStats] = None):
+        """Query plan; a shard drops the terms common in the whole catalog rather than its own"""
+        if stats is None:
+            return self.planner.plan(query)
+        return self.planner.plan_with(query, stats.common_terms)
+
+    def total_docs(self) -> int:
+        return self.snapshot.doc_count if self.snapshot is not None else self.corpus_stats.total_docs
+
+    def postings_source(self, postings, stats: Optional[GlobalStats] = None):
+        """`postings(term)`, scored with the global IDF when this index is a shard"""
+        if stats is None:
+            return postings
+        return global_idf_postings(postings, stats, self.total_docs())
+
+    def term_statistics(self, terms: List[str]) -> dict:
+        """Games in this index and the document frequency of `terms`, for a shard coordinator"""
+        frequencies = self.document_frequencies(terms)
+        return {
+            'index_version': self.index_version,
+            'shard': self.shard,
+            'total_docs': self.total_docs(),
+            'document_frequency': frequencies
+        }
 
     def normalize_text(self, text: str) -> List[str]:
         text = text.lower()
         tokens = word_tokenize(text)
         return [self.stemmer.stem(token) for token in tokens if token not in self.stop_words]
 
-    async def search(self, query: str, platform: Optional[str] = None,
-                     genre: Optional[str] = None, min_rating: Optional[float] = None,
-                     sort_by: str = "relevance") -> List[GameResponse]:
-        if not query:
+    @staticmethod
+    def max_time_ms(deadline: Optional[Deadline], share: float = 1.0) -> Optional[int]:
+        """Time limit of the next MongoDB operation of a request; None for no limit"""
+        return deadline.max_time_ms(share) if deadline is not None else None
+
+    def index_postings(self, terms: List[str], deadline: Optional[Deadline] = None, share: float = 1.0) -> dict:
+        """
+        Posting lists of `terms` from the inverted_index collection with one
+        aggregation, combining a game's refs for a term across fields.
+        Returns {term: (doc ids sorted, scores, FIELD_BITS masks)}.
+        Raises ExecutionTimeout if `share` of the deadline's time runs out.
+        """
+        pipeline = [
+            {'$match': {'term': {'$in': terms}}},
+            {'$unwind': '$game_refs'},
+            {'$group': {
+                '_id': {'term': '$term', 'doc_id': '$game_refs.doc_id'},
+                'score': {'$sum': '$game_refs.tf_idf'},
+                'fields': {'$addToSet': '$game_refs.field'}
+            }}
+        ]
+        collected = {term: [] for term in terms}
+        max_time_ms = self.max_time_ms(deadline, share)
+        options = {'maxTimeMS': max_time_ms} if max_time_ms is not None else {}
+        with stage('aggregate'):
+            for result in self.db.inverted_index.aggregate(pipeline, **options):
+                fields = 0
+                for field in result['fields']:
+                    fields |= FIELD_BITS.get(field, 0)
+                collected[result['_id']['term']].append((result['_id']['doc_id'], result['score'], fields))
+
+        postings = {}
+        for term, entries in collected.items():
+            entries.sort()
+            postings[term] = (
+                np.array([doc for doc, _, _ in entries], dtype=np.int64),
+                np.array([score for _, score, _ in entries], dtype=np.float64),
+                np.array([fields for _, _, fields in entries], dtype=np.uint8)
+            )
+        return postings
+
+    def read_postings(self, terms: List[str], positive_terms: List[str], deadline: Optional[Deadline]) -> dict:
+        """
+        index_postings() within a deadline. If the aggregation runs out of
+        its share, terms are read one at a time instead: excluded ones first,
+        then the rarest, until the budget is spent. Terms left unread count
+        as absent, so the ranking is partial but never breaks an exclusion.
+        """
+        if deadline is None:
+            return self.index_postings(terms)
+        try:
+            return self.index_postings(terms, deadline, RANK_BUDGET_SHARE)
+        except ExecutionTimeout:
+            deadline.degrade('partial_terms')
+
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), np.empty(0, dtype=np.uint8))
+        postings = {term: empty for term in terms}
+        positive = set(positive_terms)
+        # Terms the index doesn't have are skipped, if there is time to look them up
+        try:
+            frequencies = self.document_frequencies(terms, deadline)
+            known = [term for term in terms if frequencies.get(term)]
+        except ExecutionTimeout:
+            frequencies = {}
+            known = terms
+        try:
+            for term in sorted(known, key=lambda t: (t in positive, frequencies.get(t, 0))):
+                if deadline.expired:
+                    break
+                postings.update(self.index_postings([term], deadline))
+        except ExecutionTimeout:
+            pass
+        return postings
+
+    def find_games(self, query_filter: dict, projection: Optional[dict] = None,
+                   deadline: Optional[Deadline] = None) -> List[dict]:
+        """games.find within a deadline; if it runs out, the games read until then"""
+        games = []
+        try:
+            with stage('fetch'):
+                for game in self.db.games.find(query_filter, projection).max_time_ms(self.max_time_ms(deadline)):
+                    games.append(game)
+        except ExecutionTimeout:
+            deadline.degrade('partial_fetch')
+        return games
+
+    def snapshot_postings(self, term: str):
+        """Posting lists of one term from the snapshot (empty if the term is unknown)"""
+        term_id = self.snapshot.term_id(term)
+        if term_id is None:
+            return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.uint8)
+        return self.snapshot.postings(term_id)
+
+    def rank_from_index(self, query: str, deadline: Optional[Deadline] = None,
+                        stats: Optional[GlobalStats] = None) -> List[dict]:
+        """Evaluate a query on the inverted_index collection; ranked by total TF-IDF score (boosted)"""
+        plan = self.plan(query, stats)
+        if plan.empty:
             return []
+        postings = self.read_postings(plan.terms, query_terms(plan.query), deadline)
+        with stage('rank'):
+            evaluator = QueryEvaluator(self.postings_source(postings.__getitem__, stats))
+            result = self.boost(evaluator.evaluate(plan.query))
+            order = np.argsort(-result.scores, kind='stable')
+        return [
+            {'_id': int(result.docs[i]), 'total_score': float(result.scores[i]), 'matched_terms': result.matched_terms(i)}
+            for i in order
+        ]
 
-        # Pipeline stages for MongoDB aggregation
-        pipeline = []
+    def describe(self, game: dict) -> str:
+        """Stored description, or one generated from the game's metadata and memoized"""
+        if 'description' in game:
+            return game['description']
+        key = (self.scope, game.get('game_id'), game.get('updated'))
+        description = self.descriptions.get(key)
+        if description is None:
+            description = describe_game(game, self.dictionaries)
+            self.descriptions.put(key, description)
+        return description
 
-        # Match stage to find documents containing any query term
-        pipeline.append({
-            '$match': {
-                'term': {'$in': query.lower().split()}
-            }
-        })
+    def game_response(self, game: dict, score: float, matched_terms: List[str]) -> Optional[GameResponse]:
+        """Convert a games document into a GameResponse; None if it can't be converted"""
+        with stage('serialize'):
+            return self.build_game_response(game, score, matched_terms)
 
-        # Unwind game references to work with individual game entries
-        pipeline.append({'$unwind': '$game_refs'})
+    def build_game_response(self, game: dict, score: float, matched_terms: List[str]) -> Optional[GameResponse]:
+        try:
+            # Convert platform data to PlatformResponse objects
+            platform_responses = []
+            for platform_data in game.get('platforms', []):
+                if isinstance(platform_data, dict):
+                    try:
+                        # Name and slug come from the platforms dictionary;
+                        # requirements are only served by /game/{game_id}
+                        entry = self.dictionaries.get('platforms', platform_data.get('id')) or platform_data
+                        platform_responses.append(PlatformResponse(
+                            id=platform_data.get('id'),
+                            name=entry.get('name', 'Unknown Platform'),
+                            slug=entry.get('slug'),
+                            released_at=platform_data.get('released_at')
+                        ))
+                    except Exception as e:
+                        print(f"Error processing platform data: {str(e)}")
+                        continue
 
-        # Group by game_id to combine scores from different terms
-        pipeline.append({
-            '$group': {
-                '_id': '$game_refs.game_id',
-                'total_score': {'$sum': '$game_refs.tf_idf'},
-                'matched_terms': {'$addToSet': '$term'}
-            }
-        })
+            return GameResponse(
+                id=game["game_id"],
+                name=game["name"],
+                description=self.describe(game),
+                released=game["released"].strftime("%Y-%m-%d") if game.get("released") else None,
+                rating=game.get("rating"),
+                background_image=game.get("background_image"),
+                platforms=platform_responses,  # Use the processed platform responses
+                genres=game.get("genres", []),
+                metacritic=game.get("metacritic"),
+                relevance_score=score,
+                matched_terms=list(matched_terms)
+            )
+        except Exception as e:
+            print(f"Error creating game response for game {game.get('game_id')}: {str(e)}")
+            return None
+
+    def snapshot_page(self, evaluator: QueryEvaluator, query: str, platform: Optional[str],
+                      genre: Optional[str], min_rating: Optional[float], sort_by: str,
+                      page: Optional[int], page_size: int, stats: Optional[GlobalStats] = None) -> QueryResult:
+        """Evaluate, filter and sort on the snapshot's postings and doc-value columns"""
+        doc_values = self.snapshot.doc_values
+        plan = self.plan(query, stats)
+        if plan.empty:
+            return QueryResult(np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.float64), {})
+        with stage('rank'):
+            # Top-k of a plain, unfiltered query can come from the heads of the
+            # impact lists (whose scores carry this index's own IDF, so not on a
+            # shard); filters could drop every game the budget reaches
+            use_impact = (
+                self.impact is not None and page and sort_by == 'relevance' and stats is None
+                and not platform and not genre and min_rating is None
+            )
+            terms = disjunctive_terms(plan.query) if use_impact else None
+            if terms is not None and self.impact.covers(terms, page * page_size):
+                result, _ = self.impact.score(terms)
+            else:
+                result = evaluator.evaluate(plan.query)
+            if len(result) == 0:
+                return result
+
+            # Boosting after filtering only touches the games that can be returned
+            result = self.boost(result.take(doc_values.filter(result.docs, platform, genre, min_rating)))
+
+            order = doc_values.sort_order(result.docs, result.scores, sort_by)
+            if page:
+                order = order[(page - 1) * page_size:page * page_size]
+            return result.take(order)
+
+    def snapshot_responses(self, pages: List[QueryResult],
+                           deadline: Optional[Deadline] = None) -> List[List[GameResponse]]:
+        """
+        Turn ranked pages into responses, fetching the games of every page
+        with a single query (only the fields a GameResponse is built from)
+        """
+        doc_ids = set()
+        for page in pages:
+            doc_ids.update(page.docs.tolist())
+        games = {
+            game['doc_id']: game
+            for game in self.find_games({'doc_id': {'$in': list(doc_ids)}}, RESPONSE_PROJECTION, deadline)
+        }
 
-        # Sort by total TF-IDF score
-        pipeline.append({'$sort': {'total_score': -1}})
+        responses = []
+        for page in pages:
+            results = []
+            for i, (doc, score) in enumerate(zip(page.docs.tolist(), page.scores.tolist())):
+                game = games.get(doc)
+                if game is None:
+                    continue
+                game_response = self.game_response(game, score, page.matched_terms(i))
+                if game_response is not None:
+                    results.append(game_response)
+            responses.append(results)
+        return responses
 
-        # Get the ranked game IDs
-        ranked_results = list(db.inverted_index.aggregate(pipeline))
+    def search_snapshot(self, query: str, platform: Optional[str], genre: Optional[str],
+                        min_rating: Optional[float], sort_by: str, page: Optional[int],
+                        page_size: int, deadline: Optional[Deadline] = None,
+                        stats: Optional[GlobalStats] = None) -> List[GameResponse]:
+        """Full game documents are only fetched for the page being returned"""
+        evaluator = QueryEvaluator(self.postings_source(self.snapshot_postings, stats))
+        result = self.snapshot_page(evaluator, query, platform, genre, min_rating, sort_by, page, page_size, stats)
+        return self.snapshot_responses([result], deadline)[0]
+
+    async def search(self, query: str, platform: Optional[str] = None,
+                     genre: Optional[str] = None, min_rating: Optional[float] = None,
+                     sort_by: str = "relevance", page: Optional[int] = None,
+                     page_size: int = 20, deadline: Optional[Deadline] = None) -> List[GameResponse]:
+        return self.run_search(query, platform, genre, min_rating, sort_by, page, page_size, deadline)
+
+    def run_search(self, query: str, platform: Optional[str] = None,
+                   genre: Optional[str] = None, min_rating: Optional[float] = None,
+                   sort_by: str = "relevance", page: Optional[int] = None,
+                   page_size: int = 20, deadline: Optional[Deadline] = None,
+                   stats: Optional[GlobalStats] = None) -> List[GameResponse]:
+        """
+        search() as a blocking call, for the threadpool. With a `deadline`,
+        results may be partial; the deadline records why. With `stats`, this
+        index is a shard and scores as one index over the whole catalog would.
+        """
+        # Nothing but stopwords (or empty): no need to touch the index
+        if not query or self.plan(query, stats).empty:
+            return []
+
+        if self.snapshot is not None:
+            return self.search_snapshot(query, platform, genre, min_rating, sort_by, page, page_size, deadline, stats)
+
+        ranked_results = self.rank_from_index(query, deadline, stats)
 
         if not ranked_results:
             return []
 
-        # Get game IDs in ranked order
-        game_ids = [result['_id'] for result in ranked_results]
+        # Get internal doc IDs in ranked order
+        doc_ids = [result['_id'] for result in ranked_results]
 
         # Build MongoDB query for filtering
-        query_filter = {"game_id": {"$in": game_ids}}
+        query_filter = {"doc_id": {"$in": doc_ids}}
         
         if platform:
-            query_filter["platforms.name"] = platform
+            query_filter.update(self.platform_filter(platform))
         if genre:
             query_filter["genres"] = genre
         if min_rating:
             query_filter["rating"] = {"$gte": min_rating}
 
         # Get games from database
-        games = list(db.games.find(query_filter))
+        games = self.find_games(query_filter, RESPONSE_PROJECTION, deadline)
         
-        # Create a mapping of game_id to score
+        # Create a mapping of doc_id to score
         scores = {result['_id']: {
             'score': result['total_score'],
             'matched_terms': result['matched_terms']
@@ -141,42 +691,10 @@ class SearchEngine:
         # Prepare response
         results = []
         for game in games:
-            game_score = scores.get(game["game_id"], {'score': 0, 'matched_terms': []})
-            
-            try:
-                # Convert platform data to PlatformResponse objects
-                platform_responses = []
-                for platform_data in game.get('platforms', []):
-                    if isinstance(platform_data, dict):
-                        try:
-                            platform_responses.append(PlatformResponse(
-                                id=platform_data.get('id'),
-                                name=platform_data.get('name', 'Unknown Platform'),
-                                slug=platform_data.get('slug'),
-                                released_at=platform_data.get('released_at'),
-                                requirements=platform_data.get('requirements', {})
-                            ))
-                        except Exception as e:
-                            print(f"Error processing platform data: {str(e)}")
-                            continue
-
-                game_response = GameResponse(
-                    id=game["game_id"],
-                    name=game["name"],
-                    description=game.get("description", ""),
-                    released=game["released"].strftime("%Y-%m-%d") if game.get("released") else None,
-                    rating=game.get("rating"),
-                    background_image=game.get("background_image"),
-                    platforms=platform_responses,  # Use the processed platform responses
-                    genres=game.get("genres", []),
-                    metacritic=game.get("metacritic"),
-                    relevance_score=game_score['score'],
-                    matched_terms=list(game_score['matched_terms'])
-                )
+            game_score = scores.get(game.get("doc_id"), {'score': 0, 'matched_terms': []})
+            game_response = self.game_response(game, game_score['score'], game_score['matched_terms'])
+            if game_response is not None:
                 results.append(game_response)
-            except Exception as e:
-                print(f"Error creating game response for game {game.get('game_id')}: {str(e)}")
-                continue
 
         # Sort results based on the specified criteria
         if sort_by == "rating":
@@ -186,74 +704,766 @@ class SearchEngine:
         else:  # sort by relevance (TF-IDF score)
             results.sort(key=lambda x: x.relevance_score or 0, reverse=True)
 
+        if page:
+            results = results[(page - 1) * page_size:page * page_size]
+
         return results
 
+    def run_shard_search(self, request: ShardSearchRequest, deadline: Optional[Deadline] = None) -> List[GameResponse]:
+        """A coordinator's search: the top `limit` results, scored with the catalog's statistics"""
+        stats = GlobalStats(request.total_docs, request.document_frequency, request.common_terms)
+        return self.run_search(request.q, request.platform, request.genre, request.min_rating, request.sort_by,
+                               1, request.limit, deadline, stats)
+
+    def fetch_chunk(self, doc_ids: List[int], query_filter: Optional[dict] = None,
+                    deadline: Optional[Deadline] = None) -> dict:
+        """Games of one chunk of doc ids, keyed by doc_id"""
+        chunk_filter = dict(query_filter or {}, doc_id={'$in': doc_ids})
+        cursor = self.db.games.find(chunk_filter, RESPONSE_PROJECTION).batch_size(len(doc_ids))
+        games = {}
+        try:
+            with stage('fetch'):
+                for game in cursor.max_time_ms(self.max_time_ms(deadline)):
+                    games[game['doc_id']] = game
+        except ExecutionTimeout:
+            deadline.degrade('partial_fetch')
+        return games
+
+    def search_stream(self, query: str, platform: Optional[str] = None,
+                      genre: Optional[str] = None, min_rating: Optional[float] = None,
+                      sort_by: str = "relevance", page: Optional[int] = None,
+                      page_size: int = 20, chunk_size: int = STREAM_CHUNK_SIZE,
+                      deadline: Optional[Deadline] = None) -> Iterator[GameResponse]:
+        """
+        Yield results in final order, fetching games STREAM_CHUNK_SIZE at a
+        time so memory stays flat no matter how many games match. The stream
+        ends early if the deadline runs out.
+        """
+        if not query or self.planner.plan(query).empty:
+            return
+
+        if self.snapshot is not None:
+            result = self.snapshot_page(
+                QueryEvaluator(self.snapshot_postings), query, platform, genre, min_rating, sort_by, page, page_size
+            )
+            docs, scores = result.docs.tolist(), result.scores.tolist()
+            for start in range(0, len(docs), chunk_size):
+                chunk = docs[start:start + chunk_size]
+                games = self.fetch_chunk(chunk, deadline=deadline)
+                for i in range(start, min(start + chunk_size, len(docs))):
+                    game = games.get(docs[i])
+                    game_response = game and self.game_response(game, scores[i], result.matched_terms(i))
+                    if game_response:
+                        yield game_response
+                if deadline is not None and deadline.degraded:
+                    return
+            return
+
+        ranked_results = self.rank_from_index(query, deadline)
+        if not ranked_results:
+            return
+        scores = {result['_id']: result for result in ranked_results}
+
+        query_filter = {}
+        if platform:
+            query_filter.update(self.platform_filter(platform))
+        if genre:
+            query_filter["genres"] = genre
+        if min_rating:
+            query_filter["rating"] = {"$gte": min_rating}
+
+        if sort_by in ("rating", "release_date"):
+            # Let MongoDB order the candidates and stream them off one cursor
+            sort_field = "rating" if sort_by == "rating" else "released"
+            query_filter["doc_id"] = {"$in": list(scores)}
+            cursor = self.db.games.find(query_filter, RESPONSE_PROJECTION).sort(sort_field, -1)
+            if page:
+                cursor = cursor.skip((page - 1) * page_size).limit(page_size)
+            try:
+                for game in cursor.batch_size(chunk_size).max_time_ms(self.max_time_ms(deadline)):
+                    result = scores[game['doc_id']]
+                    game_response = self.game_response(game, result['total_score'], result['matched_terms'])
+                    if game_response:
+                        yield game_response
+            except ExecutionTimeout:
+                deadline.degrade('partial_fetch')
+            return
+
+        # Relevance order: the aggregation already sorted by score, so fetch
+        # chunk by chunk and skip games the filters reject
+        to_skip = (page - 1) * page_size if page else 0
+        remaining = page_size if page else None
+        for start in range(0, len(ranked_results), chunk_size):
+            chunk = ranked_results[start:start + chunk_size]
+            games = self.fetch_chunk([result['_id'] for result in chunk], query_filter, deadline)
+            for result in chunk:
+                game = games.get(result['_id'])
+                game_response = game and self.game_response(game, result['total_score'], result['matched_terms'])
+                if not game_response:
+                    continue
+                if to_skip:
+                    to_skip -= 1
+                    continue
+                yield game_response
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining == 0:
+                        return
+            if deadline is not None and deadline.degraded:
+                return
+
+    def platform_filter(self, platform: str) -> dict:
+        """games.find condition for a platform name"""
+        if not self.dictionaries.platform_ids:
+            # Legacy database: games embed their platforms, there is no dictionary
+            return {"platforms.name": platform}
+        platform_id = self.dictionaries.platform_id(platform)
+        return {"platforms.id": platform_id if platform_id is not None else {"$in": []}}
+
+    def matches_filters(self, game: dict, platform: Optional[str], genre: Optional[str],
+                        min_rating: Optional[float]) -> bool:
+        """Same filters as the games.find query in search(), applied to a fetched document"""
+        if platform:
+            platforms = [p for p in game.get('platforms', []) if isinstance(p, dict)]
+            if not self.dictionaries.platform_ids:
+                # Legacy database, see platform_filter()
+                if platform not in [p.get('name') for p in platforms]:
+                    return False
+            else:
+                platform_id = self.dictionaries.platform_id(platform)
+                if platform_id is None or platform_id not in [p.get('id') for p in platforms]:
+                    return False
+        if genre and genre not in game.get('genres', []):
+            return False
+        if min_rating and (game.get('rating') is None or game['rating'] < min_rating):
+            return False
+        return True
+
+    def search_batch_from_index(self, requests: List[SearchRequest],
+                                deadline: Optional[Deadline] = None) -> List[List[GameResponse]]:
+        plans = [self.planner.plan(request.q) for request in requests]
+        all_terms = list(dict.fromkeys(term for plan in plans for term in plan.terms))
+        positive_terms = [term for plan in plans if not plan.empty for term in query_terms(plan.query)]
+        evaluator = QueryEvaluator(self.read_postings(all_terms, positive_terms, deadline).__getitem__)
+
+        # Evaluate every query on the shared posting lists
+        ranked = []
+        doc_ids = set()
+        for plan in plans:
+            if plan.empty:
+                ranked.append(({}, {}))
+                continue
+            with stage('rank'):
+                result = self.boost(evaluator.evaluate(plan.query))
+            docs = result.docs.tolist()
+            scores = dict(zip(docs, result.scores.tolist()))
+            matched = {doc: result.matched_terms(i) for i, doc in enumerate(docs)}
+            ranked.append((scores, matched))
+            doc_ids.update(scores)
+
+        games = self.find_games({'doc_id': {'$in': list(doc_ids)}}, RESPONSE_PROJECTION, deadline)
+
+        responses = []
+        for request, (scores, matched) in zip(requests, ranked):
+            results = []
+            for game in games:
+                doc_id = game.get('doc_id')
+                if doc_id not in scores:
+                    continue
+                if not self.matches_filters(game, request.platform, request.genre, request.min_rating):
+                    continue
+                game_response = self.game_response(game, scores[doc_id], matched[doc_id])
+                if game_response is not None:
+                    results.append(game_response)
+
+            if request.sort_by == "rating":
+                results.sort(key=lambda x: x.rating or 0, reverse=True)
+            elif request.sort_by == "release_date":
+                results.sort(key=lambda x: x.released or "", reverse=True)
+            else:
+                results.sort(key=lambda x: x.relevance_score or 0, reverse=True)
+
+            if request.page:
+                results = results[(request.page - 1) * request.page_size:request.page * request.page_size]
+            responses.append(results)
+        return responses
+
+    async def search_batch(self, requests: List[SearchRequest],
+                           deadline: Optional[Deadline] = None) -> List[List[GameResponse]]:
+        return self.run_search_batch(requests, deadline)
+
+    def run_search_batch(self, requests: List[SearchRequest],
+                         deadline: Optional[Deadline] = None) -> List[List[GameResponse]]:
+        """
+        Run many searches together: terms are looked up once for the whole
+        batch, and full game documents for all queries are fetched with one
+        query. Results are returned in request order.
+        """
+        if self.snapshot is None:
+            return self.search_batch_from_index(requests, deadline)
+
+        # Posting lists are looked up once per term for the whole batch
+        evaluator = QueryEvaluator(self.snapshot_postings)
+        pages = [
+            self.snapshot_page(
+                evaluator, request.q, request.platform, request.genre, request.min_rating,
+                request.sort_by, request.page, request.page_size
+            )
+            for request in requests
+        ]
+        return self.snapshot_responses(pages, deadline)
+
+
+# Analyzer and caches shared by every catalog's engine
+shared_resources = SharedResources()
+
+
+def open_catalog(namespace: CatalogNamespace) -> SearchEngine:
+    return SearchEngine(database=namespace, snapshot=load_snapshot(namespace), shared=shared_resources)
+
+
+def close_catalog(engine: SearchEngine):
+    # Unmaps the snapshot of a version that is no longer served
+    if engine.snapshot is not None:
+        engine.snapshot.close()
 
-# Initialize search engine
-search_engine = SearchEngine()
+
+catalog_router = CatalogRouter(catalog_registry, open_catalog, CATALOG_REFRESH_INTERVAL, close_catalog)
+
+# Admission control for the search endpoints
+admission = AdmissionController(MAX_IN_FLIGHT, MAX_QUEUED, QUEUE_TIMEOUT)
+rate_limiter = RateLimiter(CLIENT_RATE, CLIENT_BURST)
+deadline_stats = DeadlineStats(SEARCH_TIMEOUT_MS)
+search_flights = SingleFlight()
+query_log = QueryLog(QUERY_LOG_PATH, QUERY_LOG_SAMPLE, QUERY_LOG_MAX_BYTES) if QUERY_LOG_PATH else None
+
+
+async def acquire_engine(catalog: str) -> SearchEngine:
+    """Engine of `catalog`, leased until catalog_router.release(engine). Raises UnknownCatalog"""
+    engine = catalog_router.acquire_cached(catalog)
+    if engine is None:
+        # Opening a catalog reads its statistics and dictionaries
+        engine = await run_in_threadpool(catalog_router.acquire, catalog)
+    return engine
+
+
+@asynccontextmanager
+async def catalog_engine(catalog: Optional[str]):
+    """Engine of the requested catalog, leased for the block; 404 if there is no such catalog"""
+    catalog = catalog or DEFAULT_CATALOG
+    try:
+        engine = await acquire_engine(catalog)
+    except UnknownCatalog:
+        raise HTTPException(status_code=404, detail=f"Catalog not found: {catalog}")
+    try:
+        yield engine
+    finally:
+        catalog_router.release(engine)
+
+
+def run_leased(engine: SearchEngine, search, *args):
+    """
+    run_admitted() holding its own lease on `engine`, for a search that can
+    outlive the request that started it (a coalesced search keeps running
+    when that request is cancelled)
+    """
+    catalog_router.retain(engine)
+
+    async def run():
+        try:
+            return await run_admitted(search, *args)
+        finally:
+            catalog_router.release(engine)
+    return run()
+
+
+def client_key(request: Request) -> str:
+    """Clients may identify themselves with X-Client-Id; otherwise by address"""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "unknown")
+
+
+def overloaded_error(e: Overloaded) -> HTTPException:
+    status_code = 429 if e.reason == 'rate_limited' else 503
+    return HTTPException(status_code=status_code, detail=f"Search unavailable: {e.reason}",
+                         headers={"Retry-After": str(e.retry_after)})
+
+
+def check_rate(request: Request, cost: int = 1):
+    """429 when the client is over its rate"""
+    try:
+        rate_limiter.check(client_key(request), cost)
+    except Overloaded as e:
+        raise overloaded_error(e)
+
+
+async def admit_search(budget_ms: Optional[int] = None, timeout_ms: int = SEARCH_TIMEOUT_MS) -> Deadline:
+    """
+    Queue a search until it gets a slot; 503 when it is shed. The returned
+    deadline of `timeout_ms` counts from before the wait; `budget_ms`
+    shortens it, e.g. to what a shard coordinator has left.
+    """
+    if budget_ms and timeout_ms:
+        budget_ms = min(budget_ms, timeout_ms)
+    deadline = Deadline(budget_ms or timeout_ms)
+    try:
+        await admission.acquire()
+    except Overloaded as e:
+        raise overloaded_error(e)
+    return deadline
+
+
+async def finish_search(deadline: Deadline):
+    admission.release()
+    deadline_stats.record(deadline)
+
+
+async def run_admitted(search, *args, budget_ms: Optional[int] = None) -> Tuple[list, Deadline]:
+    """
+    Run a blocking search in the threadpool under an admission slot, so
+    queued requests can still be admitted, shed and timed meanwhile
+    """
+    deadline = await admit_search(budget_ms)
+    try:
+        results = await run_in_threadpool(search, *args, deadline)
+    finally:
+        await finish_search(deadline)
+    return results, deadline
+
+
+def mark_degraded(response: Response, deadline: Deadline):
+    if deadline.degraded:
+        response.headers["X-Search-Degraded"] = ",".join(deadline.degraded)
+
+
+# First characters of the line that ends an NDJSON stream cut short
+TRUNCATED_LINE_PREFIX = '{"truncated"'
+
+
+def truncated_line(reasons: List[str]) -> str:
+    """
+    Last line of an NDJSON stream whose results are incomplete; headers
+    are already sent by then, so this is the only way to tell the client
+    """
+    return json.dumps({"truncated": True, "degraded": reasons}, separators=(",", ":")) + "\n"
+
+
+async def stream_search(catalog: str, search_args: tuple, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    NDJSON lines of a streamed search. The engine lease and the admission
+    slot are taken when the first line is requested, so a response that is
+    never sent holds neither. The slot is held while a chunk of results is
+    fetched and given back while it is sent, so a slow client doesn't keep
+    a slot; the next chunk queues for one like any search. Headers are sent
+    by then, so a stream that is shed, even before its first chunk, ends
+    with a truncated_line().
+    """
+    deadline = Deadline(STREAM_TIMEOUT_MS)
+    engine = await acquire_engine(catalog)
+    holding = False
+    try:
+        try:
+            await admission.acquire()
+            holding = True
+        except Overloaded as e:
+            deadline.degrade(e.reason)
+
+        results = engine.search_stream(*search_args, deadline=deadline)
+        while holding:
+            chunk = await run_in_threadpool(lambda: list(islice(results, chunk_size)))
+            admission.release()
+            holding = False
+            for game_response in chunk:
+                yield game_response.model_dump_json() + "\n"
+            if len(chunk) < chunk_size or deadline.degraded:
+                break
+            try:
+                await admission.acquire()
+            except Overloaded as e:
+                deadline.degrade(e.reason)
+                break
+            holding = True
+        if deadline.degraded:
+            yield truncated_line(deadline.degraded)
+    finally:
+        if holding:
+            admission.release()
+        deadline_stats.record(deadline)
+        catalog_router.release(engine)
+
+
+class LocalShard:
+    """A shard that is a catalog of this process, called without going through HTTP"""
+
+    def __init__(self, catalog: str):
+        self.name = f"local:{catalog}"
+        self.catalog = catalog
+
+    def stats(self, terms: List[str], timeout: float) -> dict:
+        engine = catalog_router.acquire(self.catalog)
+        try:
+            return engine.term_statistics(terms)
+        finally:
+            catalog_router.release(engine)
+
+    def search(self, request: dict, timeout: float) -> dict:
+        engine = catalog_router.acquire(self.catalog)
+        try:
+            deadline = Deadline(request.get('budget_ms') or 0)
+            results = engine.run_shard_search(ShardSearchRequest(**request), deadline)
+            return {
+                'index_version': engine.index_version,
+                'results': [result.model_dump() for result in results],
+                'degraded': deadline.degraded
+            }
+        finally:
+            catalog_router.release(engine)
+
+
+def open_shard(spec: str):
+    if spec.startswith('local:'):
+        return LocalShard(spec[len('local:'):])
+    return HttpShard(spec, SHARD_SECRET)
+
+
+shard_coordinator = ShardCoordinator(
+    [open_shard(spec) for spec in SEARCH_SHARDS], shared_resources.stop_words, MAX_TERM_DF, SHARD_TIMEOUT
+) if SEARCH_SHARDS else None
+
+
+def run_sharded_search(q: str, platform: Optional[str], genre: Optional[str], min_rating: Optional[float],
+                       sort_by: str, page: Optional[int], page_size: int,
+                       deadline: Optional[Deadline] = None) -> List[GameResponse]:
+    """search() scattered over the shards in GAME_SEARCH_SHARDS"""
+    results = shard_coordinator.search(q, platform, genre, min_rating, sort_by, page, page_size, deadline)
+    return [GameResponse(**result) for result in results]
+
+
+if PROFILING_ENABLED:
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if not (request.headers.get("x-profile") or request.query_params.get("profile")):
+            return await call_next(request)
+
+        # Searches handed to the threadpool inherit the profile through their
+        # context. The event loop thread is sampled for the whole request, so
+        # profile with little concurrent traffic
+        profile = Profile(PROFILE_INTERVAL)
+        with profile.activate('request'):
+            response = await call_next(request)
+        name = request.url.path.strip("/").replace("/", "_") or "root"
+        prefix = os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{name}")
+        await run_in_threadpool(profile.write, prefix)
+        response.headers["Server-Timing"] = profile.server_timing()
+        response.headers["X-Profile"] = os.path.basename(prefix)
+        return response
 
 # API endpoints
 
 
 @app.get("/search/", response_model=List[GameResponse])
 async def search_games(
+    request: Request,
+    response: Response,
     q: str = Query(..., min_length=1),
     platform: Optional[str] = None,
     genre: Optional[str] = None,
     min_rating: Optional[float] = None,
     sort_by: str = Query("relevance", enum=[
-                         "relevance", "rating", "release_date"])
+                         "relevance", "rating", "release_date"]),
+    page: Optional[int] = Query(None, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    format: str = Query("json", enum=["json", "ndjson"]),
+    catalog: Optional[str] = None
 ):
-    return await search_engine.search(q, platform, genre, min_rating, sort_by)
+    search_args = (q, platform, genre, min_rating, sort_by, page, page_size, format, catalog)
+    if query_log is None or not query_log.sample():
+        return await serve_search(request, response, *search_args)
 
+    started = time.perf_counter()
+    entry = dict(catalog=catalog, q=normalize_query(q), platform=platform, genre=genre, min_rating=min_rating,
+                 sort_by=sort_by, page=page, page_size=page_size, format=format if format != "json" else None)
+    try:
+        results = await serve_search(request, response, *search_args)
+    except HTTPException as e:
+        query_log.record(**entry, status=e.status_code, latency_ms=elapsed_ms(started))
+        raise
+    if isinstance(results, StreamingResponse):
+        # Logged when the last line is sent
+        results.body_iterator = logged_stream(results.body_iterator, entry, started)
+    else:
+        query_log.record(**entry, status=200, latency_ms=elapsed_ms(started), hits=len(results),
+                         degraded=response.headers.get("X-Search-Degraded"))
+    return results
 
-@app.get("/platforms/")
-async def get_platforms():
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000.0, 2)
+
+
+async def logged_stream(lines, entry: dict, started: float):
+    hits = 0
     try:
-        # Get unique platforms from the database
-        platforms = db.games.distinct("platforms.name")
-        return JSONResponse(
-            content={"platforms": sorted(filter(None, platforms))},
-            headers={
-                "Access-Control-Allow-Origin": "http://localhost:3000",
-                "Access-Control-Allow-Credentials": "true",
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        async for line in lines:
+            if not line.startswith(TRUNCATED_LINE_PREFIX):
+                hits += 1
+            yield line
+    finally:
+        query_log.record(**entry, status=200, latency_ms=elapsed_ms(started), hits=hits)
 
 
-@app.get("/genres/")
-async def get_genres():
+async def serve_search(request: Request, response: Response, q: str, platform: Optional[str],
+                       genre: Optional[str], min_rating: Optional[float], sort_by: str, page: Optional[int],
+                       page_size: int, format: str, catalog: Optional[str]):
+    check_rate(request)
+    if shard_coordinator is not None and catalog is None:
+        return await search_shards(response, q, platform, genre, min_rating, sort_by, page, page_size, format)
+    async with catalog_engine(catalog) as engine:
+        if format == "ndjson":
+            # One GameResponse per line, sent as games are fetched. A stream cut
+            # short (deadline, shed) ends with a truncated_line()
+            search_args = (q, platform, genre, min_rating, sort_by, page, page_size)
+            return StreamingResponse(stream_search(engine.catalog, search_args), media_type="application/x-ndjson")
+
+        search_args = (q, platform, genre, min_rating, sort_by, page, page_size)
+        if profiling.active():
+            # A profiled search runs on its own instead of joining another's
+            results, deadline = await run_admitted(engine.run_search, *search_args)
+        else:
+            # Identical searches in flight (same query up to whitespace, same
+            # filters and page) share one execution and its result
+            key = (engine.catalog, " ".join(q.split()), platform, genre, min_rating, sort_by, page, page_size)
+            results, deadline = await search_flights.run(key, lambda: run_leased(engine, engine.run_search, *search_args))
+        mark_degraded(response, deadline)
+        return results
+
+
+async def search_shards(response: Response, q: str, platform: Optional[str], genre: Optional[str],
+                        min_rating: Optional[float], sort_by: str, page: Optional[int], page_size: int, format: str):
+    """/search/ on a coordinator; 503 when no shard responds"""
+    search_args = (q, platform, genre, min_rating, sort_by, page, page_size)
+    key = ('shards', " ".join(q.split()), platform, genre, min_rating, sort_by, page, page_size)
     try:
-        # Get unique genres from the database
-        genres = db.games.distinct("genres")
-        return JSONResponse(
-            content={"genres": sorted(filter(None, genres))},
-            headers={
-                "Access-Control-Allow-Origin": "http://localhost:3000",
-                "Access-Control-Allow-Credentials": "true",
-            }
-        )
+        results, deadline = await search_flights.run(key, lambda: run_admitted(run_sharded_search, *search_args))
+    except ShardsUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Search unavailable: {str(e)}")
+    if format == "ndjson":
+        # The merged page is complete before the first line is sent
+        lines = [game_response.model_dump_json() + "\n" for game_response in results]
+        if deadline.degraded:
+            lines.append(truncated_line(deadline.degraded))
+        headers = {"X-Search-Degraded": ",".join(deadline.degraded)} if deadline.degraded else None
+        return StreamingResponse(iter(lines), media_type="application/x-ndjson", headers=headers)
+    mark_degraded(response, deadline)
+    return results
+
+
+@app.post("/search/batch", response_model=List[List[GameResponse]])
+async def search_games_batch(request: Request, response: Response, batch: BatchSearchRequest,
+                             catalog: Optional[str] = None):
+    # Every query in the batch counts against the client's rate
+    check_rate(request, cost=len(batch.queries))
+    async with catalog_engine(catalog) as engine:
+        results, deadline = await run_admitted(engine.run_search_batch, batch.queries)
+        mark_degraded(response, deadline)
+        return results
+
+
+def check_shard_secret(secret: Optional[str]):
+    """403 unless the request comes from a coordinator (see SHARD_SECRET)"""
+    if not SHARD_SECRET:
+        raise HTTPException(status_code=403, detail="Shard endpoints are disabled; set GAME_SHARD_SECRET")
+    if secret is None or not hmac.compare_digest(secret.encode("utf-8"), SHARD_SECRET.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid shard secret")
+
+
+@app.post("/shard/stats")
+async def shard_stats(request: ShardStatsRequest, catalog: Optional[str] = None,
+                      x_shard_secret: Optional[str] = Header(None)):
+    """Games in this shard and the document frequency of terms, for a coordinator"""
+    check_shard_secret(x_shard_secret)
+    async with catalog_engine(catalog) as engine:
+        return await run_in_threadpool(engine.term_statistics, request.terms)
+
+
+@app.post("/shard/search")
+async def shard_search(request: ShardSearchRequest, catalog: Optional[str] = None,
+                       x_shard_secret: Optional[str] = Header(None)):
+    """
+    A coordinator's search on this shard. Not rate limited (the coordinator
+    was), but admitted like any search, within the coordinator's budget
+    """
+    check_shard_secret(x_shard_secret)
+    async with catalog_engine(catalog) as engine:
+        results, deadline = await run_admitted(engine.run_shard_search, request, budget_ms=request.budget_ms)
+        return {'index_version': engine.index_version, 'results': results, 'degraded': deadline.degraded}
+
+
+@app.get("/metrics/")
+async def get_metrics():
+    return {
+        "admission": admission.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "deadlines": deadline_stats.stats(),
+        "coalescing": search_flights.stats(),
+        "catalogs": catalog_router.stats(),
+        "mongo_pool": mongo.stats(),
+        "shards": shard_coordinator.stats() if shard_coordinator is not None else None,
+        "query_log": query_log.stats() if query_log is not None else None,
+        "caches": dict(shared_resources.stats(), details=detail_cache.stats())
+    }
+
+
+@app.get("/catalogs/")
+async def get_catalogs():
+    try:
+        # Published catalogs and the version of each being served
+        return {"catalogs": await run_in_threadpool(catalog_registry.catalogs)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/game/{game_id}")
-async def get_game(game_id: int):
-    try:
-        game = db.games.find_one({"game_id": game_id})
-        if game:
-            game["_id"] = str(game["_id"])  # Convert ObjectId to string
-            if game.get("released"):
-                game["released"] = game["released"].strftime("%Y-%m-%d")
+@app.get("/platforms/")
+async def get_platforms(catalog: Optional[str] = None):
+    async with catalog_engine(catalog) as engine:
+        try:
+            # Every platform a game references has one entry in the platforms dictionary
+            platforms = engine.dictionaries.platform_names()
+            if not platforms:
+                # Legacy database: games embed their platforms
+                platforms = engine.db.games.distinct("platforms.name")
             return JSONResponse(
-                content=game,
+                content={"platforms": sorted(filter(None, platforms))},
                 headers={
                     "Access-Control-Allow-Origin": "http://localhost:3000",
                     "Access-Control-Allow-Credentials": "true",
                 }
             )
-        raise HTTPException(status_code=404, detail="Game not found")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/genres/")
+async def get_genres(catalog: Optional[str] = None):
+    async with catalog_engine(catalog) as engine:
+        try:
+            # Get unique genres from the database
+            genres = engine.db.games.distinct("genres")
+            return JSONResponse(
+                content={"genres": sorted(filter(None, genres))},
+                headers={
+                    "Access-Control-Allow-Origin": "http://localhost:3000",
+                    "Access-Control-Allow-Credentials": "true",
+                }
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/game/{game_id}/similar", response_model=List[GameResponse])
+async def get_similar_games(game_id: int, limit: int = Query(10, ge=1, le=50), catalog: Optional[str] = None):
+    async with catalog_engine(catalog) as engine:
+        if engine.snapshot is None:
+            raise HTTPException(status_code=503, detail="Similar games require an index snapshot")
+
+        doc_id = engine.snapshot.doc_values.doc_id(game_id)
+        if doc_id is None:
+            raise HTTPException(status_code=404, detail="Game not found")
+
+        docs, similarities = engine.snapshot.similar(doc_id, limit)
+        doc_ids = docs.tolist()
+        games = engine.fetch_chunk(doc_ids) if doc_ids else {}
+
+        results = []
+        for doc, similarity in zip(doc_ids, similarities.tolist()):
+            game = games.get(doc)
+            game_response = game and engine.game_response(game, similarity, [])
+            if game_response:
+                results.append(game_response)
+        return results
+
+
+def build_detail_entry(game: dict, index_version: Optional[str]) -> dict:
+    """Serialize a games document once and derive its validators"""
+    game["_id"] = str(game["_id"])  # Convert ObjectId to string
+    if game.get("released"):
+        game["released"] = game["released"].strftime("%Y-%m-%d")
+    body = json.dumps(game, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    last_modified = None
+    if game.get("updated"):
+        try:
+            updated = datetime.fromisoformat(game["updated"]).replace(tzinfo=timezone.utc)
+            last_modified = format_datetime(updated, usegmt=True)
+        except (TypeError, ValueError):
+            pass
+
+    return {
+        'body': body,
+        'etag': f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+        'last_modified': last_modified,
+        'updated': game.get("updated"),
+        'index_version': index_version,
+        'checked_at': time.monotonic()
+    }
+
+
+def is_not_modified(entry: dict, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == entry['etag'] for tag in tags)
+    if if_modified_since and entry['last_modified']:
+        try:
+            return parsedate_to_datetime(entry['last_modified']) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@app.get("/game/{game_id}")
+async def get_game(game_id: int,
+                   if_none_match: Optional[str] = Header(None),
+                   if_modified_since: Optional[str] = Header(None),
+                   catalog: Optional[str] = None):
+    async with catalog_engine(catalog) as engine:
+        key = (engine.catalog, game_id)
+        try:
+            entry = detail_cache.get(key)
+            if entry is not None and entry['index_version'] != engine.index_version:
+                entry = None
+
+            if entry is not None and time.monotonic() - entry['checked_at'] > DETAIL_CACHE_TTL:
+                # Cheap revalidation: only look at `updated`
+                current = engine.db.games.find_one({"game_id": game_id}, {"updated": 1})
+                if current is None or current.get("updated") != entry['updated']:
+                    detail_cache.pop(key)
+                    entry = None
+                else:
+                    entry['checked_at'] = time.monotonic()
+
+            if entry is None:
+                game = engine.db.games.find_one({"game_id": game_id})
+                if not game:
+                    raise HTTPException(status_code=404, detail="Game not found")
+                game["description"] = engine.describe(game)
+                # Expand platform/tag/store references into full objects
+                game = engine.dictionaries.resolve_game(game, engine.dictionaries.load_requirements(game))
+                entry = build_detail_entry(game, engine.index_version)
+                detail_cache.put(key, entry)
+
+            headers = {
+                "Access-Control-Allow-Origin": "http://localhost:3000",
+                "Access-Control-Allow-Credentials": "true",
+                "ETag": entry['etag'],
+                "Cache-Control": "no-cache",  # Browsers revalidate with the ETag on every view
+            }
+            if entry['last_modified']:
+                headers["Last-Modified"] = entry['last_modified']
+
+            if is_not_modified(entry, if_none_match, if_modified_since):
+                return Response(status_code=304, headers=headers)
+            return Response(content=entry['body'], media_type="application/json", headers=headers)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
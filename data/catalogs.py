@@ -0,0 +1,299 @@
+"""
+Catalogs: separate game indexes kept in one database. Every collection of
+a catalog version is named "<catalog>.v<version>.<collection>"; an ingest
+builds a new version and publishes it when done. A default catalog that was
+never published is read from the unprefixed legacy collections.
+"""
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from dictionaries import DICTIONARY_KINDS, REQUIREMENTS_COLLECTION
+from doc_values import STATIC_PRIOR_COLLECTION
+
+DEFAULT_CATALOG = 'default'
+REGISTRY_COLLECTION = 'catalogs'
+
+# Every collection a catalog version owns
+CATALOG_COLLECTIONS = (
+    'games', 'inverted_index', 'collection_stats', 'ingest_checkpoints', REQUIREMENTS_COLLECTION,
+    STATIC_PRIOR_COLLECTION
+) + DICTIONARY_KINDS
+
+# Catalog names become part of collection names
+_CATALOG_NAME = re.compile(r'[a-z0-9][a-z0-9_-]{0,47}')
+
+
+class UnknownCatalog(KeyError):
+    pass
+
+
+def valid_catalog(name):
+    return bool(_CATALOG_NAME.fullmatch(name or ''))
+
+
+def catalog_snapshot_path(path, catalog):
+    """Index snapshot of a catalog: `path` itself for the default catalog, index.<catalog>.snap beside it otherwise"""
+    if catalog == DEFAULT_CATALOG:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{catalog}{ext}"
+
+
+class CatalogNamespace:
+    """
+    The collections of one catalog version, used like a database:
+    `namespace.games`, `namespace['platforms']`. Version None is the
+    unprefixed legacy layout. `primary_database` is the same database read
+    from the primary when `database` may read from secondaries.
+    """
+
+    def __init__(self, database, catalog, version=None, primary_database=None):
+        self.database = database
+        self.catalog = catalog
+        self.version = version
+        self.primary_database = primary_database
+        self.prefix = f"{catalog}.v{version}." if version is not None else ''
+
+    @property
+    def primary(self):
+        """
+        This namespace read from the primary, for what an engine reads once
+        when it opens a version (statistics, dictionaries): a secondary that
+        is behind may not have a just-published version yet
+        """
+        if self.primary_database is None:
+            return self
+        return CatalogNamespace(self.primary_database, self.catalog, self.version)
+
+    def __getitem__(self, name):
+        return self.database[self.prefix + name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    def __repr__(self):
+        return f"CatalogNamespace({self.catalog!r}, {self.version!r})"
+
+
+class CatalogRegistry:
+    """
+    Catalog versions recorded in `database`. Namespaces are opened on
+    `read_database` when given, e.g. the same database read from
+    secondaries, while the registry itself is always read from `database`.
+    """
+
+    def __init__(self, database, read_database=None):
+        self.database = database
+        self.read_database = read_database if read_database is not None else database
+        self.entries = database[REGISTRY_COLLECTION]
+
+    def namespace(self, catalog, version):
+        primary = self.database if self.read_database is not self.database else None
+        return CatalogNamespace(self.read_database, catalog, version, primary)
+
+    def entry(self, catalog):
+        if not valid_catalog(catalog):
+            raise UnknownCatalog(catalog)
+        return self.entries.find_one({'_id': catalog}) or {}
+
+    def live(self, catalog):
+        """Namespace of the version being served; None if the catalog was never published"""
+        version = self.entry(catalog).get('version')
+        if version is not None:
+            return self.namespace(catalog, version)
+        if catalog == DEFAULT_CATALOG:
+            return self.namespace(catalog, None)
+        return None
+
+    def building(self, catalog):
+        """Namespace of an unfinished build, or None"""
+        version = self.entry(catalog).get('building')
+        return self.namespace(catalog, version) if version is not None else None
+
+    def begin(self, catalog):
+        """Namespace for a new version of `catalog`; an unfinished build is dropped first"""
+        entry = self.entry(catalog)
+        if entry.get('building') is not None:
+            self.drop(self.namespace(catalog, entry['building']))
+        version = max(entry.get('version') or 0, entry.get('building') or 0) + 1
+        self.entries.update_one({'_id': catalog}, {'$set': {'building': version}}, upsert=True)
+        return self.namespace(catalog, version)
+
+    def publish(self, namespace):
+        """
+        Make a finished build the live version. The version it replaces
+        becomes the previous one, kept until the next publish so API
+        processes still serving it have time to move over; the one before
+        that is dropped. Legacy collections are left alone.
+        """
+        entry = self.entry(namespace.catalog)
+        self.entries.update_one(
+            {'_id': namespace.catalog},
+            {'$set': {'version': namespace.version, 'previous': entry.get('version'), 'published_at': datetime.now()},
+             '$unset': {'building': ''}}
+        )
+        retired = entry.get('previous')
+        if retired is not None and retired != namespace.version:
+            self.drop(self.namespace(namespace.catalog, retired))
+
+    def drop(self, namespace):
+        for name in CATALOG_COLLECTIONS:
+            namespace[name].drop()
+        print(f"Dropped catalog {namespace.catalog} version {namespace.version}")
+
+    def catalogs(self):
+        """Published catalogs: name -> live version (None for a legacy default catalog)"""
+        published = {
+            entry['_id']: entry['version']
+            for entry in self.entries.find({'version': {'$ne': None}}, {'version': 1})
+        }
+        published.setdefault(DEFAULT_CATALOG, None)
+        return dict(sorted(published.items()))
+
+
+class CatalogRouter:
+    """
+    One open engine per catalog, opened by `open_engine(namespace)` on the
+    first request for it. A catalog's live version is looked up again at
+    most every `refresh_interval` seconds; a newly published version
+    replaces the engine, and if the lookup fails the open one keeps serving.
+
+    Searches lease the engine they run on (acquire/release). A replaced
+    engine is closed with `close_engine(engine)` once its last lease is
+    released, so its index snapshot isn't unmapped under a running search.
+    """
+
+    def __init__(self, registry, open_engine, refresh_interval=30.0, close_engine=None):
+        self.registry = registry
+        self.open_engine = open_engine
+        self.refresh_interval = refresh_interval
+        self.close_engine = close_engine
+        self._engines = {}  # catalog -> (version, engine, checked at)
+        self._lock = threading.Lock()
+        # Leases and replacements; never held while an engine is opened
+        self._lease_lock = threading.Lock()
+        self._leases = Counter()  # id(engine) -> searches running on it
+        self._retired = {}  # id(engine) -> replaced engine, closed on its last release
+        self.opened = 0
+        self.closed = 0
+
+    def cached(self, catalog):
+        """Engine of `catalog` if it is open and was checked recently, else None"""
+        entry = self._engines.get(catalog)
+        if entry is not None and time.monotonic() - entry[2] < self.refresh_interval:
+            return entry[1]
+        return None
+
+    def get(self, catalog):
+        """Engine serving the live version of `catalog`; blocks while one is opened. Raises UnknownCatalog"""
+        with self._lock:
+            engine = self.cached(catalog)
+            if engine is not None:
+                return engine
+
+            entry = self._engines.get(catalog)
+            try:
+                namespace = self.registry.live(catalog)
+            except UnknownCatalog:
+                raise
+            except Exception as e:
+                if entry is None:
+                    raise
+                print(f"Failed to look up catalog {catalog}, serving version {entry[0]}: {str(e)}")
+                self._engines[catalog] = (entry[0], entry[1], time.monotonic())
+                return entry[1]
+
+            if namespace is None:
+                raise UnknownCatalog(catalog)
+            if entry is not None and entry[0] == namespace.version:
+                engine = entry[1]
+                self._engines[catalog] = (namespace.version, engine, time.monotonic())
+                return engine
+
+            engine = self.open_engine(namespace)
+            self.opened += 1
+            print(f"Serving catalog {catalog} version {namespace.version}")
+            with self._lease_lock:
+                self._engines[catalog] = (namespace.version, engine, time.monotonic())
+                replaced = entry is not None and self._retire(entry[1])
+            if replaced:
+                self._close(entry[1])
+            return engine
+
+    def acquire(self, catalog):
+        """get(), leased until release(engine). Raises UnknownCatalog"""
+        while True:
+            engine = self.get(catalog)
+            with self._lease_lock:
+                # Unless it was replaced (and maybe closed) in the meantime
+                entry = self._engines.get(catalog)
+                if entry is not None and entry[1] is engine:
+                    self._leases[id(engine)] += 1
+                    return engine
+
+    def acquire_cached(self, catalog):
+        """cached(), leased until release(engine) when it isn't None; never blocks on an open"""
+        with self._lease_lock:
+            engine = self.cached(catalog)
+            if engine is not None:
+                self._leases[id(engine)] += 1
+            return engine
+
+    def retain(self, engine):
+        """One more lease on an engine that is already leased"""
+        with self._lease_lock:
+            self._leases[id(engine)] += 1
+
+    def release(self, engine):
+        with self._lease_lock:
+            self._leases[id(engine)] -= 1
+            if self._leases[id(engine)] > 0:
+                return
+            del self._leases[id(engine)]
+            retired = self._retired.pop(id(engine), None) is not None
+        if retired:
+            self._close(engine)
+
+    def _retire(self, engine):
+        """Whether a replaced engine can be closed now; otherwise it is on its last release"""
+        if self._leases[id(engine)] > 0:
+            self._retired[id(engine)] = engine
+            return False
+        del self._leases[id(engine)]
+        return True
+
+    def _close(self, engine):
+        self.closed += 1
+        if self.close_engine is not None:
+            try:
+                self.close_engine(engine)
+            except Exception as e:
+                print(f"Failed to close a replaced engine: {str(e)}")
+
+    def engines(self):
+        """Open engines by catalog"""
+        return {catalog: entry[1] for catalog, entry in self._engines.items()}
+
+    def close(self):
+        """Close every engine, serving or replaced"""
+        with self._lease_lock:
+            engines = [entry[1] for entry in self._engines.values()] + list(self._retired.values())
+            self._engines.clear()
+            self._retired.clear()
+        for engine in engines:
+            self._close(engine)
+
+    def stats(self):
+        return {
+            'open': {catalog: entry[0] for catalog, entry in self._engines.items()},
+            'opened': self.opened,
+            'closed': self.closed,
+            'retired': len(self._retired),
+            'refresh_interval': self.refresh_interval
+        }
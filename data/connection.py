@@ -0,0 +1,236 @@
+"""
+MongoDB connections shared by the API, the ingest and run.py.
+
+Every process keeps one MongoClient, and so one connection pool, per URI
+(get_connection). Its settings come from the environment:
+
+    GAME_MONGO_URI                      mongodb://localhost:27017/
+    GAME_MONGO_DB                       game_search_engine
+    GAME_MONGO_MAX_POOL_SIZE            connections per server (50)
+    GAME_MONGO_MIN_POOL_SIZE            connections kept open while idle (0)
+    GAME_MONGO_MAX_IDLE_MS              idle connections are closed after this (300000)
+    GAME_MONGO_WAIT_QUEUE_TIMEOUT_MS    longest wait for a free connection (2000)
+    GAME_MONGO_CONNECT_TIMEOUT_MS       (5000)
+    GAME_MONGO_SERVER_SELECTION_TIMEOUT_MS  how long to look for a usable server (5000)
+    GAME_MONGO_COMPRESSORS              wire compression, in order of preference (zlib)
+    GAME_MONGO_SEARCH_READ_PREFERENCE   where search traffic reads from (secondaryPreferred)
+    GAME_MONGO_MAX_STALENESS_S          secondaries further behind are not read (-1: no limit)
+
+zlib is always available. zstd and snappy (e.g. GAME_MONGO_COMPRESSORS=
+zstd,zlib) need the `zstandard` and `python-snappy` packages, which are not
+in requirements.txt: install pymongo[zstd] or pymongo[snappy] first;
+compressors that aren't installed are skipped. Writes and the ingest always
+use the primary; search_database() reads from secondaries when the
+deployment has them.
+
+A PoolMonitor on every client counts connection checkouts and how long
+they waited for the pool; /metrics/ reports it.
+"""
+import importlib.util
+import os
+import threading
+import time
+from collections import Counter
+
+from pymongo import MongoClient, monitoring
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+MONGO_URI = os.environ.get('GAME_MONGO_URI', 'mongodb://localhost:27017/')
+MONGO_DB = os.environ.get('GAME_MONGO_DB', 'game_search_engine')
+MAX_POOL_SIZE = int(os.environ.get('GAME_MONGO_MAX_POOL_SIZE', 50))
+MIN_POOL_SIZE = int(os.environ.get('GAME_MONGO_MIN_POOL_SIZE', 0))
+MAX_IDLE_MS = int(os.environ.get('GAME_MONGO_MAX_IDLE_MS', 300000))
+WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('GAME_MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000))
+CONNECT_TIMEOUT_MS = int(os.environ.get('GAME_MONGO_CONNECT_TIMEOUT_MS', 5000))
+SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('GAME_MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+COMPRESSORS = os.environ.get('GAME_MONGO_COMPRESSORS', 'zlib')
+SEARCH_READ_PREFERENCE = os.environ.get('GAME_MONGO_SEARCH_READ_PREFERENCE', 'secondaryPreferred')
+MAX_STALENESS_S = int(os.environ.get('GAME_MONGO_MAX_STALENESS_S', -1))
+
+READ_PREFERENCES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest
+}
+
+# Module providing each compressor; zlib is in the standard library
+_COMPRESSOR_MODULES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': 'zlib'}
+
+# Upper bounds (ms) of the pool wait histogram
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+
+def available_compressors(names=COMPRESSORS):
+    """The compressors in `names` (comma separated) that can be used here, in order"""
+    available = []
+    for name in (name.strip() for name in names.split(',')):
+        if not name:
+            continue
+        module = _COMPRESSOR_MODULES.get(name)
+        if module is None:
+            raise ValueError(f"Unknown compressor: {name}")
+        if importlib.util.find_spec(module) is not None:
+            available.append(name)
+    return available
+
+
+def read_preference(name, max_staleness=-1):
+    if name not in READ_PREFERENCES:
+        raise ValueError(f"Unknown read preference {name!r}; expected one of {', '.join(READ_PREFERENCES)}")
+    if name == 'primary':
+        return Primary()
+    return READ_PREFERENCES[name](max_staleness=max_staleness)
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Connection pool events of one client. A checkout's wait runs from
+    check_out_started to checked_out on the same thread, which is the
+    time spent waiting for a free (or new) connection.
+    """
+
+    def __init__(self):
+        self._started = threading.local()
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.failed = Counter()     # reason -> failed checkouts
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.open_connections = 0
+        self.pools_cleared = 0
+
+    def connection_check_out_started(self, event):
+        self._started.at = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._started, 'at', None)
+        wait_ms = (time.perf_counter() - started) * 1000.0 if started is not None else 0.0
+        bucket = next((i for i, bound in enumerate(WAIT_BUCKETS_MS) if wait_ms <= bound), len(WAIT_BUCKETS_MS))
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += wait_ms
+            self.wait_max = max(self.wait_max, wait_ms)
+            self.wait_histogram[bucket] += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.failed[event.reason] += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self):
+        labels = [f"<={bound}ms" for bound in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+        return {
+            'checkouts': self.checkouts,
+            'failed': dict(self.failed),
+            'wait_avg_ms': self.wait_total / self.checkouts if self.checkouts else 0.0,
+            'wait_max_ms': self.wait_max,
+            'wait_histogram': dict(zip(labels, self.wait_histogram)),
+            'checked_out': self.checked_out,
+            'peak_checked_out': self.peak_checked_out,
+            'open_connections': self.open_connections,
+            'pools_cleared': self.pools_cleared
+        }
+
+
+class MongoConnection:
+    """One MongoClient and its pool; the client is created on first use"""
+
+    def __init__(self, uri=MONGO_URI):
+        self.uri = uri
+        self.compressors = available_compressors()
+        self.search_read_preference = read_preference(SEARCH_READ_PREFERENCE, MAX_STALENESS_S)
+        self.monitor = PoolMonitor()
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                options = dict(
+                    maxPoolSize=MAX_POOL_SIZE,
+                    minPoolSize=MIN_POOL_SIZE,
+                    maxIdleTimeMS=MAX_IDLE_MS,
+                    waitQueueTimeoutMS=WAIT_QUEUE_TIMEOUT_MS,
+                    connectTimeoutMS=CONNECT_TIMEOUT_MS,
+                    serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
+                    event_listeners=[self.monitor]
+                )
+                if self.compressors:
+                    options['compressors'] = ','.join(self.compressors)
+                self._client = MongoClient(self.uri, **options)
+            return self._client
+
+    def database(self, db_name=None):
+        """Database for writes and reads that must see them (the primary)"""
+        return self.client.get_database(db_name or MONGO_DB)
+
+    def search_database(self, db_name=None):
+        """Database for search traffic, read with GAME_MONGO_SEARCH_READ_PREFERENCE"""
+        return self.client.get_database(db_name or MONGO_DB, read_preference=self.search_read_preference)
+
+    def ping(self):
+        """Raises if no server can be reached within the server selection timeout"""
+        self.client.admin.command('ping')
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def stats(self):
+        return dict(
+            self.monitor.stats(),
+            max_pool_size=MAX_POOL_SIZE,
+            compressors=self.compressors,
+            search_read_preference=SEARCH_READ_PREFERENCE
+        )
+
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+
+def get_connection(uri=None):
+    """The process-wide connection to `uri` (GAME_MONGO_URI by default)"""
+    uri = uri or MONGO_URI
+    with _connections_lock:
+        connection = _connections.get(uri)
+        if connection is None:
+            connection = _connections[uri] = MongoConnection(uri)
+        return connection
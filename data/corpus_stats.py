@@ -0,0 +1,95 @@
+"""
+Corpus statistics: number of games, per-term document frequency and field
+lengths.
+
+GameDataProcessor keeps them in memory while games are ingested, so
+weighting a posting needs no query. At the end of a run the totals go to
+collection_stats, and each term's df to its inverted_index document
+(`document_frequency`, indexed), where the API looks up the terms of a
+query and the planner's common terms. One document holding every term
+would outgrow the 16 MB BSON limit on large catalogs.
+"""
+
+
+class CorpusStatistics:
+    def __init__(self, total_docs=0, document_frequency=None, field_lengths=None):
+        self.total_docs = total_docs
+        self.document_frequency = document_frequency or {}  # term -> games containing it in any field
+        self.field_lengths = field_lengths or {}            # field -> tokens over all games
+        self._doc_id = None
+        self._doc_terms = set()
+
+    def add_game(self, doc_id):
+        """
+        Start counting a game's fields. Doc ids are dense and arrive in
+        order; a game counted before (a duplicate in the input) is skipped.
+        """
+        if doc_id < self.total_docs:
+            self._doc_id = None
+            return False
+        self.total_docs = doc_id + 1
+        self._doc_id = doc_id
+        self._doc_terms = set()
+        return True
+
+    def add_field(self, doc_id, field, tokens):
+        """Count the tokens of one field of the game being added"""
+        if doc_id != self._doc_id:
+            return
+        self.field_lengths[field] = self.field_lengths.get(field, 0) + len(tokens)
+        for token in set(tokens) - self._doc_terms:
+            self.document_frequency[token] = self.document_frequency.get(token, 0) + 1
+        self._doc_terms.update(tokens)
+
+    def df(self, term):
+        return self.document_frequency.get(term, 0)
+
+    def avg_field_length(self, field):
+        return self.field_lengths.get(field, 0) / self.total_docs if self.total_docs else 0.0
+
+    def avg_terms_per_game(self):
+        """Distinct indexed terms per game"""
+        return sum(self.document_frequency.values()) / self.total_docs if self.total_docs else 0.0
+
+    def common_terms(self, max_df):
+        """Terms in more than `max_df` of all games"""
+        return [term for term, df in self.document_frequency.items() if df > max_df * self.total_docs]
+
+    def to_document(self):
+        """collection_stats fields: the totals, not the df of every term"""
+        return {
+            'total_games': self.total_docs,
+            'total_terms': len(self.document_frequency),
+            'avg_terms_per_game': self.avg_terms_per_game(),
+            'field_lengths': dict(self.field_lengths),
+            'avg_field_lengths': {field: self.avg_field_length(field) for field in self.field_lengths}
+        }
+
+    @classmethod
+    def from_document(cls, stats):
+        """
+        Statistics from a collection_stats document (empty if it has none).
+        Documents written before df moved to the inverted index also carry
+        every term's df as parallel arrays.
+        """
+        if not stats:
+            return cls()
+        return cls(
+            stats.get('total_games', 0),
+            dict(zip(stats.get('terms', []), stats.get('document_frequencies', []))),
+            dict(stats.get('field_lengths', {}))
+        )
+
+    @classmethod
+    def from_index(cls, inverted_index, total_docs, field_lengths=None):
+        """
+        Rebuild from the inverted index, counting only games below
+        `total_docs`, e.g. to resume an interrupted ingest. Field lengths are
+        not recoverable from postings and are passed in.
+        """
+        document_frequency = {}
+        for term_doc in inverted_index.find({}, {'term': 1, 'game_refs.doc_id': 1}):
+            df = len({ref['doc_id'] for ref in term_doc['game_refs'] if ref['doc_id'] < total_docs})
+            if df:
+                document_frequency[term_doc['term']] = df
+        return cls(total_docs, document_frequency, field_lengths)
@@ -0,0 +1,88 @@
+"""
+Generated game descriptions.
+
+Descriptions are synthesized from name, genres, platforms, rating and tags,
+all of which are indexed under their own fields, so they can be built when a
+game is served instead of being stored and indexed at ingest.
+"""
+
+
+def generate_description(name, genres, platforms, released, rating, metacritic, tags):
+    """
+    Generate a description for a game from its metadata (lists of genre,
+    platform and tag names, `released` as YYYY-MM-DD)
+    """
+    try:
+        # Filter out empty strings
+        genres = [g for g in genres if g]
+        tags = [t for t in tags if t]
+        platforms = [p for p in platforms if p]
+
+        # Start with the game name and basic info
+        description_parts = []
+        if genres:
+            description_parts.append(f"{name} is a {' and '.join(genres[:2])} game")
+        else:
+            description_parts.append(f"{name} is a game")
+
+        # Add release info
+        if released:
+            description_parts.append(f"released on {released}")
+
+        # Add platforms
+        if platforms:
+            platform_text = f"available on {', '.join(platforms[:3])}"
+            if len(platforms) > 3:
+                platform_text += f" and {len(platforms) - 3} other platforms"
+            description_parts.append(platform_text)
+
+        # First sentence
+        description = ' '.join(description_parts) + '.'
+
+        # Add rating info
+        rating_parts = []
+        if rating > 0:
+            rating_parts.append(f"The game has received a user rating of {rating:.1f}/5")
+        if metacritic:
+            rating_parts.append(f"and a Metacritic score of {metacritic}")
+        if rating_parts:
+            description += ' ' + ' '.join(rating_parts) + '.'
+
+        # Add gameplay elements from tags
+        if tags:
+            gameplay_tags = tags[:5]  # Use up to 5 most relevant tags
+            description += f" The gameplay features {', '.join(gameplay_tags[:-1])}"
+            if len(gameplay_tags) > 1:
+                description += f" and {gameplay_tags[-1]}"
+            description += "."
+
+        return description
+
+    except Exception as e:
+        print(f"Error generating description: {str(e)}")
+        return f"{name or 'Unknown Game'} is a video game."  # Fallback description
+
+
+def describe_game(game, dictionaries):
+    """Description of a stored games document, resolving its platform and tag ids"""
+    platforms = []
+    for ref in game.get('platforms', []):
+        if isinstance(ref, dict):
+            entry = dictionaries.get('platforms', ref.get('id')) or ref
+            platforms.append(entry.get('name', ''))
+    tags = []
+    for ref in game.get('tags', []):
+        entry = ref if isinstance(ref, dict) else dictionaries.get('tags', ref)
+        if entry:
+            tags.append(entry.get('name', ''))
+
+    released = game.get('released')
+    return generate_description(
+        game.get('name', ''),
+        game.get('genres', []),
+        platforms,
+        released.strftime('%Y-%m-%d') if released else '',
+        game.get('rating', 0),
+        game.get('metacritic', 0),
+        tags
+    )
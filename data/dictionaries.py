@@ -0,0 +1,143 @@
+"""
+Shared platform, tag and store entries.
+
+Games reference platforms, tags and stores by id instead of embedding the
+same names, slugs and counts thousands of times; the entries live once in the
+`platforms`, `tags` and `stores` collections and are held in memory here.
+Requirements text is per game but large, so it is kept out of `games` in the
+`requirements` collection, deduplicated by content hash, and only read for
+the game detail view.
+"""
+import hashlib
+
+from pymongo import UpdateOne
+
+DICTIONARY_KINDS = ('platforms', 'tags', 'stores')
+REQUIREMENTS_COLLECTION = 'requirements'
+
+
+class Dictionaries:
+    """
+    The entries of one catalog version. A published version's entries
+    don't change (the API opens a new engine, and so new dictionaries,
+    for each version), so an unknown id or name is simply not there.
+    """
+
+    def __init__(self, db=None):
+        self.db = db
+        self.entries = {kind: {} for kind in DICTIONARY_KINDS}
+        self.platform_ids = {}  # platform name -> id
+        self._pending = {kind: {} for kind in DICTIONARY_KINDS}
+        self._pending_requirements = {}
+        self._seen_requirements = set()
+
+    @classmethod
+    def load(cls, db):
+        dictionaries = cls(db)
+        dictionaries.reload()
+        return dictionaries
+
+    def reload(self):
+        for kind in DICTIONARY_KINDS:
+            self.entries[kind] = {
+                doc['_id']: {key: value for key, value in doc.items() if key != '_id'}
+                for doc in self.db[kind].find()
+            }
+        self.platform_ids = {entry['name']: entry_id for entry_id, entry in self.entries['platforms'].items()}
+
+    def get(self, kind, entry_id):
+        return self.entries[kind].get(entry_id)
+
+    def platform_id(self, name):
+        return self.platform_ids.get(name)
+
+    def platform_name(self, platform_id):
+        entry = self.get('platforms', platform_id)
+        return entry['name'] if entry else None
+
+    def platform_names(self):
+        return sorted(entry['name'] for entry in self.entries['platforms'].values())
+
+    # Ingest side
+
+    def intern(self, kind, entry_id, entry):
+        """Register an entry and return the id games should reference it by"""
+        if entry_id is None:
+            entry_id = entry.get('slug') or entry.get('store_slug') or entry.get('name')
+        if self.entries[kind].get(entry_id) != entry:
+            self.entries[kind][entry_id] = entry
+            self._pending[kind][entry_id] = entry
+            if kind == 'platforms':
+                self.platform_ids[entry['name']] = entry_id
+        return entry_id
+
+    def intern_requirements(self, minimum, recommended):
+        """Store a requirements pair once and return its content-hash id (None if empty)"""
+        if not minimum and not recommended:
+            return None
+        requirements_id = hashlib.sha1(f"{minimum}\0{recommended}".encode('utf-8')).hexdigest()
+        if requirements_id not in self._seen_requirements:
+            self._seen_requirements.add(requirements_id)
+            self._pending_requirements[requirements_id] = {'minimum': minimum, 'recommended': recommended}
+        return requirements_id
+
+    def flush(self):
+        """Write entries interned since the last flush"""
+        for kind, pending in self._pending.items():
+            if pending:
+                self.db[kind].bulk_write([
+                    UpdateOne({'_id': entry_id}, {'$set': entry}, upsert=True)
+                    for entry_id, entry in pending.items()
+                ], ordered=False)
+                pending.clear()
+        if self._pending_requirements:
+            self.db[REQUIREMENTS_COLLECTION].bulk_write([
+                UpdateOne({'_id': requirements_id}, {'$setOnInsert': requirements}, upsert=True)
+                for requirements_id, requirements in self._pending_requirements.items()
+            ], ordered=False)
+            self._pending_requirements.clear()
+
+    # Response side
+
+    def resolve_game(self, game, requirements=None):
+        """
+        Expand a games document's references back into the embedded layout
+        (full platform, tag and store objects). `requirements` maps
+        requirements ids to their documents; without it requirements are left out.
+        """
+        platforms = []
+        for ref in game.get('platforms', []):
+            entry = self.get('platforms', ref.get('id')) or {}
+            platform = {
+                'id': ref.get('id'),
+                'name': entry.get('name', ref.get('name', 'Unknown Platform')),
+                'slug': entry.get('slug', ref.get('slug', '')),
+                'released_at': ref.get('released_at')
+            }
+            if requirements is not None and 'requirements_id' not in ref and 'requirements' in ref:
+                # Documents written before normalization embed the requirements
+                platform['requirements'] = ref['requirements']
+            elif requirements is not None:
+                found = requirements.get(ref.get('requirements_id')) or {}
+                platform['requirements'] = {
+                    'minimum': found.get('minimum'),
+                    'recommended': found.get('recommended')
+                }
+            platforms.append(platform)
+
+        game['platforms'] = platforms
+        for kind in ('tags', 'stores'):
+            # Documents written before normalization embed the entries themselves
+            entries = [ref if isinstance(ref, dict) else self.get(kind, ref) for ref in game.get(kind, [])]
+            game[kind] = [entry for entry in entries if entry]
+        return game
+
+    def load_requirements(self, game):
+        """Requirements documents referenced by one game, keyed by id"""
+        requirements_ids = [ref.get('requirements_id') for ref in game.get('platforms', []) if ref.get('requirements_id')]
+        if not requirements_ids:
+            return {}
+        return {
+            doc['_id']: doc
+            for doc in self.db[REQUIREMENTS_COLLECTION].find({'_id': {'$in': requirements_ids}})
+        }
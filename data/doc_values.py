@@ -0,0 +1,272 @@
+"""
+Columnar store of the per-game values that ranking and filtering need.
+
+Every column is a NumPy array indexed by internal document id, so filters,
+sorts and boosts over a candidate set are single vectorized operations and
+never touch the full `games` documents. Multi-valued fields (platforms,
+genres) are stored value-major: for each platform/genre name, the sorted
+array of documents that have it.
+"""
+from datetime import datetime
+
+import numpy as np
+
+MISSING_METACRITIC = -1
+MISSING_RELEASED = np.iinfo(np.int32).min
+
+# Static quality signals of a game, each scaled to 0..1 across the catalog
+# and stored as one byte: how many users added it, how many rated it, its
+# Metacritic score and how recent its release is
+PRIOR_SIGNALS = ('popularity', 'ratings', 'metacritic', 'freshness')
+PRIOR_LEVELS = 255
+
+# The prior of a catalog is stored outside collection_stats, in documents of
+# PRIOR_CHUNK_DOCS games each (4 MB), so no catalog size runs into the 16 MB
+# BSON document limit
+STATIC_PRIOR_COLLECTION = 'static_prior'
+PRIOR_CHUNK_DOCS = 1 << 20
+
+# A game released this long before the newest one in the catalog gets half its freshness
+FRESHNESS_HALF_LIFE_DAYS = 730
+
+EPOCH = datetime(1970, 1, 1)
+
+# Facets that can be filtered on and where their values live in a game document
+FACETS = ('platform', 'genre')
+
+# Only what the columns need when reading games back from MongoDB
+DOC_VALUES_PROJECTION = {
+    'game_id': 1, 'doc_id': 1, 'rating': 1, 'metacritic': 1, 'released': 1, 'added': 1,
+    'ratings_count': 1, 'platforms.id': 1, 'genres': 1
+}
+
+
+def _facet_values(game_doc, facet, platform_name=None):
+    if facet == 'platform':
+        # Games reference platforms by id; `platform_name` resolves the id to its name
+        names = []
+        for p in game_doc.get('platforms', []):
+            if not isinstance(p, dict):
+                continue
+            name = p.get('name') or (platform_name(p.get('id')) if platform_name else None)
+            if name:
+                names.append(name)
+        return names
+    if facet == 'genre':
+        return [g for g in game_doc.get('genres', []) if g]
+    return []
+
+
+def static_prior(added, ratings_count, metacritic, released):
+    """(docs, len(PRIOR_SIGNALS)) uint8 matrix of the static quality signals"""
+    def log_scaled(counts):
+        counts = np.log1p(np.maximum(counts, 0).astype(np.float64))
+        top = counts.max() if len(counts) else 0.0
+        return counts / top if top > 0 else counts
+
+    metacritic = np.asarray(metacritic)
+    released = np.asarray(released)
+    known = released != MISSING_RELEASED
+    freshness = np.zeros(len(released))
+    if known.any():
+        age = released[known].max() - released[known].astype(np.int64)
+        freshness[known] = 0.5 ** (age / FRESHNESS_HALF_LIFE_DAYS)
+
+    signals = np.column_stack([
+        log_scaled(np.asarray(added)),
+        log_scaled(np.asarray(ratings_count)),
+        np.where(metacritic != MISSING_METACRITIC, metacritic / 100.0, 0.0),
+        freshness
+    ]).reshape(len(released), len(PRIOR_SIGNALS))
+    return np.rint(np.clip(signals, 0.0, 1.0) * PRIOR_LEVELS).astype(np.uint8)
+
+
+def prior_documents(prior):
+    """STATIC_PRIOR_COLLECTION documents of a prior matrix, in doc_id order"""
+    for chunk, start in enumerate(range(0, len(prior), PRIOR_CHUNK_DOCS)):
+        yield {'_id': chunk, 'start': start, 'prior': prior[start:start + PRIOR_CHUNK_DOCS].tobytes()}
+
+
+def prior_from_documents(documents):
+    """Prior matrix from its STATIC_PRIOR_COLLECTION documents; None if there are none"""
+    chunks = [document['prior'] for document in sorted(documents, key=lambda document: document['_id'])]
+    if not chunks:
+        return None
+    return np.frombuffer(b''.join(chunks), dtype=np.uint8).reshape(-1, len(PRIOR_SIGNALS))
+
+
+def parse_boosts(text):
+    """'popularity=0.3,freshness=0.1' -> {'popularity': 0.3, 'freshness': 0.1}"""
+    boosts = {}
+    for item in (text or '').split(','):
+        if not item.strip():
+            continue
+        signal, _, weight = item.partition('=')
+        boosts[signal.strip()] = float(weight)
+    return boosts
+
+
+def prior_weights(boosts):
+    """Per-signal weights (over the uint8 prior) for a {signal: weight} mapping; None if all are zero"""
+    unknown = set(boosts or {}) - set(PRIOR_SIGNALS)
+    if unknown:
+        raise ValueError(f"Unknown boost signals: {', '.join(sorted(unknown))}")
+    weights = np.array([(boosts or {}).get(signal, 0.0) for signal in PRIOR_SIGNALS], dtype=np.float64)
+    if not weights.any():
+        return None
+    return weights / PRIOR_LEVELS
+
+
+def boost_scores(prior, docs, scores, weights):
+    """
+    Relevance scores scaled by the docs' static prior: score * (1 + sum of
+    weight * signal). Docs outside `prior` are left unboosted.
+    """
+    docs = np.asarray(docs, dtype=np.int64)
+    boost = np.ones(len(docs), dtype=np.float64)
+    known = docs < len(prior)
+    boost[known] += prior[docs[known]] @ weights
+    return scores * boost
+
+
+class DocValues:
+    def __init__(self, game_ids, rating, metacritic, released, added, prior, facets):
+        self.game_ids = game_ids        # int64, internal doc id -> RAWG game_id
+        self.rating = rating            # float32, NaN when missing
+        self.metacritic = metacritic    # int16, MISSING_METACRITIC when missing
+        self.released = released        # int32 days since 1970-01-01, MISSING_RELEASED when missing
+        self.added = added              # int32
+        self.prior = prior              # uint8 (docs, len(PRIOR_SIGNALS)), see static_prior
+        # facet -> (names, offsets, docs); docs of names[i] are docs[offsets[i]:offsets[i + 1]]
+        self.facets = facets
+        self._facet_lookup = {
+            facet: {name: i for i, name in enumerate(names)}
+            for facet, (names, _, _) in facets.items()
+        }
+        self._game_order = None
+
+    def __len__(self):
+        return len(self.game_ids)
+
+    def doc_id(self, game_id):
+        """Internal doc id of a RAWG game_id, or None"""
+        if self._game_order is None:
+            self._game_order = np.argsort(self.game_ids, kind='stable')
+        position = np.searchsorted(self.game_ids, game_id, sorter=self._game_order)
+        if position < len(self.game_ids) and self.game_ids[self._game_order[position]] == game_id:
+            return int(self._game_order[position])
+        return None
+
+    def facet_docs(self, facet, value):
+        """Sorted doc ids that have `value` for `facet` (empty if the value is unknown)"""
+        names, offsets, docs = self.facets[facet]
+        index = self._facet_lookup[facet].get(value)
+        if index is None:
+            return docs[:0]
+        return docs[offsets[index]:offsets[index + 1]]
+
+    def filter(self, docs, platform=None, genre=None, min_rating=None):
+        """Boolean mask over `docs` (sorted, unique) of the documents passing every filter"""
+        mask = np.ones(len(docs), dtype=bool)
+        if platform:
+            mask &= np.isin(docs, self.facet_docs('platform', platform), assume_unique=True)
+        if genre:
+            mask &= np.isin(docs, self.facet_docs('genre', genre), assume_unique=True)
+        if min_rating:
+            # NaN (missing rating) compares False, matching a $gte filter on a missing field
+            mask &= self.rating[docs] >= min_rating
+        return mask
+
+    def sort_order(self, docs, scores, sort_by='relevance'):
+        """
+        Permutation of `docs` for the requested order. Ties fall back to
+        descending relevance score.
+        """
+        if sort_by == 'rating':
+            rating = np.nan_to_num(self.rating[docs], nan=0.0)
+            return np.lexsort((-scores, -rating))
+        if sort_by == 'release_date':
+            released = self.released[docs].astype(np.int64)
+            return np.lexsort((-scores, -released))
+        return np.argsort(-scores, kind='stable')
+
+
+class DocValuesBuilder:
+    """
+    Accumulates columns while games are ingested. Internal doc ids are
+    assigned densely in insertion order; documents that already carry a
+    `doc_id` (read back from the games collection) must arrive in doc_id order.
+    """
+
+    def __init__(self, platform_name=None):
+        self.platform_name = platform_name
+        self.doc_ids = {}
+        self.game_ids = []
+        self.rating = []
+        self.metacritic = []
+        self.released = []
+        self.added = []
+        self.ratings_count = []
+        self.facet_values = {facet: {} for facet in FACETS}
+
+    def __len__(self):
+        return len(self.game_ids)
+
+    def add(self, game_doc):
+        """Add one processed game document and return its internal doc id"""
+        game_id = game_doc['game_id']
+        if game_id in self.doc_ids:
+            return self.doc_ids[game_id]
+
+        doc_id = len(self.game_ids)
+        if game_doc.get('doc_id', doc_id) != doc_id:
+            raise ValueError(f"Game {game_id} has doc_id {game_doc['doc_id']}, expected {doc_id}")
+        self.doc_ids[game_id] = doc_id
+        self.game_ids.append(game_id)
+
+        rating = game_doc.get('rating')
+        self.rating.append(float(rating) if rating is not None else np.nan)
+        metacritic = game_doc.get('metacritic')
+        self.metacritic.append(metacritic if metacritic is not None else MISSING_METACRITIC)
+        released = game_doc.get('released')
+        self.released.append((released - EPOCH).days if released else MISSING_RELEASED)
+        self.added.append(game_doc.get('added') or 0)
+        self.ratings_count.append(game_doc.get('ratings_count') or 0)
+
+        for facet in FACETS:
+            for value in set(_facet_values(game_doc, facet, self.platform_name)):
+                self.facet_values[facet].setdefault(value, []).append(doc_id)
+        return doc_id
+
+    def build(self):
+        facets = {}
+        for facet, values in self.facet_values.items():
+            names = sorted(values)
+            offsets = np.zeros(len(names) + 1, dtype=np.uint64)
+            docs = []
+            for i, name in enumerate(names):
+                docs.extend(values[name])
+                offsets[i + 1] = len(docs)
+            # Doc ids are appended in increasing order, so each block is already sorted
+            facets[facet] = (names, offsets, np.array(docs, dtype=np.uint32))
+
+        metacritic = np.array(self.metacritic, dtype=np.int16)
+        released = np.array(self.released, dtype=np.int32)
+        added = np.array(self.added, dtype=np.int32)
+        return DocValues(
+            game_ids=np.array(self.game_ids, dtype=np.int64),
+            rating=np.array(self.rating, dtype=np.float32),
+            metacritic=metacritic,
+            released=released,
+            added=added,
+            prior=static_prior(added, np.array(self.ratings_count, dtype=np.int64), metacritic, released),
+            facets=facets
+        )
+
+    @classmethod
+    def from_games(cls, games, platform_name=None):
+        """Build from an iterable of game documents, e.g. a `games` collection cursor"""
+        builder = cls(platform_name)
+        for game_doc in games:
+            builder.add(game_doc)
+        return builder
@@ -0,0 +1,195 @@
+"""
+Impact-ordered, quantized postings for budgeted top-k serving: a plain
+relevance query is answered from the heads of its terms' lists, sorted by
+descending score, reading at most a byte budget. Results are approximate;
+ranking_divergence() measures how far against exact scoring.
+"""
+import math
+import random
+import time
+
+import numpy as np
+
+from query_language import ALL_FIELDS, BooleanQuery, QueryEvaluator, QueryResult, TermQuery
+
+IMPACT_LEVELS = 255
+
+# uint32 doc id + uint8 impact
+IMPACT_POSTING_BYTES = 5
+
+
+def impact_sections(posting_offsets, posting_docs, posting_scores):
+    """Snapshot sections holding impact-ordered copies of doc-ordered posting lists"""
+    offsets = np.asarray(posting_offsets, dtype=np.int64)
+    docs = np.asarray(posting_docs, dtype=np.uint32)
+    scores = np.asarray(posting_scores, dtype=np.float32)
+    lengths = np.diff(offsets)
+    term_of = np.repeat(np.arange(len(lengths)), lengths)
+
+    # Highest score first within each term; lower doc id breaks ties
+    order = np.lexsort((docs, -scores, term_of))
+
+    max_scores = np.zeros(len(lengths), dtype=np.float32)
+    nonempty = lengths > 0
+    if nonempty.any():
+        max_scores[nonempty] = np.maximum.reduceat(scores, offsets[:-1][nonempty])
+    scales = np.where(max_scores > 0, max_scores / IMPACT_LEVELS, 1.0).astype(np.float32)
+
+    impacts = np.clip(np.rint(scores[order] / scales[term_of]), 0, IMPACT_LEVELS).astype(np.uint8)
+    return {
+        'impact_docs': docs[order],
+        'impact_scores': impacts,
+        'impact_scales': scales
+    }
+
+
+def disjunctive_terms(query):
+    """Terms of a plain OR query (no fields, no required or excluded clauses), else None"""
+    if isinstance(query, TermQuery):
+        return [query.term] if query.fields == ALL_FIELDS else None
+    if query.must or query.must_not:
+        return None
+    terms = []
+    for child in query.should:
+        if not isinstance(child, TermQuery) or child.fields != ALL_FIELDS:
+            return None
+        terms.append(child.term)
+    return terms
+
+
+def allocate_budget(lengths, budget):
+    """
+    Postings to read from each list: lists shorter than an even share are
+    read whole and what they leave is shared among the longer ones
+    """
+    take = [0] * len(lengths)
+    remaining = budget
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    for position, i in enumerate(order):
+        take[i] = min(lengths[i], remaining // (len(order) - position))
+        remaining -= take[i]
+    return take
+
+
+class ImpactScorer:
+    def __init__(self, snapshot, budget_bytes):
+        self.snapshot = snapshot
+        self.budget_bytes = budget_bytes
+        self.budget = max(1, budget_bytes // IMPACT_POSTING_BYTES)  # postings per query
+
+    def covers(self, terms, k):
+        """
+        Whether the budget reaches the top `k` of an OR over `terms`: every
+        list gets at least an even share, so at least that many games are
+        read unless fewer match
+        """
+        return k <= self.budget // max(1, len(terms))
+
+    def score(self, terms):
+        """
+        Approximate QueryResult of an OR over `terms` from the heads of their
+        impact lists, with the number of postings read
+        """
+        term_ids = {}
+        for term in terms:
+            term_id = self.snapshot.term_id(term)
+            if term_id is not None:
+                term_ids.setdefault(term, term_id)
+
+        lengths = [self.snapshot.document_frequency(term_id) for term_id in term_ids.values()]
+        heads = [
+            self.snapshot.impact_postings(term_id, limit)
+            for term_id, limit in zip(term_ids.values(), allocate_budget(lengths, self.budget))
+        ]
+        postings_read = sum(len(docs) for docs, _ in heads)
+        if not postings_read:
+            return QueryResult(np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.float64), {}), 0
+
+        all_docs = np.concatenate([docs for docs, _ in heads])
+        all_scores = np.concatenate([scores for _, scores in heads])
+        docs, inverse = np.unique(all_docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=all_scores, minlength=len(docs))
+
+        matched = {}
+        start = 0
+        for term, (head_docs, _) in zip(term_ids, heads):
+            mask = np.zeros(len(docs), dtype=bool)
+            mask[inverse[start:start + len(head_docs)]] = True
+            matched[term] = mask
+            start += len(head_docs)
+        return QueryResult(docs, scores, matched), postings_read
+
+
+def _exact_postings(snapshot):
+    def postings(term):
+        term_id = snapshot.term_id(term)
+        if term_id is None:
+            return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.uint8)
+        return snapshot.postings(term_id)
+    return postings
+
+
+def sample_queries(snapshot, count=200, seed=42, max_terms=3):
+    """Random 1..max_terms term queries over terms that occur in at least two games"""
+    rng = random.Random(seed)
+    candidates = [
+        term_id for term_id in range(snapshot.term_count)
+        if snapshot.document_frequency(term_id) >= 2
+    ]
+    if not candidates:
+        return []
+    return [
+        [snapshot.term(term_id) for term_id in rng.sample(candidates, min(len(candidates), rng.randint(1, max_terms)))]
+        for _ in range(count)
+    ]
+
+
+def ranking_divergence(snapshot, queries, k=10, budget_bytes=64 * 1024):
+    """
+    Compare budgeted impact top-k against exact float scoring for term
+    queries (lists of terms). Per query: overlap of the two top-k sets,
+    nDCG@k of the approximate ranking with exact scores as gains, and the
+    share of posting bytes read.
+    """
+    scorer = ImpactScorer(snapshot, budget_bytes)
+    evaluator = QueryEvaluator(_exact_postings(snapshot))
+
+    per_query = []
+    exact_ms = []
+    impact_ms = []
+    for terms in queries:
+        start = time.perf_counter()
+        exact = evaluator.evaluate(BooleanQuery(should=[TermQuery(term) for term in terms]))
+        exact_top = exact.docs[np.argsort(-exact.scores, kind='stable')[:k]]
+        exact_ms.append((time.perf_counter() - start) * 1000.0)
+        if len(exact_top) == 0:
+            continue
+
+        start = time.perf_counter()
+        approx, postings_read = scorer.score(terms)
+        approx_top = approx.docs[np.argsort(-approx.scores, kind='stable')[:k]]
+        impact_ms.append((time.perf_counter() - start) * 1000.0)
+
+        exact_scores = dict(zip(exact.docs.tolist(), exact.scores.tolist()))
+        gains = [exact_scores.get(doc, 0.0) for doc in approx_top.tolist()]
+        ideal = [exact_scores[doc] for doc in exact_top.tolist()]
+
+        def dcg(values):
+            return sum(value / math.log2(rank + 2) for rank, value in enumerate(values))
+
+        total_postings = sum(len(evaluator.postings(term)[0]) for term in terms)
+        per_query.append({
+            'terms': terms,
+            'overlap': len(set(approx_top.tolist()) & set(exact_top.tolist())) / len(exact_top),
+            'ndcg': dcg(gains) / dcg(ideal) if dcg(ideal) > 0 else 1.0,
+            'read_fraction': postings_read / total_postings if total_postings else 1.0
+        })
+
+    summary = {
+        name: sum(query[name] for query in per_query) / len(per_query) if per_query else 0.0
+        for name in ('overlap', 'ndcg', 'read_fraction')
+    }
+    summary['queries'] = len(per_query)
+    summary['exact_ms'] = sum(exact_ms) / len(exact_ms) if exact_ms else 0.0
+    summary['impact_ms'] = sum(impact_ms) / len(impact_ms) if impact_ms else 0.0
+    return summary, per_query
@@ -0,0 +1,305 @@
+"""
+Memory-mapped snapshot of the search index, written by
+GameDataProcessor.export_snapshot: term dictionary, postings, doc-value
+columns and similar games in one read-only file shared by every API worker.
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from doc_values import DocValues, FACETS, PRIOR_SIGNALS
+from similarity import NO_NEIGHBOUR
+
+SNAPSHOT_MAGIC = b'GSIDXSNP'
+SNAPSHOT_VERSION = 5
+
+# Little-endian: header (magic, version, section count), a section table
+# (name, offset, length, CRC32 per section), the CRC32 of both, then the
+# sections, 8-byte aligned
+HEADER = struct.Struct('<8sII')
+SECTION_ENTRY = struct.Struct('<16sQQI4x')
+CHECKSUM = struct.Struct('<I')
+ALIGNMENT = 8
+
+# Fields a term can come from; a posting stores them as a bitmask
+FIELDS = ('name', 'description', 'tag', 'genre', 'platform')
+FIELD_BITS = {field: 1 << i for i, field in enumerate(FIELDS)}
+
+# Section name -> NumPy dtype ('json' and 'bytes' sections are not arrays)
+SECTIONS = {
+    'meta': 'json',
+    'term_bytes': 'bytes',        # concatenated UTF-8 terms, sorted
+    'term_offsets': '<u4',        # term i is term_bytes[term_offsets[i]:term_offsets[i + 1]]
+    'posting_offsets': '<u8',     # postings of term i are [posting_offsets[i], posting_offsets[i + 1])
+    'posting_docs': '<u4',        # internal doc ids, ascending within a term
+    'posting_scores': '<f4',      # summed field-weighted tf-idf of the term in the doc
+    'posting_fields': 'u1',       # FIELD_BITS of the fields the term appeared in
+    # The same postings by descending score, quantized; see impact_index.py
+    'impact_docs': '<u4',
+    'impact_scores': 'u1',        # score ~= impact * impact_scales[term]
+    'impact_scales': '<f4',
+    # Doc-value columns, see doc_values.DocValues
+    'doc_game_ids': '<i8',
+    'doc_rating': '<f4',
+    'doc_metacritic': '<i2',
+    'doc_released': '<i4',
+    'doc_added': '<i4',
+    'doc_prior': 'u1',            # len(PRIOR_SIGNALS) static quality signals per doc
+    # Facet blocks; value names are listed in meta['facets']
+    'platform_offsets': '<u8',
+    'platform_docs': '<u4',
+    'genre_offsets': '<u8',
+    'genre_docs': '<u4',
+    # Precomputed neighbours, meta['similar_top_n'] per doc, see similarity.py
+    'similar_docs': '<u4',
+    'similar_scores': '<f4'
+}
+
+
+def doc_value_sections(doc_values):
+    """Snapshot sections (and the meta entry) holding a DocValues store"""
+    sections = {
+        'doc_game_ids': doc_values.game_ids,
+        'doc_rating': doc_values.rating,
+        'doc_metacritic': doc_values.metacritic,
+        'doc_released': doc_values.released,
+        'doc_added': doc_values.added,
+        'doc_prior': doc_values.prior.ravel()
+    }
+    facet_names = {}
+    for facet in FACETS:
+        names, offsets, docs = doc_values.facets[facet]
+        facet_names[facet] = names
+        sections[f'{facet}_offsets'] = offsets
+        sections[f'{facet}_docs'] = docs
+    return sections, facet_names
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _as_bytes(kind, value):
+    if kind == 'json':
+        return json.dumps(value).encode('utf-8')
+    if kind == 'bytes':
+        return bytes(value)
+    return np.ascontiguousarray(value, dtype=kind).tobytes()
+
+
+def write_snapshot(path, sections):
+    """
+    Write a snapshot atomically. `sections` maps every name in SECTIONS to
+    its value (dict for json, bytes, or an array-like of numbers).
+    Processes still mapping the previous file keep reading it until they
+    reopen, because the new file replaces it with a rename.
+    """
+    missing = set(SECTIONS) - set(sections)
+    if missing:
+        raise SnapshotError(f"Missing snapshot sections: {', '.join(sorted(missing))}")
+
+    payloads = [(name, _as_bytes(SECTIONS[name], sections[name])) for name in SECTIONS]
+
+    table_size = HEADER.size + SECTION_ENTRY.size * len(payloads) + CHECKSUM.size
+    offset = table_size + (-table_size % ALIGNMENT)
+    entries = []
+    for name, payload in payloads:
+        entries.append((name, offset, len(payload), zlib.crc32(payload)))
+        offset += len(payload)
+        offset += -offset % ALIGNMENT
+
+    header = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(entries))
+    header += b''.join(
+        SECTION_ENTRY.pack(name.encode('ascii'), section_offset, length, crc)
+        for name, section_offset, length, crc in entries
+    )
+    header += CHECKSUM.pack(zlib.crc32(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(header)
+        for (name, payload), (_, section_offset, _, _) in zip(payloads, entries):
+            file.write(b'\0' * (section_offset - file.tell()))
+            file.write(payload)
+        file.write(b'\0' * (offset - file.tell()))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class IndexSnapshot:
+    """
+    Read-only view over a snapshot file. Arrays are zero-copy NumPy views
+    into the mapping, so opening is O(number of sections). Section CRCs are
+    only checked by verify(), which reads the whole file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f"Snapshot {path} is empty")
+
+        self.sections = self._read_section_table()
+        self.meta = json.loads(self._section_bytes('meta'))
+
+        self._term_bytes_offset = self.sections['term_bytes'][0]
+        self.term_offsets = self._section_array('term_offsets')
+        self.posting_offsets = self._section_array('posting_offsets')
+        self.posting_docs = self._section_array('posting_docs')
+        self.posting_scores = self._section_array('posting_scores')
+        self.posting_fields = self._section_array('posting_fields')
+        self.impact_docs = self._section_array('impact_docs')
+        self.impact_scores = self._section_array('impact_scores')
+        self.impact_scales = self._section_array('impact_scales')
+        self.doc_values = DocValues(
+            game_ids=self._section_array('doc_game_ids'),
+            rating=self._section_array('doc_rating'),
+            metacritic=self._section_array('doc_metacritic'),
+            released=self._section_array('doc_released'),
+            added=self._section_array('doc_added'),
+            prior=self._section_array('doc_prior').reshape(-1, len(PRIOR_SIGNALS)),
+            facets={
+                facet: (
+                    self.meta['facets'][facet],
+                    self._section_array(f'{facet}_offsets'),
+                    self._section_array(f'{facet}_docs')
+                )
+                for facet in FACETS
+            }
+        )
+
+        self.similar_top_n = self.meta.get('similar_top_n', 0)
+        self.similar_docs = self._section_array('similar_docs')
+        self.similar_scores = self._section_array('similar_scores')
+
+        self.term_count = len(self.term_offsets) - 1
+        self.doc_count = len(self.doc_values)
+
+    def _read_section_table(self):
+        if len(self._mmap) < HEADER.size:
+            raise SnapshotError(f"Snapshot {self.path} is truncated")
+        magic, version, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"{self.path} is not an index snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(
+                f"Snapshot {self.path} has format version {version}, expected {SNAPSHOT_VERSION}"
+            )
+
+        table_end = HEADER.size + SECTION_ENTRY.size * count
+        (stored_crc,) = CHECKSUM.unpack_from(self._mmap, table_end)
+        if zlib.crc32(self._mmap[:table_end]) != stored_crc:
+            raise SnapshotError(f"Snapshot {self.path} has a corrupt header")
+
+        sections = {}
+        for i in range(count):
+            name, offset, length, crc = SECTION_ENTRY.unpack_from(
+                self._mmap, HEADER.size + i * SECTION_ENTRY.size
+            )
+            if offset + length > len(self._mmap):
+                raise SnapshotError(f"Snapshot {self.path} is truncated")
+            sections[name.rstrip(b'\0').decode('ascii')] = (offset, length, crc)
+
+        missing = set(SECTIONS) - set(sections)
+        if missing:
+            raise SnapshotError(f"Snapshot {self.path} is missing sections: {', '.join(sorted(missing))}")
+        return sections
+
+    def _section_bytes(self, name):
+        offset, length, _ = self.sections[name]
+        return self._mmap[offset:offset + length]
+
+    def _section_array(self, name):
+        offset, length, _ = self.sections[name]
+        dtype = np.dtype(SECTIONS[name])
+        return np.frombuffer(self._mmap, dtype=dtype, count=length // dtype.itemsize, offset=offset)
+
+    def verify(self):
+        """Check every section against its CRC32; raises SnapshotError on mismatch"""
+        for name, (offset, length, crc) in self.sections.items():
+            if zlib.crc32(self._mmap[offset:offset + length]) != crc:
+                raise SnapshotError(f"Snapshot {self.path} section '{name}' failed its checksum")
+        return True
+
+    def _term_key(self, term_id):
+        start = self._term_bytes_offset + int(self.term_offsets[term_id])
+        end = self._term_bytes_offset + int(self.term_offsets[term_id + 1])
+        return self._mmap[start:end]
+
+    def term(self, term_id):
+        return self._term_key(term_id).decode('utf-8')
+
+    def term_id(self, term):
+        """Binary search the sorted term dictionary; None if the term is unknown"""
+        key = term.encode('utf-8')
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.term_count and self._term_key(lo) == key:
+            return lo
+        return None
+
+    def postings(self, term_id):
+        """(doc ids, scores, field masks) of one term as zero-copy array slices"""
+        start = int(self.posting_offsets[term_id])
+        end = int(self.posting_offsets[term_id + 1])
+        return (
+            self.posting_docs[start:end],
+            self.posting_scores[start:end],
+            self.posting_fields[start:end]
+        )
+
+    def document_frequency(self, term_id):
+        return int(self.posting_offsets[term_id + 1] - self.posting_offsets[term_id])
+
+    def impact_postings(self, term_id, limit=None):
+        """
+        Up to `limit` highest-scoring postings of a term: (doc ids, dequantized
+        scores). Only that head of the impact list is read.
+        """
+        start = int(self.posting_offsets[term_id])
+        end = int(self.posting_offsets[term_id + 1])
+        if limit is not None:
+            end = min(end, start + limit)
+        scale = float(self.impact_scales[term_id])
+        return self.impact_docs[start:end], self.impact_scores[start:end] * scale
+
+    def common_terms(self, max_df):
+        """Terms whose postings cover more than `max_df` of all documents"""
+        document_frequency = np.diff(self.posting_offsets)
+        return [self.term(int(term_id)) for term_id in np.flatnonzero(document_frequency > max_df * self.doc_count)]
+
+    def similar(self, doc, limit=None):
+        """Precomputed most similar docs of `doc` and their cosine similarity, best first"""
+        start = doc * self.similar_top_n
+        end = start + min(limit or self.similar_top_n, self.similar_top_n)
+        docs = self.similar_docs[start:end]
+        found = docs != NO_NEIGHBOUR
+        return docs[found], self.similar_scores[start:end][found]
+
+    def close(self):
+        # Drop our views first; the mapping can only be closed once no
+        # array references it
+        self.term_offsets = self.posting_offsets = None
+        self.posting_docs = self.posting_scores = self.posting_fields = None
+        self.impact_docs = self.impact_scores = self.impact_scales = None
+        self.similar_docs = self.similar_scores = None
+        self.doc_values = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Callers still hold arrays from this snapshot; the mapping goes away with them
+            pass
+        self._file.close()
@@ -1,5 +1,6 @@
-from pymongo import MongoClient
+from pymongo import ReplaceOne, UpdateOne
 import json
+import hashlib
 from datetime import datetime
 import re
 import nltk
@@ -7,6 +8,20 @@ from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem import PorterStemmer
 import math
+import argparse
+import sys
+from contextlib import nullcontext
+from connection import get_connection
+from catalogs import CATALOG_COLLECTIONS, DEFAULT_CATALOG, CatalogRegistry, catalog_snapshot_path
+from corpus_stats import CorpusStatistics
+from dictionaries import Dictionaries
+from descriptions import generate_description
+from doc_values import DocValuesBuilder, DOC_VALUES_PROJECTION, STATIC_PRIOR_COLLECTION, prior_documents
+from index_snapshot import write_snapshot, doc_value_sections, IndexSnapshot, FIELD_BITS
+from impact_index import impact_sections
+from profiling import Profile, stage
+from sharding import parse_shard, shard_of
+from similarity import SIMILARITY_FIELDS, build_game_vectors, top_neighbours
 
 # Download required NLTK data
 nltk.download('punkt')
@@ -14,13 +29,18 @@ nltk.download('stopwords')
 
 
 class GameDataProcessor:
-    def __init__(self):
-        # MongoDB connection
-        self.client = MongoClient('mongodb://localhost:27017/')
-        self.db = self.client['game_search_engine']
-        self.games_collection = self.db['games']
-        self.inverted_index = self.db['inverted_index']
-        self.collection_stats = self.db['collection_stats']
+    def __init__(self, mongo_uri=None, db_name=None, catalog=DEFAULT_CATALOG, shard=None):
+        # MongoDB connection (see connection.py); defaults come from GAME_MONGO_URI and GAME_MONGO_DB
+        self.connection = get_connection(mongo_uri)
+        self.client = self.connection.client
+        self.catalog = catalog
+        # (index, count): only ingest the games of one shard (see sharding.py)
+        self.shard = shard
+        self.registry = CatalogRegistry(self.connection.database(db_name))
+        # Collections of the catalog version being built, or of the live one
+        # until an ingest starts (see catalogs.py)
+        self.use_namespace(self.registry.building(catalog) or self.registry.live(catalog)
+                           or self.registry.namespace(catalog, 1))
 
         # Text processing tools
         self.stemmer = PorterStemmer()
@@ -38,37 +58,62 @@ class GameDataProcessor:
         # Batch size for processing
         self.batch_size = 100
 
+        # Leave generated descriptions out of games and the inverted index;
+        # the API generates them when games are served
+        self.lazy_descriptions = False
+
+        # Number of precomputed similar games kept per game
+        self.similar_top_n = 10
+
+        # Platforms, tags and stores shared by many games, stored once
+        self.dictionaries = Dictionaries(self.db)
+
+        # Ranking/filter columns, filled in as games are ingested
+        self.doc_values = DocValuesBuilder(self.dictionaries.platform_name)
+
+        # N, document frequencies and field lengths, kept in memory during ingest
+        self.corpus_stats = CorpusStatistics()
+
+    def use_namespace(self, namespace):
+        self.db = namespace
+        self.games_collection = self.db['games']
+        self.inverted_index = self.db['inverted_index']
+        self.collection_stats = self.db['collection_stats']
+        self.ingest_checkpoints = self.db['ingest_checkpoints']
+
     def normalize_text(self, text):
         if not text:
             return []
-        # Convert to lowercase
-        text = text.lower()
-        # Remove special characters but keep hyphens for compound words
-        text = re.sub(r'[^a-zA-Z0-9\s-]', '', text)
-        # Replace hyphens with spaces to handle hyphenated words
-        text = text.replace('-', ' ')
-        # Tokenize
-        tokens = word_tokenize(text)
+        with stage('tokenize'):
+            # Convert to lowercase
+            text = text.lower()
+            # Remove special characters but keep hyphens for compound words
+            text = re.sub(r'[^a-zA-Z0-9\s-]', '', text)
+            # Replace hyphens with spaces to handle hyphenated words
+            text = text.replace('-', ' ')
+            # Tokenize
+            tokens = word_tokenize(text)
         # Remove stop words and stem
-        normalized_tokens = []
-        for token in tokens:
-            if token not in self.stop_words:
-                # Add both original and stemmed versions for better matching
-                stemmed = self.stemmer.stem(token)
-                if len(token) > 3:  # Only add original if it's not too short
-                    normalized_tokens.append(token)
-                normalized_tokens.append(stemmed)
+        with stage('stem'):
+            normalized_tokens = []
+            for token in tokens:
+                if token not in self.stop_words:
+                    # Add both original and stemmed versions for better matching
+                    stemmed = self.stemmer.stem(token)
+                    if len(token) > 3:  # Only add original if it's not too short
+                        normalized_tokens.append(token)
+                    normalized_tokens.append(stemmed)
                 
-                # Handle common gaming plural/singular variations
-                if token.endswith('s'):
-                    singular = token[:-1]
-                    if len(singular) > 3:
-                        normalized_tokens.append(singular)
-                        normalized_tokens.append(self.stemmer.stem(singular))
-                else:
-                    plural = token + 's'
-                    normalized_tokens.append(plural)
-                    normalized_tokens.append(self.stemmer.stem(plural))
+                    # Handle common gaming plural/singular variations
+                    if token.endswith('s'):
+                        singular = token[:-1]
+                        if len(singular) > 3:
+                            normalized_tokens.append(singular)
+                            normalized_tokens.append(self.stemmer.stem(singular))
+                    else:
+                        plural = token + 's'
+                        normalized_tokens.append(plural)
+                        normalized_tokens.append(self.stemmer.stem(plural))
         
         return list(set(normalized_tokens))  # Remove duplicates
 
@@ -90,9 +135,11 @@ class GameDataProcessor:
         
         return tf_score * idf_score
 
-    def create_inverted_index(self, game_id, text, field):
+    def create_inverted_index(self, doc_id, text, field, postings):
+        """Add the postings of one field of a game to `postings` (term -> refs), see write_postings"""
         tokens = self.normalize_text(text)
         doc_length = len(tokens)
+        self.corpus_stats.add_field(doc_id, field, tokens)
 
         # Count term frequency
         term_freq = {}
@@ -109,136 +156,89 @@ class GameDataProcessor:
         # Calculate field weight
         field_weight = self.field_weights.get(field, 1.0)
 
-        # Get total number of documents
-        total_docs = self.games_collection.count_documents({})
+        # Statistics so far; update_tf_idf_scores rescores with the final ones
+        total_docs = self.corpus_stats.total_docs
 
         # Update inverted index with tf-idf scores
         for token, data in term_freq.items():
-            # Get current document frequency
-            term_doc = self.inverted_index.find_one({'term': token}) or {'game_refs': []}
-            df = len(term_doc['game_refs'])
-            
             # Calculate TF-IDF score
-            tf_idf = self.calculate_tf_idf(data['count'], df, total_docs)
+            tf_idf = self.calculate_tf_idf(data['count'], self.corpus_stats.df(token), total_docs)
             
             # Apply field weight to tf-idf
             weighted_score = tf_idf * field_weight
 
-            self.inverted_index.update_one(
-                {'term': token},
-                {
-                    '$push': {
-                        'game_refs': {
-                            'game_id': game_id,
-                            'field': field,
-                            'tf': data['count'],
-                            'tf_idf': weighted_score,
-                            'positions': data['positions'],
-                            'doc_length': doc_length
-                        }
-                    },
-                    '$inc': {
-                        'total_occurrences': data['count'],
-                        'document_frequency': 1
-                    }
-                },
-                upsert=True
-            )
+            postings.setdefault(token, []).append({
+                'doc_id': doc_id,
+                'field': field,
+                'tf': data['count'],
+                'tf_idf': weighted_score,
+                'positions': data['positions'],
+                'doc_length': doc_length
+            })
+
+    def write_postings(self, postings, doc_ids):
+        """
+        Write a batch's postings. Each term first drops any refs to the
+        batch's games, left behind by an interrupted run, and then gets the
+        new ones, so replaying a batch yields the same index.
+        """
+        operations = []
+        for term, refs in postings.items():
+            operations.append(UpdateOne({'term': term}, {'$pull': {'game_refs': {'doc_id': {'$in': doc_ids}}}}))
+            operations.append(UpdateOne({'term': term}, {'$push': {'game_refs': {'$each': refs}}}, upsert=True))
+        if operations:
+            self.inverted_index.bulk_write(operations, ordered=True)
 
     def update_tf_idf_scores(self):
         """
         Update TF-IDF scores for all terms in the inverted index
         This should be called after all documents are processed
         """
-        total_docs = self.games_collection.count_documents({})
+        total_docs = self.corpus_stats.total_docs
         
         # Update all documents in inverted index
         for term_doc in self.inverted_index.find():
-            df = len(term_doc['game_refs'])
+            # Games containing the term, however many of their fields it is in
+            df = self.corpus_stats.df(term_doc['term'])
             
-            # Update each game reference
+            # Update each game reference. The whole array is rewritten: a game
+            # can have several refs for one term (one per field), and a
+            # positional update would only reach the first of them.
             for ref in term_doc['game_refs']:
                 tf = ref['tf']
                 field_weight = self.field_weights.get(ref['field'], 1.0)
-                tf_idf = self.calculate_tf_idf(tf, df, total_docs) * field_weight
-                
-                self.inverted_index.update_one(
-                    {
-                        'term': term_doc['term'],
-                        'game_refs.game_id': ref['game_id']
-                    },
-                    {
-                        '$set': {
-                            'game_refs.$.tf_idf': tf_idf
-                        }
+                ref['tf_idf'] = self.calculate_tf_idf(tf, df, total_docs) * field_weight
+
+            # Term counters are derived here rather than incremented per batch,
+            # so replayed batches can't inflate them
+            self.inverted_index.update_one(
+                {'_id': term_doc['_id']},
+                {
+                    '$set': {
+                        'game_refs': term_doc['game_refs'],
+                        'total_occurrences': sum(ref['tf'] for ref in term_doc['game_refs']),
+                        'document_frequency': df
                     }
-                )
+                }
+            )
 
     def generate_description(self, game_data):
         """
         Generate a description for a game using available metadata
         """
-        try:
-            name = game_data.get('name', '')
-            genres = [g.get('name', '') for g in game_data.get('genres', []) if g and isinstance(g, dict)]
-            tags = [t.get('name', '') for t in game_data.get('tags', []) if t and isinstance(t, dict)]
-            platforms = [
+        return generate_description(
+            game_data.get('name', ''),
+            [g.get('name', '') for g in game_data.get('genres', []) if g and isinstance(g, dict)],
+            [
                 p.get('platform', {}).get('name', '')
                 for p in game_data.get('platforms', [])
                 if p and isinstance(p, dict) and p.get('platform')
-            ]
-            rating = game_data.get('rating', 0)
-            metacritic = game_data.get('metacritic', 0)
-            released = game_data.get('released', '')
-
-            # Filter out empty strings
-            genres = [g for g in genres if g]
-            tags = [t for t in tags if t]
-            platforms = [p for p in platforms if p]
-
-            # Start with the game name and basic info
-            description_parts = []
-            if genres:
-                description_parts.append(f"{name} is a {' and '.join(genres[:2])} game")
-            else:
-                description_parts.append(f"{name} is a game")
-            
-            # Add release info
-            if released:
-                description_parts.append(f"released on {released}")
-            
-            # Add platforms
-            if platforms:
-                platform_text = f"available on {', '.join(platforms[:3])}"
-                if len(platforms) > 3:
-                    platform_text += f" and {len(platforms) - 3} other platforms"
-                description_parts.append(platform_text)
-            
-            # First sentence
-            description = ' '.join(description_parts) + '.'
-            
-            # Add rating info
-            rating_parts = []
-            if rating > 0:
-                rating_parts.append(f"The game has received a user rating of {rating:.1f}/5")
-            if metacritic:
-                rating_parts.append(f"and a Metacritic score of {metacritic}")
-            if rating_parts:
-                description += ' ' + ' '.join(rating_parts) + '.'
-            
-            # Add gameplay elements from tags
-            if tags:
-                gameplay_tags = tags[:5]  # Use up to 5 most relevant tags
-                description += f" The gameplay features {', '.join(gameplay_tags[:-1])}"
-                if len(gameplay_tags) > 1:
-                    description += f" and {gameplay_tags[-1]}"
-                description += "."
-            
-            return description
-            
-        except Exception as e:
-            print(f"Error generating description: {str(e)}")
-            return f"{game_data.get('name', 'Unknown Game')} is a video game."  # Fallback description
+            ],
+            game_data.get('released', ''),
+            game_data.get('rating', 0),
+            game_data.get('metacritic', 0),
+            [t.get('name', '') for t in game_data.get('tags', []) if t and isinstance(t, dict)]
+        )
 
     def process_game(self, game_data):
         """Process a game entry with safe handling of missing or None values"""
@@ -247,8 +247,8 @@ class GameDataProcessor:
                 print("Skipping empty game data")
                 return None
 
-            # Generate description first
-            description = self.generate_description(game_data)
+            # Generate description first (unless it is generated at response time)
+            description = None if self.lazy_descriptions else self.generate_description(game_data)
 
             # Helper function to safely get nested values
             def safe_get(obj, *keys):
@@ -268,15 +268,18 @@ class GameDataProcessor:
                 if not isinstance(platform, dict):
                     continue
 
+                # Name and slug live in the platforms collection; requirements
+                # text is kept out of the games document
                 platforms.append({
-                    'id': platform.get('id'),
-                    'name': platform.get('name', 'Unknown Platform'),
-                    'slug': platform.get('slug', ''),
+                    'id': self.dictionaries.intern('platforms', platform.get('id'), {
+                        'name': platform.get('name', 'Unknown Platform'),
+                        'slug': platform.get('slug', '')
+                    }),
                     'released_at': platform_data.get('released_at'),
-                    'requirements': {
-                        'minimum': safe_get(platform_data, 'requirements_en', 'minimum'),
-                        'recommended': safe_get(platform_data, 'requirements_en', 'recommended')
-                    }
+                    'requirements_id': self.dictionaries.intern_requirements(
+                        safe_get(platform_data, 'requirements_en', 'minimum'),
+                        safe_get(platform_data, 'requirements_en', 'recommended')
+                    )
                 })
 
             # Create comprehensive game document
@@ -303,7 +306,7 @@ class GameDataProcessor:
                 'saturated_color': game_data.get('saturated_color'),
                 'dominant_color': game_data.get('dominant_color'),
                 
-                # Simplified platform structure
+                # Platform references (see dictionaries.py)
                 'platforms': platforms,
                 
                 # Parent platforms with safe handling
@@ -320,25 +323,25 @@ class GameDataProcessor:
                     if genre and isinstance(genre, dict)
                 ],
                 
-                # Store information with safe handling
+                # Store ids, resolved from the stores collection
                 'stores': [
-                    {
-                        'store_name': safe_get(store, 'store', 'name', 'Unknown Store'),
-                        'store_slug': safe_get(store, 'store', 'slug', ''),
-                        'url': safe_get(store, 'store', 'domain', '')
-                    }
+                    self.dictionaries.intern('stores', safe_get(store, 'store', 'id'), {
+                        'store_name': safe_get(store, 'store', 'name') or 'Unknown Store',
+                        'store_slug': safe_get(store, 'store', 'slug') or '',
+                        'url': safe_get(store, 'store', 'domain') or ''
+                    })
                     for store in game_data.get('stores', [])
                     if store and isinstance(store, dict) and store.get('store')
                 ],
                 
-                # Tags with safe handling
+                # Tag ids, resolved from the tags collection
                 'tags': [
-                    {
+                    self.dictionaries.intern('tags', tag.get('id'), {
                         'name': tag.get('name', 'Unknown Tag'),
                         'slug': tag.get('slug', ''),
                         'language': tag.get('language', 'en'),
                         'games_count': tag.get('games_count', 0)
-                    }
+                    })
                     for tag in game_data.get('tags', [])
                     if tag and isinstance(tag, dict)
                 ],
@@ -399,31 +402,45 @@ class GameDataProcessor:
 
     def process_game_batch(self, games_batch):
         game_docs = []
+        postings = {}
         for game_data in games_batch:
             game_doc = self.process_game(game_data)
             if game_doc:
+                # Dense internal id (0..N-1) used by postings and doc-value columns
+                doc_id = self.doc_values.add(game_doc)
+                game_doc['doc_id'] = doc_id
+                self.corpus_stats.add_game(doc_id)
                 game_docs.append(game_doc)
                 
                 # Create inverted index for searchable fields
-                self.create_inverted_index(game_data['id'], game_data['name'], 'name')
+                self.create_inverted_index(doc_id, game_data['name'], 'name', postings)
                 
                 # Create inverted index for description
-                self.create_inverted_index(game_data['id'], game_doc['description'], 'description')
+                if 'description' in game_doc:
+                    self.create_inverted_index(doc_id, game_doc['description'], 'description', postings)
 
                 # Create inverted index for tags
                 for tag in game_data.get('tags', []):
-                    self.create_inverted_index(game_data['id'], tag['name'], 'tag')
+                    self.create_inverted_index(doc_id, tag['name'], 'tag', postings)
 
                 # Create inverted index for genres
                 for genre in game_data.get('genres', []):
-                    self.create_inverted_index(game_data['id'], genre['name'], 'genre')
+                    self.create_inverted_index(doc_id, genre['name'], 'genre', postings)
 
                 # Create inverted index for platforms
                 for platform in game_data.get('platforms', []):
-                    self.create_inverted_index(game_data['id'], platform['platform']['name'], 'platform')
-
-        if game_docs:
-            self.games_collection.insert_many(game_docs)
+                    self.create_inverted_index(doc_id, platform['platform']['name'], 'platform', postings)
+
+        # Entries first, so every reference in the batch resolves. Every write
+        # is keyed (entry id, term, game_id), so a batch can be replayed safely.
+        with stage('index_write'):
+            self.dictionaries.flush()
+            self.write_postings(postings, [game_doc['doc_id'] for game_doc in game_docs])
+            if game_docs:
+                self.games_collection.bulk_write([
+                    ReplaceOne({'game_id': game_doc['game_id']}, game_doc, upsert=True)
+                    for game_doc in game_docs
+                ], ordered=True)
 
     def cleanup_database(self):
         """
@@ -433,11 +450,7 @@ class GameDataProcessor:
             print("Starting database cleanup...")
             
             # List of collections to clean
-            collections_to_clean = [
-                self.games_collection,
-                self.inverted_index,
-                self.collection_stats
-            ]
+            collections_to_clean = [self.db[name] for name in CATALOG_COLLECTIONS]
             
             # Drop each collection
             for collection in collections_to_clean:
@@ -452,50 +465,126 @@ class GameDataProcessor:
         except Exception as e:
             print(f"Error during database cleanup: {str(e)}")
 
-    def process_json_file(self, file_path):
+    def load_checkpoint(self, fingerprint):
+        """
+        Checkpoint of an unfinished ingest of the same file with the same
+        settings, or None
+        """
+        checkpoint = self.ingest_checkpoints.find_one({'_id': 'ingest'})
+        if (checkpoint is None or checkpoint.get('completed')
+                or checkpoint.get('fingerprint') != fingerprint
+                or checkpoint.get('lazy_descriptions') != self.lazy_descriptions):
+            return None
+        return checkpoint
+
+    def save_checkpoint(self, **fields):
+        self.ingest_checkpoints.update_one(
+            {'_id': 'ingest'},
+            {'$set': dict(fields, updated_at=datetime.now())},
+            upsert=True
+        )
+
+    def create_indexes(self):
+        self.games_collection.create_index('game_id', unique=True)
+        self.games_collection.create_index('doc_id', unique=True)
+        self.games_collection.create_index('normalized_name')
+        self.inverted_index.create_index('term')
+        # The API finds common terms by df (see corpus_stats.py)
+        self.inverted_index.create_index('document_frequency')
+        self.inverted_index.create_index([('game_refs.doc_id', 1)])
+        self.inverted_index.create_index([('game_refs.tf_idf', -1)])
+
+    def process_json_file(self, file_path, resume=True):
+        """
+        Ingest a JSON array of RAWG games into a new version of the catalog,
+        published once it is complete. Progress is checkpointed after every
+        batch; with `resume`, a run interrupted on the same file continues
+        after the last completed batch instead of starting over.
+        Returns True once the new version is published, False if the ingest failed.
+        """
         try:
-            # Clean up old collections first
-            self.cleanup_database()
-
-            # Create new collections and indexes
-            self.games_collection = self.db['games']
-            self.inverted_index = self.db['inverted_index']
-            self.collection_stats = self.db['collection_stats']
-
-            # Create indexes
-            self.games_collection.create_index('game_id', unique=True)
-            self.games_collection.create_index('normalized_name')
-            self.inverted_index.create_index('term')
-            self.inverted_index.create_index([('game_refs.game_id', 1)])
-            self.inverted_index.create_index([('game_refs.tf_idf', -1)])
+            with open(file_path, 'rb') as file:
+                raw = file.read()
+            fingerprint = hashlib.sha1(raw).hexdigest()
+            games_data = json.loads(raw.decode('utf-8'))
+            if self.shard is not None:
+                index, count = self.shard
+                games_data = [game for game in games_data if shard_of(game.get('id'), count) == index]
+                fingerprint += f":{index}/{count}"
+                print(f"Shard {index}/{count}: {len(games_data)} games")
+            total_games = len(games_data)
+
+            checkpoint = None
+            building = self.registry.building(self.catalog) if resume else None
+            if building is not None:
+                self.use_namespace(building)
+                checkpoint = self.load_checkpoint(fingerprint)
+            if checkpoint is None:
+                # The live version keeps serving while the new one is built
+                self.use_namespace(self.registry.begin(self.catalog))
+                print(f"Building catalog {self.catalog} version {self.db.version}")
+                self.cleanup_database()
+                self.create_indexes()
+
+                self.dictionaries = Dictionaries(self.db)
+                self.doc_values = DocValuesBuilder(self.dictionaries.platform_name)
+                self.corpus_stats = CorpusStatistics()
+                start = 0
+                self.save_checkpoint(file_path=file_path, fingerprint=fingerprint, total=total_games,
+                                     lazy_descriptions=self.lazy_descriptions, offset=0, batch=0,
+                                     next_doc_id=0, field_lengths={}, completed=False,
+                                     started_at=datetime.now())
+            else:
+                # Games past the checkpoint belong to a batch that didn't
+                # finish; it is replayed and overwrites them
+                start = checkpoint['offset']
+                print(f"Resuming {file_path} at game {start}/{total_games} (batch {checkpoint['batch']})")
+                self.dictionaries = Dictionaries.load(self.db)
+                self.doc_values = DocValuesBuilder.from_games(
+                    self.games_collection.find(
+                        {'doc_id': {'$lt': checkpoint['next_doc_id']}}, DOC_VALUES_PROJECTION
+                    ).sort('doc_id', 1),
+                    self.dictionaries.platform_name
+                )
+                self.corpus_stats = CorpusStatistics.from_index(
+                    self.inverted_index, checkpoint['next_doc_id'], checkpoint.get('field_lengths')
+                )
 
             # Process the JSON file in batches
-            with open(file_path, 'r', encoding='utf-8') as file:
-                games_data = json.load(file)
-                total_games = len(games_data)
-                
-                for i in range(0, total_games, self.batch_size):
-                    batch = games_data[i:i + self.batch_size]
-                    self.process_game_batch(batch)
-                    print(f"Processed {min(i + self.batch_size, total_games)}/{total_games} games")
+            for i in range(start, total_games, self.batch_size):
+                batch = games_data[i:i + self.batch_size]
+                self.process_game_batch(batch)
+                self.save_checkpoint(offset=min(i + self.batch_size, total_games),
+                                     batch=i // self.batch_size + 1, next_doc_id=len(self.doc_values),
+                                     field_lengths=self.corpus_stats.field_lengths)
+                print(f"Processed {min(i + self.batch_size, total_games)}/{total_games} games")
 
             # Update TF-IDF scores after all documents are processed
             print("Updating TF-IDF scores...")
-            self.update_tf_idf_scores()
+            with stage('rescore'):
+                self.update_tf_idf_scores()
             print("TF-IDF scores updated successfully!")
             
-            # Store collection statistics
-            self.collection_stats.insert_one({
-                'timestamp': datetime.now(),
-                'total_games': total_games,
-                'total_terms': self.inverted_index.count_documents({}),
-                'avg_terms_per_game': self.inverted_index.aggregate([
-                    {'$unwind': '$game_refs'},
-                    {'$group': {'_id': None, 'avg': {'$avg': '$game_refs.tf'}}}
-                ]).next()['avg']
-            })
+            # Static quality signals of every game in doc_id order (see
+            # doc_values.static_prior), for ranking without a snapshot
+            static_prior = self.db[STATIC_PRIOR_COLLECTION]
+            static_prior.delete_many({})
+            documents = list(prior_documents(self.doc_values.build().prior))
+            if documents:
+                static_prior.insert_many(documents)
+
+            # Store collection statistics; each term's df is on its
+            # inverted_index document (see corpus_stats.py)
+            self.collection_stats.insert_one(dict(
+                self.corpus_stats.to_document(),
+                timestamp=datetime.now(),
+                shard=list(self.shard) if self.shard is not None else None
+            ))
+            self.save_checkpoint(completed=True)
+            self.registry.publish(self.db)
             
-            print("Data processing completed successfully!")
+            print(f"Data processing completed successfully! Catalog {self.catalog} is at version {self.db.version}")
+            return True
             
         except FileNotFoundError:
             print(f"Error: JSON file not found at {file_path}")
@@ -503,19 +592,146 @@ class GameDataProcessor:
             print(f"Error: Invalid JSON format in file {file_path}")
         except Exception as e:
             print(f"Error processing JSON file: {str(e)}")
+            print("Run again on the same file to resume from the last completed batch")
         finally:
             # Ensure indexes are created even if processing fails
-            self.games_collection.create_index('game_id', unique=True)
-            self.games_collection.create_index('normalized_name')
-            self.inverted_index.create_index('term')
-            self.inverted_index.create_index([('game_refs.game_id', 1)])
-            self.inverted_index.create_index([('game_refs.tf_idf', -1)])
+            self.create_indexes()
+        return False
+
+    def export_snapshot(self, path):
+        """
+        Export the games and inverted_index collections as a memory-mapped
+        index snapshot (see index_snapshot.py) for the API to serve from
+        """
+        print(f"Exporting index snapshot to {path}...")
+
+        # Reuse the columns built during ingest, or rebuild them when exporting
+        # a database that was ingested by another process
+        if len(self.doc_values) != self.games_collection.count_documents({}):
+            self.dictionaries = Dictionaries.load(self.db)
+            self.doc_values = DocValuesBuilder.from_games(
+                self.games_collection.find({}, DOC_VALUES_PROJECTION).sort('doc_id', 1),
+                self.dictionaries.platform_name
+            )
+        doc_values = self.doc_values.build()
+        total_docs = len(doc_values)
+
+        # Combine every reference of a term to the same game into one posting,
+        # and collect the (game, term, weight) entries of the similarity vectors
+        term_postings = {}
+        vector_rows, vector_cols, vector_weights = [], [], []
+        projection = {'term': 1, 'game_refs.doc_id': 1, 'game_refs.tf_idf': 1, 'game_refs.field': 1}
+        for term_index, term_doc in enumerate(self.inverted_index.find({}, projection)):
+            postings = {}
+            for ref in term_doc['game_refs']:
+                doc_id = ref['doc_id']
+                if doc_id >= total_docs:
+                    # Posting for a game whose batch never reached the games collection
+                    continue
+                score, fields = postings.get(doc_id, (0.0, 0))
+                postings[doc_id] = (score + ref.get('tf_idf', 0.0), fields | FIELD_BITS.get(ref['field'], 0))
+                if ref['field'] in SIMILARITY_FIELDS:
+                    vector_rows.append(doc_id)
+                    vector_cols.append(term_index)
+                    vector_weights.append(ref.get('tf_idf', 0.0))
+            if postings:
+                term_postings[term_doc['term']] = postings
+
+        print("Computing similar games...")
+        vectors = build_game_vectors(
+            vector_rows, vector_cols, vector_weights, total_docs, max(vector_cols, default=-1) + 1
+        )
+        similar_docs, similar_scores = top_neighbours(vectors, self.similar_top_n)
+
+        term_bytes = bytearray()
+        term_offsets = [0]
+        posting_offsets = [0]
+        posting_docs = []
+        posting_scores = []
+        posting_fields = []
+        for term in sorted(term_postings, key=lambda t: t.encode('utf-8')):
+            term_bytes += term.encode('utf-8')
+            term_offsets.append(len(term_bytes))
+            for doc_id, (score, fields) in sorted(term_postings[term].items()):
+                posting_docs.append(doc_id)
+                posting_scores.append(score)
+                posting_fields.append(fields)
+            posting_offsets.append(len(posting_docs))
+
+        sections, facet_names = doc_value_sections(doc_values)
+        sections.update({
+            'meta': {
+                'created_at': datetime.now().isoformat(),
+                # The API only serves a snapshot of the catalog version it reads
+                'catalog': self.catalog,
+                'catalog_version': self.db.version,
+                'shard': list(self.shard) if self.shard is not None else None,
+                'total_docs': len(doc_values),
+                'total_terms': len(term_offsets) - 1,
+                'total_postings': len(posting_docs),
+                'field_weights': self.field_weights,
+                'facets': facet_names,
+                'similar_top_n': self.similar_top_n
+            },
+            'term_bytes': term_bytes,
+            'term_offsets': term_offsets,
+            'posting_offsets': posting_offsets,
+            'posting_docs': posting_docs,
+            'posting_scores': posting_scores,
+            'posting_fields': posting_fields,
+            'similar_docs': similar_docs.ravel(),
+            'similar_scores': similar_scores.ravel()
+        })
+        sections.update(impact_sections(posting_offsets, posting_docs, posting_scores))
+        write_snapshot(path, sections)
+
+        # Read the file back to make sure what we shipped is intact
+        snapshot = IndexSnapshot(path)
+        snapshot.verify()
+        snapshot.close()
+        print(f"Exported {len(doc_values)} games and {len(term_offsets) - 1} terms to {path}")
 
 
 def main():
-    processor = GameDataProcessor()
-    processor.process_json_file('./data/games_1000.json')
-    print("Data processing completed!")
+    parser = argparse.ArgumentParser(description='Ingest RAWG games and export an index snapshot')
+    parser.add_argument('input', nargs='?', default='./data/games_1000.json', help='JSON array of RAWG games')
+    parser.add_argument('--catalog', default=None,
+                        help='Catalog to ingest into, e.g. pc or console (see catalogs.py); '
+                             'default-<I>of<N> with --shard, else default')
+    parser.add_argument('--shard', type=parse_shard, default=None,
+                        help='Only ingest shard I of N, e.g. 0/4 (see sharding.py)')
+    parser.add_argument('--snapshot', default=None,
+                        help='Where to write the index snapshot (default ./data/index.snap, '
+                             './data/index.<catalog>.snap for other catalogs)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile the run and write collapsed-stack files (see profiling.py)')
+    parser.add_argument('--profile-output', default='./profiles/ingest', help='Path prefix of the profile files')
+    parser.add_argument('--cprofile', action='store_true',
+                        help='With --profile, also run cProfile (exact call counts, more overhead)')
+    args = parser.parse_args()
+    if args.catalog is None:
+        args.catalog = f"{DEFAULT_CATALOG}-{args.shard[0]}of{args.shard[1]}" if args.shard else DEFAULT_CATALOG
+
+    processor = GameDataProcessor(catalog=args.catalog, shard=args.shard)
+    profile = Profile(cprofile=args.cprofile) if args.profile else None
+    with profile.activate('ingest') if profile else nullcontext():
+        published = processor.process_json_file(args.input)
+        if published:
+            # The snapshot the API serves is only replaced by a published version
+            processor.use_namespace(processor.registry.live(args.catalog))
+            with stage('export'):
+                processor.export_snapshot(args.snapshot or catalog_snapshot_path('./data/index.snap', args.catalog))
+    if published:
+        print("Data processing completed!")
+    else:
+        print("Ingest failed; the index snapshot was left as it was")
+
+    if profile:
+        profile.print_summary()
+        for path in profile.write(args.profile_output):
+            print(f"Wrote {path}")
+    if not published:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
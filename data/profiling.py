@@ -0,0 +1,155 @@
+"""
+Opt-in profiling for ingest and search.
+
+Code marks its phases with `stage('tokenize')`, `stage('aggregate')`, ...
+Outside a profile a stage is a shared no-op context manager, so the cost
+when profiling is off is one context-variable lookup per stage.
+
+Inside `Profile.activate()`:
+- a sampling thread records the Python stack of every thread that has an
+  open stage, every `interval` seconds, prefixed with its stage path;
+- wall time per stage path is accumulated;
+- with `cprofile=True`, cProfile also runs on the activating thread.
+
+Profile.write() emits collapsed-stack files ("frame;frame;frame count"),
+the input format of flamegraph.pl, speedscope and inferno:
+    <prefix>.collapsed          sampled stacks, stage names as root frames
+    <prefix>.stages.collapsed   wall time per stage path, in microseconds
+    <prefix>.prof               cProfile stats (pstats, snakeviz) if enabled
+"""
+import contextvars
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+_active = contextvars.ContextVar('profile', default=None)
+_NO_STAGE = nullcontext()
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def stage(name):
+    """Context manager tagging the enclosed work with a stage name while a profile is active"""
+    profile = _active.get()
+    if profile is None:
+        return _NO_STAGE
+    return _Stage(profile, name)
+
+
+def active():
+    """True inside an active profile"""
+    return _active.get() is not None
+
+
+def _frame_names(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        if os.path.abspath(code.co_filename) != _THIS_FILE:
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class _Stage:
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.stack = self.profile._stack()
+        self.stack.append(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        path = ';'.join(self.stack)
+        self.stack.pop()
+        with self.profile._lock:
+            self.profile.stage_times[path] += elapsed
+        return False
+
+
+class Profile:
+    def __init__(self, interval=0.001, cprofile=False):
+        self.interval = interval
+        self.samples = Counter()        # collapsed stack -> samples
+        self.stage_times = Counter()    # stage path -> seconds
+        self.profiler = cProfile.Profile() if cprofile else None
+        self.elapsed = 0.0
+        self._stages = {}               # thread id -> open stage names
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def _stack(self):
+        return self._stages.setdefault(threading.get_ident(), [])
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, stages in list(self._stages.items()):
+                stages = list(stages)
+                frame = frames.get(thread_id)
+                if not stages or frame is None:
+                    continue
+                self.samples[';'.join(stages + _frame_names(frame))] += 1
+
+    @contextmanager
+    def activate(self, root=None):
+        """Profile the enclosed block (and work it hands to threads that inherit its context)"""
+        token = _active.set(self)
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, name='profile-sampler', daemon=True)
+        self._sampler.start()
+        if self.profiler is not None:
+            self.profiler.enable()
+        started = time.perf_counter()
+        try:
+            with stage(root) if root else _NO_STAGE:
+                yield self
+        finally:
+            self.elapsed += time.perf_counter() - started
+            if self.profiler is not None:
+                self.profiler.disable()
+            self._stop.set()
+            self._sampler.join()
+            _active.reset(token)
+
+    def stage_summary(self):
+        """(stage path, seconds), slowest first"""
+        return sorted(self.stage_times.items(), key=lambda item: -item[1])
+
+    def server_timing(self):
+        """Server-Timing header value: total milliseconds per stage name"""
+        totals = Counter()
+        for path, seconds in self.stage_times.items():
+            totals[path.rsplit(';', 1)[-1]] += seconds
+        return ', '.join(f"{name};dur={seconds * 1000.0:.2f}" for name, seconds in totals.most_common())
+
+    def write(self, prefix):
+        """Write the collapsed-stack files (and cProfile stats); returns their paths"""
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        paths = [f"{prefix}.collapsed", f"{prefix}.stages.collapsed"]
+        with open(paths[0], 'w', encoding='utf-8') as file:
+            for stack, count in sorted(self.samples.items()):
+                file.write(f"{stack} {count}\n")
+        with open(paths[1], 'w', encoding='utf-8') as file:
+            for path, seconds in sorted(self.stage_times.items()):
+                file.write(f"{path} {round(seconds * 1e6)}\n")
+        if self.profiler is not None:
+            paths.append(f"{prefix}.prof")
+            self.profiler.dump_stats(paths[-1])
+        return paths
+
+    def print_summary(self, limit=15):
+        print(f"Profiled {self.elapsed:.2f}s, {sum(self.samples.values())} samples")
+        for path, seconds in self.stage_summary()[:limit]:
+            print(f"  {seconds:10.3f}s  {path}")
@@ -0,0 +1,309 @@
+"""
+Search query syntax.
+
+    witcher rpg                 games with either term (plain queries work as before)
+    name:witcher                term restricted to one field
+    tag:"open world"            every word of the phrase, in that field
+    +souls -platform:android    required and excluded clauses
+    rpg AND (dark OR souls) NOT remaster
+
+AND, OR and NOT must be upper case; lower-case words are ordinary terms.
+Fields are the posting fields: name, description, tag, genre and platform.
+
+A query is parsed into a tree of BooleanQuery/TermQuery nodes and evaluated
+on sorted posting lists: required clauses are intersected starting with the
+shortest list, optional ones are unioned, excluded ones subtracted. A game's
+score is the sum of the scores of the positive terms it matched, so a plain
+query scores exactly as the old OR over terms did.
+"""
+import re
+
+import numpy as np
+
+from index_snapshot import FIELDS, FIELD_BITS
+
+ALL_FIELDS = sum(FIELD_BITS.values())
+
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|([+-])(?=[^\s])|(?:(\w+):)?"([^"]*)"?|([^\s()"]+))')
+
+
+class TermQuery:
+    def __init__(self, term, fields=ALL_FIELDS):
+        self.term = term
+        self.fields = fields  # FIELD_BITS mask the term must appear in
+
+    def __repr__(self):
+        return f"TermQuery({self.term!r}, {self.fields})"
+
+
+class BooleanQuery:
+    """
+    Matches the intersection of `must` (or, without `must`, the union of
+    `should`), minus the union of `must_not`
+    """
+
+    def __init__(self, must=(), should=(), must_not=()):
+        self.must = list(must)
+        self.should = list(should)
+        self.must_not = list(must_not)
+
+    def __repr__(self):
+        return f"BooleanQuery(must={self.must}, should={self.should}, must_not={self.must_not})"
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match or match.end() == position:
+            break
+        position = match.end()
+        lparen, rparen, modifier, field, phrase, word = match.groups()
+        if lparen:
+            tokens.append(('(', None))
+        elif rparen:
+            tokens.append((')', None))
+        elif modifier:
+            tokens.append((modifier, None))
+        elif phrase is not None:
+            field = field.lower() if field and field.lower() in FIELDS else None
+            tokens.append(('phrase', (field, phrase)))
+        elif word in ('AND', 'OR', 'NOT'):
+            tokens.append((word, None))
+        elif word:
+            field, _, value = word.partition(':')
+            if value and field.lower() in FIELDS:
+                tokens.append(('word', (field.lower(), value)))
+            else:
+                tokens.append(('word', (None, word)))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def next(self):
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse_or(self):
+        """Clauses separated by OR or just whitespace"""
+        query = BooleanQuery()
+        while self.peek() not in (None, ')'):
+            if self.peek() in ('OR', 'AND'):
+                # Dangling operator, e.g. "OR witcher"
+                self.next()
+                continue
+            kind, node = self.parse_and()
+            if node is not None:
+                {'+': query.must, '-': query.must_not}.get(kind, query.should).append(node)
+            if self.peek() == 'OR':
+                self.next()
+        return query
+
+    def parse_and(self):
+        kind, node = self.parse_unary()
+        if self.peek() != 'AND':
+            return kind, node
+
+        query = BooleanQuery()
+        while True:
+            if node is not None:
+                (query.must_not if kind == '-' else query.must).append(node)
+            if self.peek() != 'AND':
+                return None, query
+            self.next()
+            if self.peek() in (None, ')'):
+                return None, query
+            kind, node = self.parse_unary()
+
+    def parse_unary(self):
+        """One clause and its modifier: '+' required, '-' excluded, None optional"""
+        token = self.peek()
+        if token in ('+', '-', 'NOT'):
+            self.next()
+            _, node = self.parse_unary()
+            return ('+' if token == '+' else '-'), node
+        return None, self.parse_primary()
+
+    def parse_primary(self):
+        if self.peek() in (None, ')'):
+            # Nothing to modify, e.g. "witcher -"; the ')' is left to the caller
+            return None
+        kind, value = self.next()
+        if kind == '(':
+            query = self.parse_or()
+            if self.peek() == ')':
+                self.next()
+            return query
+
+        field, text = value
+        fields = FIELD_BITS[field] if field else ALL_FIELDS
+        terms = list(dict.fromkeys(text.lower().split()))
+        if not terms:
+            return None
+        if kind == 'word' or len(terms) == 1:
+            return TermQuery(terms[0], fields)
+        # Postings carry no positions, so a phrase needs all its words
+        return BooleanQuery(must=[TermQuery(term, fields) for term in terms])
+
+
+def simplify_query(node):
+    """Collapse single-clause BooleanQuery nodes"""
+    if isinstance(node, BooleanQuery):
+        node.must = [simplify_query(child) for child in node.must]
+        node.should = [simplify_query(child) for child in node.should]
+        node.must_not = [simplify_query(child) for child in node.must_not]
+        if len(node.should) == 1 and not node.must and not node.must_not:
+            return node.should[0]
+        if len(node.must) == 1 and not node.should and not node.must_not:
+            return node.must[0]
+    return node
+
+
+def parse_query(text):
+    """Parse a query string into a TermQuery/BooleanQuery tree"""
+    parser = _Parser(_tokenize(text))
+    query = parser.parse_or()
+    while parser.peek() == ')':
+        # Stray closing parens, e.g. "witcher)"; keep going after them
+        parser.next()
+        rest = parser.parse_or()
+        query.should.extend(rest.should)
+        query.must.extend(rest.must)
+        query.must_not.extend(rest.must_not)
+    return simplify_query(query)
+
+
+def query_terms(node, positive=True):
+    """Distinct terms of a query in order; only the scoring (non-excluded) ones if `positive`"""
+    if isinstance(node, TermQuery):
+        return [node.term]
+    terms = []
+    for child in node.must + node.should + ([] if positive else node.must_not):
+        terms.extend(query_terms(child, positive))
+    return list(dict.fromkeys(terms))
+
+
+def positive_leaves(node):
+    if isinstance(node, TermQuery):
+        return [node]
+    leaves = []
+    for child in node.must + node.should:
+        leaves.extend(positive_leaves(child))
+    return leaves
+
+
+def _contains(docs, candidates):
+    """Boolean mask of the `candidates` present in sorted `docs`"""
+    if len(docs) == 0:
+        return np.zeros(len(candidates), dtype=bool)
+    positions = np.searchsorted(docs, candidates)
+    positions[positions == len(docs)] = 0
+    return docs[positions] == candidates
+
+
+class QueryEvaluator:
+    """
+    Evaluates query trees against a posting source: `postings(term)` returns
+    (doc ids sorted ascending, scores, FIELD_BITS masks) for a term.
+    """
+
+    def __init__(self, postings):
+        self._postings = postings
+        self._cache = {}
+
+    def postings(self, term):
+        if term not in self._cache:
+            self._cache[term] = self._postings(term)
+        return self._cache[term]
+
+    def term_docs(self, node):
+        docs, _, fields = self.postings(node.term)
+        if node.fields != ALL_FIELDS:
+            docs = docs[(fields & node.fields) != 0]
+        return docs
+
+    def estimate(self, node):
+        """Upper bound on the number of matches, to order intersections"""
+        if isinstance(node, TermQuery):
+            return len(self.postings(node.term)[0])
+        if node.must:
+            return min(self.estimate(child) for child in node.must)
+        return sum(self.estimate(child) for child in node.should)
+
+    def docs(self, node):
+        """Sorted doc ids matching a node"""
+        if isinstance(node, TermQuery):
+            return self.term_docs(node)
+
+        if node.must:
+            docs = None
+            for child in sorted(node.must, key=self.estimate):
+                child_docs = self.docs(child)
+                if docs is None:
+                    docs = child_docs
+                elif len(child_docs) < len(docs):
+                    docs = child_docs[_contains(docs, child_docs)]
+                else:
+                    docs = docs[_contains(child_docs, docs)]
+                if len(docs) == 0:
+                    return docs
+        elif node.should:
+            blocks = [self.docs(child) for child in node.should]
+            docs = blocks[0] if len(blocks) == 1 else np.unique(np.concatenate(blocks))
+        else:
+            # Only exclusions: nothing to score, so nothing matches
+            return np.empty(0, dtype=np.uint32)
+
+        for child in node.must_not:
+            if len(docs) == 0:
+                break
+            docs = docs[~_contains(self.docs(child), docs)]
+        return docs
+
+    def evaluate(self, node):
+        """Matching docs (sorted), their scores and, per scoring term, a mask of the docs it matched"""
+        docs = self.docs(node)
+        scores = np.zeros(len(docs), dtype=np.float64)
+        matched = {}
+        if len(docs) == 0:
+            return QueryResult(docs, scores, matched)
+
+        for leaf in positive_leaves(node):
+            mask = _contains(self.term_docs(leaf), docs)
+            matched[leaf.term] = matched[leaf.term] | mask if leaf.term in matched else mask
+
+        for term, mask in matched.items():
+            # A term scores once per game, whatever fields it was matched in
+            term_docs, term_scores, _ = self.postings(term)
+            positions = np.searchsorted(term_docs, docs[mask])
+            scores[mask] += term_scores[positions]
+        return QueryResult(docs, scores, matched)
+
+
+class QueryResult:
+    def __init__(self, docs, scores, matched):
+        self.docs = docs
+        self.scores = scores
+        self.matched = matched  # term -> bool mask over docs
+
+    def __len__(self):
+        return len(self.docs)
+
+    def take(self, selector):
+        """Subset/reorder by a boolean mask or index array"""
+        return QueryResult(
+            self.docs[selector], self.scores[selector],
+            {term: mask[selector] for term, mask in self.matched.items()}
+        )
+
+    def matched_terms(self, i):
+        return [term for term, mask in self.matched.items() if mask[i]]
@@ -0,0 +1,106 @@
+"""
+Sampled query log, for replaying real traffic offline (benchmarks/replay.py).
+
+With GAME_QUERY_LOG set, the API appends one JSON line for a sample of
+/search/ requests:
+
+    {"t":1760000000.123,"q":"dark souls","sort_by":"relevance","page":1,
+     "page_size":20,"status":200,"latency_ms":12.4,"hits":20}
+
+plus catalog, platform, genre, min_rating, format and degraded when they
+are set. The query is normalized the way identical searches are coalesced
+(whitespace collapsed); nothing identifies the client.
+
+Lines are written by a background thread, so a request only pays for
+building the record. When the writer falls behind, records are dropped
+rather than queued without bound. The file is rotated to <path>.1 once it
+exceeds `max_bytes`.
+"""
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+
+def normalize_query(q):
+    """Whitespace-collapsed query; case is kept (AND, OR and NOT are operators)"""
+    return ' '.join(q.split())
+
+
+class QueryLog:
+    def __init__(self, path, sample_rate=0.01, max_bytes=100 * 1024 * 1024, queue_size=10000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.records = queue.Queue(queue_size)
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._writer = threading.Thread(target=self._write, name='query-log', daemon=True)
+        self._writer.start()
+
+    def sample(self):
+        """Whether to log the request at hand; decided before it runs"""
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def record(self, **fields):
+        """Queue one record; fields that are None are left out"""
+        entry = {'t': round(time.time(), 3)}
+        entry.update((name, value) for name, value in fields.items() if value is not None)
+        try:
+            self.records.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return open(self.path, 'a', encoding='utf-8')
+
+    def _write(self):
+        file = self._open()
+        try:
+            while True:
+                entry = self.records.get()
+                if entry is None:
+                    break
+                file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+                self.written += 1
+                if self.records.empty():
+                    file.flush()
+                    if file.tell() > self.max_bytes:
+                        file.close()
+                        os.replace(self.path, self.path + '.1')
+                        self.rotations += 1
+                        file = self._open()
+        except Exception as e:
+            print(f"Query log stopped: {str(e)}")
+        finally:
+            file.close()
+
+    def close(self):
+        """Write what is queued and stop"""
+        self.records.put(None)
+        self._writer.join(timeout=5)
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'sample_rate': self.sample_rate,
+            'written': self.written,
+            'dropped': self.dropped,
+            'queued': self.records.qsize(),
+            'rotations': self.rotations
+        }
+
+
+def read_query_log(path):
+    """Records of a query log file, oldest first"""
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
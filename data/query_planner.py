@@ -0,0 +1,112 @@
+"""
+Cached query planning.
+
+The same queries (and prefixes of them, one per keystroke) arrive over and
+over, so parsing and analysis are memoized per query string. Planning also
+removes terms before any posting list is read:
+
+- stopwords are never indexed, so they are dropped as an analyzer would;
+- terms found in more than `max_df` of all games ("game", "pc", ...) are
+  dropped from OR-ed (should) clauses that have other, more selective
+  clauses beside them. They would match most of the catalog and add almost
+  nothing to the ranking. Required (+term, AND) and field-restricted terms
+  are always kept, so what a query matches only changes by the games
+  that matched nothing but a common term.
+
+A query left with nothing to match is answered without touching the index.
+"""
+from caching import LRUCache
+from profiling import stage
+from query_language import (
+    ALL_FIELDS, BooleanQuery, TermQuery, parse_query, query_terms, simplify_query
+)
+
+
+class QueryPlan:
+    def __init__(self, query, dropped):
+        self.query = query      # query tree to evaluate, None if nothing can match
+        self.dropped = dropped  # terms removed as stopwords or too common
+        self.terms = query_terms(query, positive=False) if query is not None else []
+
+    @property
+    def empty(self):
+        return self.query is None
+
+
+def _prune(node, drop, dropped):
+    """
+    Copy of `node` without the leaves `drop` selects. None if no positive
+    clause is left.
+    """
+    if isinstance(node, TermQuery):
+        if drop(node):
+            dropped.append(node.term)
+            return None
+        return node
+
+    must = [child for child in (_prune(c, drop, dropped) for c in node.must) if child is not None]
+    should = [child for child in (_prune(c, drop, dropped) for c in node.should) if child is not None]
+    must_not = [child for child in (_prune(c, drop, dropped) for c in node.must_not) if child is not None]
+    if not must and not should:
+        return None
+    return BooleanQuery(must, should, must_not)
+
+
+def _prune_common(node, is_common, dropped, required=False):
+    """
+    Copy of `node` without its common `should` leaves where they only
+    affect ranking (the clause also has required clauses) or only add
+    games that match nothing but common terms. They stay in a required
+    OR group, e.g. "+(game OR pc) dragon", and when nothing selective is
+    left beside them.
+    """
+    if isinstance(node, TermQuery):
+        return node
+    must = [_prune_common(child, is_common, dropped, required=True) for child in node.must]
+    should = [_prune_common(child, is_common, dropped) for child in node.should]
+    selective = [child for child in should if not (isinstance(child, TermQuery) and is_common(child))]
+    if must or (selective and not required):
+        dropped.extend(child.term for child in should if child not in selective)
+        should = selective
+    return BooleanQuery(must, should, node.must_not)
+
+
+class QueryPlanner:
+    def __init__(self, stop_words, common_terms=None, cache_size=4096, plans=None, scope=None):
+        self.stop_words = set(stop_words)
+        self.common_terms = set(common_terms or ())
+        # Planners of several catalogs can share one cache; `scope` keeps
+        # their plans apart
+        self.plans = plans if plans is not None else LRUCache(cache_size)
+        self.scope = scope
+
+    def plan(self, text):
+        text = ' '.join(text.split())
+        key = (self.scope, text) if self.scope is not None else text
+        plan = self.plans.get(key)
+        if plan is None:
+            with stage('tokenize'):
+                plan = self._plan(text)
+            self.plans.put(key, plan)
+        return plan
+
+    def plan_with(self, text, common_terms):
+        """
+        Uncached plan with other common terms, e.g. those of the whole
+        catalog when this index is one shard of it
+        """
+        return self._plan(' '.join(text.split()), set(common_terms))
+
+    def _plan(self, text, common_terms=None):
+        common_terms = self.common_terms if common_terms is None else common_terms
+        dropped = []
+        query = _prune(parse_query(text), lambda leaf: leaf.term in self.stop_words, dropped)
+
+        if query is not None and common_terms:
+            def is_common(leaf):
+                return leaf.fields == ALL_FIELDS and leaf.term in common_terms
+
+            # A query of nothing but common terms is still answered
+            query = _prune_common(query, is_common, dropped)
+
+        return QueryPlan(simplify_query(query) if query is not None else None, dropped)
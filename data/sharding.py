@@ -0,0 +1,249 @@
+"""
+Document-partitioned search: game `game_id` belongs to shard
+shard_of(game_id, N), each shard is a catalog of its own, and a
+ShardCoordinator sends queries with the whole catalog's term statistics to
+every shard and merges their top k.
+"""
+import hashlib
+import heapq
+import json
+import math
+import threading
+import urllib.parse
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from caching import LRUCache
+from query_planner import QueryPlanner
+
+
+# Most games a shard returns for one search
+MAX_SHARD_RESULTS = 10000
+
+# Header a coordinator sends its shared secret in
+SHARD_SECRET_HEADER = 'X-Shard-Secret'
+
+
+class ShardsUnavailable(Exception):
+    pass
+
+
+def shard_of(game_id, shards):
+    """Shard of a game; a hash, so sequential ids spread evenly"""
+    digest = hashlib.blake2b(str(game_id).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shards
+
+
+def parse_shard(text):
+    """'2/4' -> (2, 4)"""
+    index, _, count = text.partition('/')
+    index, count = int(index), int(count)
+    if not 0 <= index < count:
+        raise ValueError(f"Invalid shard {text!r}; expected INDEX/COUNT with 0 <= INDEX < COUNT")
+    return index, count
+
+
+def idf(df, total_docs):
+    """Smoothed IDF, the one GameDataProcessor.calculate_tf_idf weights postings with"""
+    if not df or not total_docs:
+        return 0.0
+    return math.log(1 + total_docs / df)
+
+
+class GlobalStats:
+    """Statistics of the whole catalog that a shard scores and plans with"""
+
+    def __init__(self, total_docs, document_frequency, common_terms=()):
+        self.total_docs = total_docs
+        self.document_frequency = document_frequency
+        self.common_terms = set(common_terms)
+
+    def idf(self, term):
+        return idf(self.document_frequency.get(term, 0), self.total_docs)
+
+
+def global_idf_postings(postings, stats, total_docs):
+    """
+    `postings(term)` with scores moved from the IDF of this shard
+    (`total_docs` games, df = length of the term's posting list) to the
+    global one. A score is idf(term) times a weight that only depends on the
+    game, so these are the scores one index over every game would give;
+    static prior boosts are normalized per shard and can still differ.
+    """
+    def scaled(term):
+        docs, scores, fields = postings(term)
+        local = idf(len(docs), total_docs)
+        if local == 0:
+            return docs, scores, fields
+        return docs, scores.astype(np.float64) * (stats.idf(term) / local), fields
+    return scaled
+
+
+class HttpShard:
+    """A shard served by another API process, e.g. http://10.0.0.2:8000/?catalog=default-1of4"""
+
+    def __init__(self, url, secret=''):
+        parts = urllib.parse.urlsplit(url)
+        self.name = url
+        self.base = f"{parts.scheme}://{parts.netloc}{parts.path.rstrip('/')}"
+        self.query = parts.query
+        self.secret = secret
+
+    def _post(self, path, body, timeout):
+        url = self.base + path + (f"?{self.query}" if self.query else '')
+        request = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'), headers={
+            'Content-Type': 'application/json',
+            SHARD_SECRET_HEADER: self.secret
+        })
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+
+    def stats(self, terms, timeout):
+        return self._post('/shard/stats', {'terms': terms}, timeout)
+
+    def search(self, request, timeout):
+        return self._post('/shard/search', request, timeout)
+
+
+# Results are merged on the field each shard sorted by, descending
+MERGE_KEYS = {
+    'relevance': lambda result: result['relevance_score'] or 0,
+    'rating': lambda result: result['rating'] or 0,
+    'release_date': lambda result: result['released'] or ''
+}
+
+
+class ShardCoordinator:
+    """
+    Scatter-gather over `shards` (objects with stats(terms, timeout) and
+    search(request, timeout)): the document frequencies of a query's terms
+    are summed over every shard, sent with the query to all of them, and
+    their top k lists merged. Document frequencies are cached per term and
+    forgotten when a shard starts serving another index version.
+    """
+
+    def __init__(self, shards, stop_words, max_df, timeout=2.0, stats_cache_size=100000):
+        self.shards = shards
+        # Stopwords only: which terms are common depends on the whole catalog
+        self.planner = QueryPlanner(stop_words)
+        self.max_df = max_df
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=4 * len(shards), thread_name_prefix='shard')
+        self.document_frequency = LRUCache(stats_cache_size)  # term -> df over every shard
+        self.total_docs = None
+        self.versions = None  # index version of every shard the cached statistics describe
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.failures = Counter()  # shard -> failed calls
+
+    def timeout_for(self, deadline):
+        remaining = deadline.remaining_ms() if deadline is not None else None
+        if remaining is None:
+            return self.timeout
+        return max(0.001, min(self.timeout, remaining / 1000.0))
+
+    def scatter(self, call, deadline):
+        """`call(shard, timeout)` on every shard in parallel; None for the shards that failed"""
+        timeout = self.timeout_for(deadline)
+        futures = [self.pool.submit(call, shard, timeout) for shard in self.shards]
+        responses = []
+        for shard, future in zip(self.shards, futures):
+            try:
+                responses.append(future.result())
+            except Exception as e:
+                print(f"Shard {shard.name} failed: {str(e)}")
+                self.failures[shard.name] += 1
+                responses.append(None)
+        if all(response is None for response in responses):
+            raise ShardsUnavailable('no shard responded')
+        if any(response is None for response in responses) and deadline is not None:
+            deadline.degrade('partial_shards')
+        return responses
+
+    def check_shards(self, responses):
+        """Warn when the shards don't make up one partition (wrong or missing shard URLs)"""
+        shards = [tuple(response['shard']) if response and response.get('shard') else None for response in responses]
+        counts = {shard[1] for shard in shards if shard}
+        indexes = sorted(shard[0] for shard in shards if shard)
+        if None in shards or len(counts) != 1 or indexes != list(range(len(self.shards))) \
+                or counts != {len(self.shards)}:
+            print(f"Warning: shards report {shards}; expected 0/{len(self.shards)} to "
+                  f"{len(self.shards) - 1}/{len(self.shards)} once each")
+
+    def global_stats(self, terms, deadline):
+        """GlobalStats for `terms`; only complete statistics are cached"""
+        with self._lock:
+            total_docs = self.total_docs
+            cached = {term: self.document_frequency.get(term) for term in terms}
+        missing = [term for term, df in cached.items() if df is None]
+        if missing or total_docs is None:
+            responses = self.scatter(lambda shard, timeout: shard.stats(missing, timeout), deadline)
+            total_docs = sum(response['total_docs'] for response in responses if response)
+            for term in missing:
+                cached[term] = sum(response['document_frequency'].get(term, 0) for response in responses if response)
+            if all(responses):
+                with self._lock:
+                    if self.versions is None:
+                        self.check_shards(responses)
+                    self.total_docs = total_docs
+                    self.versions = [response['index_version'] for response in responses]
+                    for term in missing:
+                        self.document_frequency.put(term, cached[term])
+
+        common_terms = [term for term, df in cached.items() if df > self.max_df * total_docs]
+        return GlobalStats(total_docs, cached, common_terms)
+
+    def search(self, query, platform=None, genre=None, min_rating=None, sort_by='relevance',
+               page=None, page_size=20, deadline=None):
+        """Merged results (GameResponse dicts) of every shard; raises ShardsUnavailable"""
+        self.searches += 1
+        plan = self.planner.plan(query)
+        if plan.empty:
+            return []
+        stats = self.global_stats(plan.terms, deadline)
+        request = {
+            'q': query, 'platform': platform, 'genre': genre, 'min_rating': min_rating, 'sort_by': sort_by,
+            # Page n of the merged list is among the first n pages of every shard
+            'limit': min(page * page_size if page else MAX_SHARD_RESULTS, MAX_SHARD_RESULTS),
+            'total_docs': stats.total_docs,
+            'document_frequency': stats.document_frequency,
+            'common_terms': sorted(stats.common_terms),
+            'budget_ms': int(self.timeout_for(deadline) * 1000)
+        }
+        responses = self.scatter(lambda shard, timeout: shard.search(request, timeout), deadline)
+
+        versions = [response['index_version'] if response else None for response in responses]
+        with self._lock:
+            if self.versions is not None and any(
+                    version is not None and version != cached
+                    for version, cached in zip(versions, self.versions)):
+                # A shard was rebuilt; statistics are collected again from the next query on
+                self.document_frequency.clear()
+                self.total_docs = None
+                self.versions = None
+        if deadline is not None:
+            for response in responses:
+                for reason in (response or {}).get('degraded', []):
+                    deadline.degrade(reason)
+
+        merged = heapq.merge(*(response['results'] for response in responses if response),
+                             key=MERGE_KEYS[sort_by], reverse=True)
+        if page:
+            return list(islice(merged, (page - 1) * page_size, page * page_size))
+        return list(merged)
+
+    def close(self):
+        self.pool.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            'shards': [shard.name for shard in self.shards],
+            'searches': self.searches,
+            'failures': dict(self.failures),
+            'total_docs': self.total_docs,
+            'document_frequency_cache': self.document_frequency.stats()
+        }
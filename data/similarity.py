@@ -0,0 +1,75 @@
+"""
+Precomputed "more like this" neighbours.
+
+Each game is a sparse TF-IDF vector over the terms of its name, tags, genres
+and platforms (taken from the inverted index's game_refs). Vectors are
+L2-normalized, so cosine similarity is a sparse matrix product; it is
+computed a block of rows at a time and only the top N neighbours per game
+are kept.
+"""
+import numpy as np
+from scipy import sparse
+
+# Fields that describe what a game is; generated descriptions are left out
+SIMILARITY_FIELDS = ('name', 'tag', 'genre', 'platform')
+
+# Padding for games with fewer than top_n neighbours
+NO_NEIGHBOUR = np.iinfo(np.uint32).max
+
+
+def build_game_vectors(rows, cols, weights, doc_count, term_count, max_df=0.1):
+    """
+    Sparse doc x term matrix with L2-normalized rows. Terms found in more
+    than `max_df` of all games (e.g. "pc") link almost everything to
+    everything, so they are dropped.
+    """
+    vectors = sparse.csr_matrix(
+        (np.asarray(weights, dtype=np.float32), (np.asarray(rows), np.asarray(cols))),
+        shape=(doc_count, term_count)
+    )
+    vectors.sum_duplicates()
+
+    df = np.bincount(vectors.indices, minlength=term_count)
+    common = df > max(1, int(max_df * doc_count))
+    if common.any():
+        vectors = vectors @ sparse.diags((~common).astype(np.float32))
+        vectors.eliminate_zeros()
+
+    norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ vectors
+
+
+def top_neighbours(vectors, top_n=10, block_size=256):
+    """
+    Top `top_n` most similar games for every game, as (doc ids, scores)
+    arrays of shape (doc_count, top_n), best first, padded with NO_NEIGHBOUR.
+    """
+    vectors = vectors.tocsr().astype(np.float32)
+    transposed = vectors.T.tocsr()
+    doc_count = vectors.shape[0]
+
+    neighbours = np.full((doc_count, top_n), NO_NEIGHBOUR, dtype=np.uint32)
+    scores = np.zeros((doc_count, top_n), dtype=np.float32)
+
+    for start in range(0, doc_count, block_size):
+        block = (vectors[start:start + block_size] @ transposed).tocsr()
+        for i in range(block.shape[0]):
+            lo, hi = block.indptr[i], block.indptr[i + 1]
+            docs = block.indices[lo:hi]
+            similarities = block.data[lo:hi]
+
+            # A game is not similar to itself
+            keep = docs != start + i
+            docs, similarities = docs[keep], similarities[keep]
+
+            if len(similarities) > top_n:
+                best = np.argpartition(-similarities, top_n)[:top_n]
+                docs, similarities = docs[best], similarities[best]
+
+            # Highest similarity first, lower doc id breaks ties
+            order = np.lexsort((docs, -similarities))
+            neighbours[start + i, :len(order)] = docs[order]
+            scores[start + i, :len(order)] = similarities[order]
+
+    return neighbours, scores
@@ -2,24 +2,34 @@ import uvicorn
 import nltk
 import sys
 import os
-from pymongo import MongoClient
-from pymongo.errors import ConnectionError
+from pymongo.errors import PyMongoError
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+from catalogs import DEFAULT_CATALOG, CatalogRegistry  # noqa: E402
+from connection import MONGO_URI, get_connection  # noqa: E402
+
 def check_mongodb():
     """Check if MongoDB is running and accessible"""
     print("Checking MongoDB connection...")
-    client = MongoClient('mongodb://localhost:27017/', serverSelectionTimeoutMS=5000)
+    # Same pool settings as the API (see data/connection.py)
+    connection = get_connection()
     try:
-        # The ismaster command is cheap and does not require auth.
-        client.admin.command('ismaster')
-        db = client['game_search_engine']
-        games_count = db.games.count_documents({})
+        # The ping command is cheap and does not require auth.
+        connection.ping()
+        registry = CatalogRegistry(connection.database())
+        games_count = registry.live(DEFAULT_CATALOG).games.count_documents({})
         print(f"MongoDB connection successful! Found {games_count} games in database.")
+        for catalog, version in registry.catalogs().items():
+            print(f"Catalog {catalog}: version {version}")
+        print(f"Wire compression: {', '.join(connection.compressors) or 'none'}")
         return True
-    except ConnectionError:
-        print("Error: Could not connect to MongoDB. Please make sure MongoDB is running on localhost:27017")
+    except PyMongoError:
+        print(f"Error: Could not connect to MongoDB. Please make sure MongoDB is running at {MONGO_URI}")
         return False
+    finally:
+        # The API runs in its own process with its own pool
+        connection.close()
 
 def download_nltk_data():
     """Download required NLTK data if not already present"""
@@ -0,0 +1,52 @@
+"""
+The data modules read their configuration from the environment when they
+are imported, and connect to MongoDB through data/connection.py; both are
+set up here first. Every MongoClient is the one in-memory mongomock client
+(benchmarks/run_benchmarks.install_mongomock), shared by all tests, so
+tests ingest into catalogs of their own.
+"""
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(TESTS_DIR)
+sys.path[:0] = [os.path.join(REPO_ROOT, 'data'), os.path.join(REPO_ROOT, 'benchmarks')]
+
+# No index snapshot unless a test exports one, no per-client rate limit
+os.environ['GAME_SEARCH_SNAPSHOT'] = os.path.join(TESTS_DIR, 'no-such-dir', 'index.snap')
+os.environ['GAME_SEARCH_CLIENT_RATE'] = '0'
+os.environ['GAME_SHARD_SECRET'] = 'test-shard-secret'
+
+from run_benchmarks import install_mongomock  # noqa: E402
+
+install_mongomock()
+
+from synthetic import write_corpus  # noqa: E402
+
+# Games in the synthetic corpus most tests search
+CORPUS_GAMES = 200
+
+
+@pytest.fixture(scope='session')
+def corpus_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('corpus') / 'games.json')
+    write_corpus(path, CORPUS_GAMES, seed=1)
+    return path
+
+
+@pytest.fixture(scope='session')
+def ingest(corpus_path):
+    """ingest(catalog, shard=None): GameDataProcessor that ingested the corpus into `catalog`, once per catalog"""
+    from mongo import GameDataProcessor
+
+    processors = {}
+
+    def ingest(catalog, shard=None):
+        if catalog not in processors:
+            processor = GameDataProcessor(catalog=catalog, shard=shard)
+            assert processor.process_json_file(corpus_path)
+            processors[catalog] = processor
+        return processors[catalog]
+    return ingest
@@ -0,0 +1,33 @@
+"""
+One shard API process for test_sharding.py: ingests its shard of a corpus
+into its own in-memory mongomock, then serves the API.
+
+    python tests/shard_server.py <corpus.json> <index> <count> <port>
+"""
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(TESTS_DIR)
+sys.path[:0] = [os.path.join(REPO_ROOT, 'data'), os.path.join(REPO_ROOT, 'benchmarks')]
+
+from run_benchmarks import install_mongomock  # noqa: E402
+
+
+def main():
+    corpus_path, index, count, port = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+    install_mongomock()
+
+    import uvicorn
+    from mongo import GameDataProcessor
+
+    processor = GameDataProcessor(catalog=f"default-{index}of{count}", shard=(index, count))
+    if not processor.process_json_file(corpus_path):
+        sys.exit(f"Failed to ingest shard {index} of {count}")
+
+    import api
+    uvicorn.run(api.app, host='127.0.0.1', port=port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from admission import AdmissionController, Deadline, DeadlineStats, Overloaded, RateLimiter
+
+
+def test_rate_limiter_allows_a_burst_then_limits():
+    limiter = RateLimiter(rate=1, burst=3)
+    for _ in range(3):
+        limiter.check('a')
+    with pytest.raises(Overloaded) as e:
+        limiter.check('a')
+    assert e.value.reason == 'rate_limited'
+    assert e.value.retry_after >= 1
+    # Other clients have buckets of their own
+    limiter.check('b')
+    assert limiter.stats()['allowed'] == 4 and limiter.stats()['limited'] == 1
+
+
+def test_rate_limiter_refills_over_time():
+    limiter = RateLimiter(rate=10, burst=1)
+    limiter.check('a')
+    with pytest.raises(Overloaded):
+        limiter.check('a')
+    limiter.buckets.get('a').updated -= 0.2
+    limiter.check('a')
+
+
+def test_rate_limiter_costs():
+    limiter = RateLimiter(rate=1, burst=5)
+    limiter.check('a', cost=4)
+    with pytest.raises(Overloaded):
+        limiter.check('a', cost=2)
+    # A batch larger than the bucket takes a full bucket instead of never passing
+    limiter.check('b', cost=50)
+    with pytest.raises(Overloaded):
+        limiter.check('b')
+
+
+def test_rate_limiter_disabled():
+    limiter = RateLimiter(rate=0, burst=0)
+    for _ in range(100):
+        limiter.check('a')
+
+
+def test_admission_queues_then_sheds():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, max_queued=1, queue_timeout=5)
+        await admission.acquire()
+        queued = asyncio.ensure_future(admission.acquire())
+        await asyncio.sleep(0)
+        assert admission.queued == 1
+        with pytest.raises(Overloaded) as e:
+            await admission.acquire()
+        assert e.value.reason == 'queue_full'
+
+        admission.release()
+        await queued
+        assert admission.in_flight == 1 and admission.queued == 0
+        admission.release()
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['admitted'] == 2
+    assert stats['shed'] == {'queue_full': 1}
+    assert stats['peak_queued'] == 1 and stats['in_flight'] == 0
+
+
+def test_admission_sheds_after_the_queue_timeout():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, max_queued=4, queue_timeout=0.05)
+        await admission.acquire()
+        with pytest.raises(Overloaded) as e:
+            await admission.acquire()
+        assert e.value.reason == 'queue_timeout'
+        assert admission.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_admission_unlimited():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=0, max_queued=0, queue_timeout=0)
+        for _ in range(100):
+            await admission.acquire()
+        return admission.stats()
+
+    assert asyncio.run(scenario())['admitted'] == 100
+
+
+def test_deadline():
+    unlimited = Deadline(0)
+    assert unlimited.remaining_ms() is None and not unlimited.expired and unlimited.max_time_ms() is None
+
+    deadline = Deadline(1000, started=time.monotonic() - 0.5)
+    assert 0 < deadline.remaining_ms() <= 500
+    assert deadline.max_time_ms(share=0.5) <= 250
+    assert not deadline.expired
+
+    expired = Deadline(100, started=time.monotonic() - 1)
+    assert expired.expired
+    # Never 0, which MongoDB reads as no limit
+    assert expired.max_time_ms() == 1
+
+
+def test_deadline_stats():
+    stats = DeadlineStats(2000)
+    degraded = Deadline(2000)
+    degraded.degrade('partial_rank')
+    degraded.degrade('partial_rank')
+    degraded.degrade('partial_fetch')
+    assert degraded.degraded == ['partial_rank', 'partial_fetch']
+    stats.record(degraded)
+    stats.record(Deadline(2000))
+    assert stats.stats() == {'budget_ms': 2000, 'requests': 2, 'degraded_requests': 1,
+                             'degraded': {'partial_rank': 1, 'partial_fetch': 1}}
+
+
+# The same, through the API
+
+@pytest.fixture
+def api(ingest):
+    import api
+    ingest('default')
+    return api
+
+
+def get(api, *requests):
+    """Responses of GET requests sent to the API in order, in one event loop"""
+    async def send():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return [await client.get(url, params=params, headers=headers) for url, params, headers in requests]
+    return asyncio.run(send())
+
+
+def test_api_rate_limits_clients(api, monkeypatch):
+    monkeypatch.setattr(api, 'rate_limiter', RateLimiter(rate=1, burst=2))
+    search = ('/search/', {'q': 'dark'}, {'X-Client-Id': 'noisy'})
+    responses = get(api, search, search, search, ('/search/', {'q': 'dark'}, {'X-Client-Id': 'quiet'}))
+    assert [response.status_code for response in responses] == [200, 200, 429, 200]
+    assert int(responses[2].headers['Retry-After']) >= 1
+
+
+def test_api_sheds_searches_when_overloaded(api, monkeypatch):
+    monkeypatch.setattr(api, 'admission', AdmissionController(max_in_flight=1, max_queued=0, queue_timeout=1))
+
+    async def send():
+        await api.admission.acquire()
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            shed = await client.get('/search/', params={'q': 'dark'})
+            api.admission.release()
+            admitted = await client.get('/search/', params={'q': 'dark'})
+        return shed, admitted
+
+    shed, admitted = asyncio.run(send())
+    assert shed.status_code == 503 and 'Retry-After' in shed.headers
+    assert admitted.status_code == 200
+    assert api.admission.stats()['shed'] == {'queue_full': 1}
+
+
+def test_api_stream_cut_short_ends_with_a_truncated_line(api, monkeypatch):
+    engine = api.catalog_router.get('default')
+    search_stream = engine.search_stream
+
+    def cut_short(*args, deadline=None, **kwargs):
+        for i, game in enumerate(search_stream(*args, deadline=deadline, **kwargs)):
+            if i == 3:
+                deadline.degrade('partial_fetch')
+                return
+            yield game
+    monkeypatch.setattr(engine, 'search_stream', cut_short)
+
+    (response,) = get(api, ('/search/', {'q': 'dark', 'format': 'ndjson'}, None))
+    lines = response.text.splitlines()
+    assert response.status_code == 200
+    assert len(lines) == 4
+    assert lines[-1] == api.truncated_line(['partial_fetch']).strip()
+    assert api.admission.stats()['in_flight'] == 0
+
+
+def test_api_stream_that_is_never_sent_holds_nothing(api):
+    from starlette.requests import Request
+    from starlette.responses import Response
+
+    engine = api.catalog_router.get('default')
+    request = Request({'type': 'http', 'method': 'GET', 'path': '/search/', 'headers': [], 'client': ('10.0.0.1', 1)})
+
+    async def respond():
+        return await api.serve_search(request, Response(), 'dark', None, None, None, 'relevance', None, 20,
+                                      'ndjson', None)
+
+    async def consume(body):
+        return [line async for line in body]
+
+    # The client went away before the body was sent
+    response = asyncio.run(respond())
+    assert api.admission.stats()['in_flight'] == 0
+    assert api.catalog_router._leases[id(engine)] == 0
+
+    lines = asyncio.run(consume(response.body_iterator))
+    assert lines and not lines[-1].startswith(api.TRUNCATED_LINE_PREFIX)
+    assert api.admission.stats()['in_flight'] == 0
+    assert api.catalog_router._leases[id(engine)] == 0
+
+
+def test_api_stream_shed_before_its_first_chunk(api, monkeypatch):
+    monkeypatch.setattr(api, 'admission', AdmissionController(max_in_flight=1, max_queued=0, queue_timeout=1))
+
+    async def send():
+        await api.admission.acquire()
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            shed = await client.get('/search/', params={'q': 'dark', 'format': 'ndjson'})
+        api.admission.release()
+        return shed
+
+    shed = asyncio.run(send())
+    # Headers are sent before the stream is admitted
+    assert shed.status_code == 200
+    assert shed.text == api.truncated_line(['queue_full'])
+    assert api.admission.stats()['in_flight'] == 0
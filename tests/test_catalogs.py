@@ -0,0 +1,161 @@
+import mongomock
+import pytest
+
+from catalogs import CatalogRegistry, CatalogRouter, UnknownCatalog, valid_catalog
+
+
+@pytest.fixture
+def registry():
+    return CatalogRegistry(mongomock.MongoClient()['catalog_tests'])
+
+
+def build(registry, catalog, games=1):
+    """Begin, fill and publish a version of `catalog`"""
+    namespace = registry.begin(catalog)
+    namespace.games.insert_many([{'game_id': i} for i in range(games)])
+    registry.publish(namespace)
+    return namespace
+
+
+class Engine:
+    def __init__(self, namespace):
+        self.version = namespace.version
+        self.closed = False
+
+
+def close_engine(engine):
+    engine.closed = True
+
+
+def router(registry, refresh_interval=0):
+    return CatalogRouter(registry, Engine, refresh_interval, close_engine)
+
+
+def test_versions_live_in_prefixed_collections(registry):
+    namespace = registry.begin('pc')
+    assert namespace.version == 1
+    assert namespace.games.name == 'pc.v1.games'
+    assert namespace['platforms'].name == 'pc.v1.platforms'
+    # Not served until it is published
+    assert registry.live('pc') is None and registry.building('pc').version == 1
+
+    registry.publish(namespace)
+    assert registry.live('pc').version == 1 and registry.building('pc') is None
+    assert registry.catalogs() == {'default': None, 'pc': 1}
+
+
+def test_unpublished_default_catalog_is_the_legacy_layout(registry):
+    namespace = registry.live('default')
+    assert namespace.version is None and namespace.games.name == 'games'
+
+
+def test_invalid_catalog_names(registry):
+    assert valid_catalog('pc-eu_2')
+    for name in ('', 'PC', '../games', 'a' * 49, None):
+        assert not valid_catalog(name)
+    with pytest.raises(UnknownCatalog):
+        registry.live('pc.v1')
+
+
+def test_publishing_drops_the_version_before_the_previous_one(registry):
+    first = build(registry, 'pc')
+    second = build(registry, 'pc')
+    assert first.games.count_documents({}) == 1
+    assert registry.entry('pc')['previous'] == 1
+
+    build(registry, 'pc')
+    assert registry.live('pc').version == 3
+    assert first.games.count_documents({}) == 0
+    assert second.games.count_documents({}) == 1
+
+
+def test_an_unfinished_build_is_dropped_by_the_next(registry):
+    build(registry, 'pc')
+    abandoned = registry.begin('pc')
+    abandoned.games.insert_one({'game_id': 1})
+    assert registry.begin('pc').version == 3
+    assert abandoned.games.count_documents({}) == 0
+    assert registry.live('pc').version == 1
+
+
+def test_router_opens_an_engine_once_per_version(registry):
+    build(registry, 'pc')
+    catalogs = router(registry)
+    engine = catalogs.get('pc')
+    assert catalogs.get('pc') is engine and engine.version == 1
+
+    build(registry, 'pc')
+    assert catalogs.get('pc').version == 2
+    assert engine.closed
+    assert catalogs.stats()['opened'] == 2 and catalogs.stats()['closed'] == 1
+
+
+def test_router_looks_versions_up_again_after_the_refresh_interval(registry):
+    build(registry, 'pc')
+    catalogs = router(registry, refresh_interval=3600)
+    engine = catalogs.get('pc')
+    build(registry, 'pc')
+    assert catalogs.get('pc') is engine
+    assert catalogs.acquire_cached('pc') is engine
+    catalogs.release(engine)
+
+    catalogs.refresh_interval = 0
+    assert catalogs.acquire_cached('pc') is None
+    assert catalogs.get('pc').version == 2
+
+
+def test_router_keeps_serving_when_the_lookup_fails(registry, monkeypatch):
+    build(registry, 'pc')
+    catalogs = router(registry)
+    engine = catalogs.get('pc')
+
+    def unavailable(catalog):
+        raise ConnectionError('registry unavailable')
+    monkeypatch.setattr(registry, 'live', unavailable)
+    assert catalogs.get('pc') is engine
+    with pytest.raises(ConnectionError):
+        catalogs.get('console')
+
+
+def test_router_unknown_catalog(registry):
+    catalogs = router(registry)
+    with pytest.raises(UnknownCatalog):
+        catalogs.acquire('pc')
+    with pytest.raises(UnknownCatalog):
+        catalogs.acquire('not a name')
+
+
+def test_replaced_engine_closes_on_its_last_release(registry):
+    build(registry, 'pc')
+    catalogs = router(registry)
+    old = catalogs.acquire('pc')
+    # A coalesced search takes a lease of its own (run_leased)
+    catalogs.retain(old)
+
+    build(registry, 'pc')
+    new = catalogs.acquire('pc')
+    assert new.version == 2
+    assert not old.closed and catalogs.stats()['retired'] == 1
+
+    catalogs.release(old)
+    assert not old.closed
+    catalogs.release(old)
+    assert old.closed and catalogs.stats()['retired'] == 0
+
+    # The serving engine stays open after its last release
+    catalogs.release(new)
+    assert not new.closed and catalogs.stats()['closed'] == 1
+
+
+def test_close_closes_serving_and_retired_engines(registry):
+    build(registry, 'pc')
+    build(registry, 'console')
+    catalogs = router(registry)
+    old = catalogs.acquire('pc')
+    build(registry, 'pc')
+    new = catalogs.get('pc')
+    console = catalogs.get('console')
+
+    catalogs.close()
+    assert old.closed and new.closed and console.closed
+    assert catalogs.stats()['open'] == {} and catalogs.stats()['closed'] == 3
@@ -0,0 +1,102 @@
+import importlib.util
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from connection import PoolMonitor, available_compressors, read_preference
+
+EVENT = SimpleNamespace()
+
+
+def check_out(monitor, wait_s):
+    """A checkout that waited `wait_s` for its connection"""
+    monitor.connection_check_out_started(EVENT)
+    monitor._started.at -= wait_s
+    monitor.connection_checked_out(EVENT)
+
+
+def test_checkouts_and_their_waits():
+    monitor = PoolMonitor()
+    check_out(monitor, 0.0)
+    check_out(monitor, 0.02)
+    check_out(monitor, 2.0)
+    stats = monitor.stats()
+    assert stats['checkouts'] == 3 and stats['checked_out'] == 3
+    assert stats['wait_max_ms'] >= 2000.0
+    assert stats['wait_avg_ms'] == pytest.approx(2020.0 / 3, abs=5.0)
+    histogram = stats['wait_histogram']
+    assert histogram['<=1ms'] == 1 and histogram['<=50ms'] == 1 and histogram['>1000ms'] == 1
+    assert sum(histogram.values()) == 3
+
+
+def test_checked_out_connections_and_their_peak():
+    monitor = PoolMonitor()
+    for _ in range(3):
+        check_out(monitor, 0.0)
+    monitor.connection_checked_in(EVENT)
+    monitor.connection_checked_in(EVENT)
+    check_out(monitor, 0.0)
+    assert monitor.stats()['checked_out'] == 2 and monitor.stats()['peak_checked_out'] == 3
+
+
+def test_a_checkout_seen_without_its_start_waited_nothing():
+    monitor = PoolMonitor()
+    monitor.connection_checked_out(EVENT)
+    assert monitor.stats()['wait_max_ms'] == 0.0 and monitor.stats()['checkouts'] == 1
+
+
+def test_failed_checkouts_by_reason():
+    monitor = PoolMonitor()
+    for reason in ('timeout', 'timeout', 'connectionError'):
+        monitor.connection_check_out_started(EVENT)
+        monitor.connection_check_out_failed(SimpleNamespace(reason=reason))
+    stats = monitor.stats()
+    assert stats['failed'] == {'timeout': 2, 'connectionError': 1}
+    assert stats['checkouts'] == 0 and stats['wait_avg_ms'] == 0.0
+
+
+def test_open_connections_and_cleared_pools():
+    monitor = PoolMonitor()
+    for _ in range(3):
+        monitor.connection_created(EVENT)
+    monitor.connection_closed(EVENT)
+    monitor.pool_cleared(EVENT)
+    assert monitor.stats()['open_connections'] == 2 and monitor.stats()['pools_cleared'] == 1
+
+
+def test_waits_are_timed_per_thread():
+    monitor = PoolMonitor()
+    monitor.connection_check_out_started(EVENT)
+    monitor._started.at -= 1.0
+    # Another thread's checkout doesn't see this thread's start
+    other = threading.Thread(target=monitor.connection_checked_out, args=(EVENT,))
+    other.start()
+    other.join()
+    assert monitor.stats()['wait_max_ms'] < 1000.0
+    monitor.connection_checked_out(EVENT)
+    assert monitor.stats()['wait_max_ms'] >= 1000.0
+
+
+def test_compressors_that_are_not_installed_are_skipped(monkeypatch):
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, 'find_spec',
+                        lambda name: None if name in ('zstandard', 'snappy') else find_spec(name))
+    assert available_compressors('zstd, snappy,zlib') == ['zlib']
+    assert available_compressors('zstd') == []
+
+
+def test_compressor_order_is_kept():
+    assert available_compressors('zlib') == ['zlib']
+    assert available_compressors(' zlib ,,') == ['zlib']
+    assert available_compressors('') == []
+    with pytest.raises(ValueError, match='lz4'):
+        available_compressors('lz4,zlib')
+
+
+def test_read_preferences():
+    assert read_preference('primary').mongos_mode == 'primary'
+    assert read_preference('secondaryPreferred', 30).max_staleness == 30
+    with pytest.raises(ValueError, match='secondaries'):
+        read_preference('secondaries')
+
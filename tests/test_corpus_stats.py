@@ -0,0 +1,93 @@
+import mongomock
+
+from corpus_stats import CorpusStatistics
+
+
+def counted(*games):
+    """CorpusStatistics of games given as {field: tokens}, with doc ids in order"""
+    stats = CorpusStatistics()
+    for doc_id, fields in enumerate(games):
+        stats.add_game(doc_id)
+        for field, tokens in fields.items():
+            stats.add_field(doc_id, field, tokens)
+    return stats
+
+
+def test_df_counts_a_term_once_per_game():
+    stats = counted(
+        {'name': ['dark', 'souls'], 'description': ['dark', 'dark', 'fire']},
+        {'name': ['dark'], 'genres': ['action']},
+    )
+    assert stats.df('dark') == 2
+    assert stats.df('fire') == 1 and stats.df('missing') == 0
+    assert stats.avg_terms_per_game() == 2.5
+
+
+def test_field_totals():
+    stats = counted(
+        {'name': ['dark', 'souls'], 'description': ['dark', 'dark', 'fire']},
+        {'name': ['dark']},
+    )
+    assert stats.field_lengths == {'name': 3, 'description': 3}
+    assert stats.avg_field_length('name') == 1.5
+    assert stats.avg_field_length('genres') == 0.0
+    assert CorpusStatistics().avg_field_length('name') == 0.0
+
+
+def test_a_duplicate_game_is_counted_once():
+    stats = counted({'name': ['dark']})
+    assert not stats.add_game(0)
+    stats.add_field(0, 'name', ['dark', 'souls'])
+    assert stats.total_docs == 1 and stats.df('dark') == 1 and stats.df('souls') == 0
+    assert stats.field_lengths == {'name': 1}
+
+
+def test_common_terms():
+    stats = counted({'name': ['game', 'dark']}, {'name': ['game']}, {'name': ['game', 'dark']}, {'name': ['fire']})
+    assert stats.common_terms(0.5) == ['game']
+    assert sorted(stats.common_terms(0.25)) == ['dark', 'game']
+
+
+def test_document_round_trip_keeps_the_totals():
+    stats = counted({'name': ['dark', 'souls']}, {'name': ['dark']})
+    document = stats.to_document()
+    assert document['total_games'] == 2 and document['total_terms'] == 2
+    assert document['avg_field_lengths'] == {'name': 1.5}
+    # Per-term df lives on the inverted index, not in this document
+    restored = CorpusStatistics.from_document(document)
+    assert restored.total_docs == 2 and restored.field_lengths == {'name': 3}
+    assert restored.document_frequency == {}
+    assert CorpusStatistics.from_document(None).total_docs == 0
+
+
+def test_legacy_documents_carry_every_df():
+    restored = CorpusStatistics.from_document({
+        'total_games': 2, 'terms': ['dark', 'souls'], 'document_frequencies': [2, 1], 'field_lengths': {'name': 3}
+    })
+    assert restored.df('dark') == 2 and restored.df('souls') == 1
+
+
+def test_resume_rebuilds_df_from_the_inverted_index():
+    index = mongomock.MongoClient()['corpus_stats'].inverted_index
+    index.insert_many([
+        {'term': 'dark', 'game_refs': [{'doc_id': 0}, {'doc_id': 0}, {'doc_id': 1}, {'doc_id': 3}]},
+        {'term': 'souls', 'game_refs': [{'doc_id': 1}]},
+        {'term': 'fire', 'game_refs': [{'doc_id': 2}, {'doc_id': 3}]},
+    ])
+    # Games from doc id 2 on were not checkpointed and are ingested again
+    stats = CorpusStatistics.from_index(index, 2, {'name': 4})
+    assert stats.total_docs == 2
+    assert stats.document_frequency == {'dark': 2, 'souls': 1}
+    assert stats.field_lengths == {'name': 4}
+    # Counting carries on after the rebuilt games
+    assert stats.add_game(2)
+    stats.add_field(2, 'name', ['fire'])
+    assert stats.df('fire') == 1
+
+
+def test_rebuilt_df_matches_an_ingest(ingest):
+    processor = ingest('corpus_stats')
+    stats = processor.corpus_stats
+    rebuilt = CorpusStatistics.from_index(processor.db.inverted_index, stats.total_docs, stats.field_lengths)
+    assert rebuilt.document_frequency == stats.document_frequency
+    assert rebuilt.to_document() == stats.to_document()
@@ -0,0 +1,55 @@
+import json
+
+from dictionaries import Dictionaries
+
+LEGACY_GAME = {
+    'game_id': 1,
+    'platforms': [
+        {'id': 4, 'name': 'PC', 'slug': 'pc', 'released_at': '2020-01-01',
+         'requirements': {'minimum': 'Any CPU', 'recommended': 'A fast CPU'}},
+        {'id': 7, 'name': 'Nintendo Switch', 'slug': 'nintendo-switch', 'released_at': None}
+    ],
+    'tags': [{'id': 31, 'name': 'Singleplayer', 'slug': 'singleplayer'}],
+    'stores': [{'id': 1, 'name': 'Steam', 'slug': 'steam'}]
+}
+
+
+def test_legacy_documents_keep_their_embedded_entries():
+    game = Dictionaries().resolve_game(json.loads(json.dumps(LEGACY_GAME)), {})
+    assert game['platforms'] == [
+        {'id': 4, 'name': 'PC', 'slug': 'pc', 'released_at': '2020-01-01',
+         'requirements': {'minimum': 'Any CPU', 'recommended': 'A fast CPU'}},
+        {'id': 7, 'name': 'Nintendo Switch', 'slug': 'nintendo-switch', 'released_at': None,
+         'requirements': {'minimum': None, 'recommended': None}}
+    ]
+    assert game['tags'] == LEGACY_GAME['tags']
+    assert game['stores'] == LEGACY_GAME['stores']
+
+
+def test_normalized_documents_resolve_to_the_embedded_shape(ingest, corpus_path):
+    processor = ingest('dictionaries')
+    dictionaries = Dictionaries.load(processor.db)
+    with open(corpus_path, encoding='utf-8') as file:
+        source = {game['id']: game for game in json.load(file)}
+
+    for game in processor.db.games.find():
+        assert all('requirements' not in ref for ref in game['platforms'])
+        resolved = dictionaries.resolve_game(game, dictionaries.load_requirements(game))
+        expected = [
+            {'id': platform['platform']['id'], 'name': platform['platform']['name'],
+             'slug': platform['platform']['slug'], 'released_at': platform['released_at'],
+             'requirements': {
+                 'minimum': (platform['requirements_en'] or {}).get('minimum'),
+                 'recommended': (platform['requirements_en'] or {}).get('recommended')
+             }}
+            for platform in source[game['game_id']]['platforms']
+        ]
+        assert resolved['platforms'] == expected
+        assert [tag['name'] for tag in resolved['tags']] == [tag['name'] for tag in source[game['game_id']]['tags']]
+
+
+def test_unknown_entries_are_no_match(ingest):
+    dictionaries = Dictionaries.load(ingest('dictionaries').db)
+    assert dictionaries.get('platforms', 123456) is None
+    assert dictionaries.platform_id('No Such Platform') is None
+    assert dictionaries.platform_id('PC') == 4
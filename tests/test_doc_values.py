@@ -0,0 +1,164 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import doc_values
+from doc_values import (
+    PRIOR_LEVELS, PRIOR_SIGNALS, DocValuesBuilder, boost_scores, parse_boosts, prior_documents, prior_from_documents,
+    prior_weights
+)
+
+
+def test_parse_boosts():
+    assert parse_boosts('') == {} and parse_boosts(None) == {}
+    assert parse_boosts(' popularity=0.3, freshness = 0.1 ,') == {'popularity': 0.3, 'freshness': 0.1}
+    with pytest.raises(ValueError):
+        parse_boosts('popularity=lots')
+
+
+def test_prior_weights():
+    assert prior_weights({}) is None and prior_weights(None) is None
+    assert prior_weights({'popularity': 0.0}) is None
+    weights = prior_weights({'metacritic': 0.5})
+    assert weights.tolist() == [0.0, 0.0, 0.5 / PRIOR_LEVELS, 0.0]
+    with pytest.raises(ValueError, match='quality'):
+        prior_weights({'quality': 1.0})
+
+
+def test_boost_scores():
+    prior = np.array([[PRIOR_LEVELS, 0, 0, 0], [0, 0, 0, 0]], dtype=np.uint8)
+    weights = prior_weights({'popularity': 0.5})
+    # Doc 2 is beyond the prior and stays unboosted
+    assert boost_scores(prior, [0, 1, 2], np.array([2.0, 2.0, 2.0]), weights).tolist() == [3.0, 2.0, 2.0]
+
+
+def test_prior_round_trips_through_chunks(monkeypatch):
+    monkeypatch.setattr(doc_values, 'PRIOR_CHUNK_DOCS', 3)
+    prior = np.random.default_rng(1).integers(0, PRIOR_LEVELS + 1, (10, len(PRIOR_SIGNALS)), dtype=np.uint8)
+    documents = list(prior_documents(prior))
+    assert [document['start'] for document in documents] == [0, 3, 6, 9]
+    # Chunks are put back in order however they are read
+    assert np.array_equal(prior_from_documents(documents[::-1]), prior)
+    assert list(prior_documents(prior[:0])) == [] and prior_from_documents([]) is None
+
+
+@pytest.fixture(scope='module')
+def processor(ingest):
+    return ingest('boosts')
+
+
+def test_empty_boosts_leave_ranking_unchanged(processor):
+    import api
+    plain = api.SearchEngine(database=processor.db, boosts={})
+    zero = api.SearchEngine(database=processor.db, boosts={'popularity': 0.0})
+    assert plain.prior is None and zero.prior is None
+    for query in ('dark', 'space strategy', 'legend'):
+        expected = [(game.id, game.relevance_score) for game in plain.run_search(query)]
+        assert [(game.id, game.relevance_score) for game in zero.run_search(query)] == expected
+
+
+def test_boosts_scale_relevance_by_the_prior(processor):
+    import api
+    plain = api.SearchEngine(database=processor.db, boosts={})
+    boosted = api.SearchEngine(database=processor.db, boosts={'popularity': 1.0})
+    prior = boosted.prior
+    assert prior is not None and len(prior) == processor.db.games.count_documents({})
+
+    scores = {game.id: game.relevance_score for game in plain.run_search('dark')}
+    assert scores
+    doc_ids = {game['game_id']: game['doc_id'] for game in processor.db.games.find({}, {'game_id': 1, 'doc_id': 1})}
+    for game in boosted.run_search('dark'):
+        popularity = prior[doc_ids[game.id], PRIOR_SIGNALS.index('popularity')] / PRIOR_LEVELS
+        assert game.relevance_score == pytest.approx(scores[game.id] * (1 + popularity))
+
+
+def test_an_empty_corpus_publishes_an_empty_catalog(tmp_path):
+    import api
+    from mongo import GameDataProcessor
+    path = tmp_path / 'games.json'
+    path.write_text('[]')
+    processor = GameDataProcessor(catalog='empty')
+    assert processor.process_json_file(str(path))
+    assert processor.registry.live('empty').version == processor.db.version
+
+    engine = api.SearchEngine(database=processor.db, boosts={'popularity': 1.0})
+    assert engine.prior is None
+    assert engine.run_search('dark') == []
+
+
+def game(game_id, rating=None, platforms=(), genres=(), released=None, **fields):
+    return dict(fields, game_id=game_id, rating=rating, genres=list(genres), released=released,
+                platforms=[{'id': platform} for platform in platforms])
+
+
+PLATFORM_NAMES = {1: 'PC', 2: 'PlayStation 5'}
+
+GAMES = [
+    game(100, 4.5, [1], ['Action'], datetime(2020, 5, 1)),
+    game(101, None, [1, 2], ['Action', 'RPG'], datetime(2021, 1, 1)),
+    game(102, 3.0, [2], ['RPG'], None),
+    game(103, 4.5, [1, 1], ['Action'], datetime(2020, 5, 1)),
+]
+
+
+@pytest.fixture
+def values():
+    return DocValuesBuilder.from_games(GAMES, PLATFORM_NAMES.get).build()
+
+
+def test_facet_blocks(values):
+    assert values.facet_docs('platform', 'PC').tolist() == [0, 1, 3]
+    assert values.facet_docs('genre', 'RPG').tolist() == [1, 2]
+    assert values.facet_docs('genre', 'Racing').tolist() == []
+
+
+def test_filters_combine(values):
+    docs = np.arange(4, dtype=np.uint32)
+    assert values.filter(docs).tolist() == [True] * 4
+    assert values.filter(docs, platform='PC', genre='RPG').tolist() == [False, True, False, False]
+    assert values.filter(docs[2:], platform='PlayStation 5').tolist() == [True, False]
+    assert not values.filter(docs, genre='Racing').any()
+
+
+def test_min_rating_leaves_out_unrated_games(values):
+    docs = np.arange(4, dtype=np.uint32)
+    assert values.filter(docs, min_rating=4.0).tolist() == [True, False, False, True]
+    assert values.filter(docs, min_rating=1.0).tolist() == [True, False, True, True]
+
+
+def test_sort_ties_fall_back_to_relevance(values):
+    docs = np.arange(4, dtype=np.uint32)
+    scores = np.array([1.0, 5.0, 2.0, 3.0])
+    assert docs[values.sort_order(docs, scores)].tolist() == [1, 3, 2, 0]
+    # 0 and 3 share a rating; an unrated game sorts last
+    assert docs[values.sort_order(docs, scores, 'rating')].tolist() == [3, 0, 2, 1]
+    # 0 and 3 share a release date; an unknown date sorts last
+    assert docs[values.sort_order(docs, scores, 'release_date')].tolist() == [1, 3, 0, 2]
+    # Equal scores keep doc id order
+    assert values.sort_order(docs, np.ones(4)).tolist() == [0, 1, 2, 3]
+
+
+def test_doc_ids_are_dense_in_insertion_order():
+    builder = DocValuesBuilder(PLATFORM_NAMES.get)
+    assert [builder.add(game) for game in GAMES] == [0, 1, 2, 3]
+    # A duplicate in the input keeps its first doc id
+    assert builder.add(game(101, 1.0)) == 1 and len(builder) == 4
+
+    values = builder.build()
+    assert values.game_ids.tolist() == [100, 101, 102, 103]
+    assert [values.doc_id(game_id) for game_id in (103, 100, 999)] == [3, 0, None]
+
+
+def test_stored_doc_ids_must_arrive_in_order():
+    builder = DocValuesBuilder()
+    builder.add(dict(game(100), doc_id=0))
+    with pytest.raises(ValueError, match='expected 1'):
+        builder.add(dict(game(101), doc_id=2))
+
+
+def test_ingest_assigns_dense_doc_ids(processor):
+    doc_ids = sorted(game['doc_id'] for game in processor.db.games.find({}, {'doc_id': 1}))
+    assert doc_ids == list(range(len(doc_ids)))
+    for term_doc in processor.db.inverted_index.find().limit(50):
+        assert all(0 <= ref['doc_id'] < len(doc_ids) for ref in term_doc['game_refs'])
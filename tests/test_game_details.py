@@ -0,0 +1,114 @@
+import asyncio
+
+import httpx
+import pytest
+
+from caching import LRUCache
+
+CATALOG = 'details'
+
+
+@pytest.fixture
+def api(ingest, monkeypatch):
+    import api
+    ingest(CATALOG)
+    monkeypatch.setattr(api, 'detail_cache', LRUCache(16))
+    return api
+
+
+@pytest.fixture
+def game(ingest):
+    games = ingest(CATALOG).db.games
+    game = games.find_one({}, sort=[('game_id', 1)])
+    yield game
+    games.update_one({'game_id': game['game_id']}, {'$set': {'name': game['name'], 'updated': game['updated']}})
+
+
+def get(api, *requests):
+    """Responses of GET /game/{game_id} requests, as (game id, headers), in one event loop"""
+    async def send():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return [
+                await client.get(f'/game/{game_id}', params={'catalog': CATALOG}, headers=headers)
+                for game_id, headers in requests
+            ]
+    return asyncio.run(send())
+
+
+def test_details_are_served_from_the_cache(api, game):
+    first, second = get(api, (game['game_id'], None), (game['game_id'], None))
+    assert first.status_code == second.status_code == 200
+    assert first.json()['name'] == game['name']
+    assert second.content == first.content and second.headers['ETag'] == first.headers['ETag']
+    assert api.detail_cache.stats()['hits'] == 1
+
+
+def test_least_recently_used_details_are_evicted(api, ingest, monkeypatch):
+    monkeypatch.setattr(api, 'detail_cache', LRUCache(2))
+    first, second, third = [game['game_id'] for game in ingest(CATALOG).db.games.find({}, {'game_id': 1}).limit(3)]
+    responses = get(api, (first, None), (second, None), (first, None), (third, None), (second, None), (first, None))
+    assert all(response.status_code == 200 for response in responses)
+    # `second` was the least recently used when `third` came in, then `first`
+    # when `second` came back
+    assert api.detail_cache.stats() == {'entries': 2, 'max_entries': 2, 'hits': 1, 'misses': 5}
+
+
+def test_matching_etag_is_not_modified(api, game):
+    (first,) = get(api, (game['game_id'], None))
+    etag = first.headers['ETag']
+    responses = get(
+        api,
+        (game['game_id'], {'If-None-Match': etag}),
+        (game['game_id'], {'If-None-Match': f'"other", W/{etag}'}),
+        (game['game_id'], {'If-None-Match': '*'}),
+        (game['game_id'], {'If-None-Match': '"other"'}),
+    )
+    assert [response.status_code for response in responses] == [304, 304, 304, 200]
+    assert responses[0].content == b'' and responses[0].headers['ETag'] == etag
+
+
+def test_if_modified_since(api, game):
+    (first,) = get(api, (game['game_id'], None))
+    last_modified = first.headers['Last-Modified']
+    responses = get(
+        api,
+        (game['game_id'], {'If-Modified-Since': last_modified}),
+        (game['game_id'], {'If-Modified-Since': 'Mon, 01 Jan 1990 00:00:00 GMT'}),
+        (game['game_id'], {'If-Modified-Since': 'not a date'}),
+        # If-None-Match takes precedence
+        (game['game_id'], {'If-Modified-Since': last_modified, 'If-None-Match': '"other"'}),
+    )
+    assert [response.status_code for response in responses] == [304, 200, 200, 200]
+
+
+def test_changed_games_are_seen_after_the_ttl(api, game, ingest, monkeypatch):
+    games = ingest(CATALOG).db.games
+    (first,) = get(api, (game['game_id'], None))
+    games.update_one({'game_id': game['game_id']},
+                     {'$set': {'name': 'Renamed', 'updated': '2030-01-01T00:00:00'}})
+
+    # Within the TTL the cached payload is served
+    (cached,) = get(api, (game['game_id'], {'If-None-Match': first.headers['ETag']}))
+    assert cached.status_code == 304
+
+    # Past it, a changed `updated` drops the entry
+    monkeypatch.setattr(api, 'DETAIL_CACHE_TTL', 0)
+    (revalidated,) = get(api, (game['game_id'], {'If-None-Match': first.headers['ETag']}))
+    assert revalidated.status_code == 200
+    assert revalidated.json()['name'] == 'Renamed'
+    assert revalidated.headers['ETag'] != first.headers['ETag']
+    assert revalidated.headers['Last-Modified'] == 'Tue, 01 Jan 2030 00:00:00 GMT'
+
+
+def test_unchanged_games_survive_revalidation(api, game, monkeypatch):
+    monkeypatch.setattr(api, 'DETAIL_CACHE_TTL', 0)
+    first, second = get(api, (game['game_id'], None), (game['game_id'], None))
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert api.detail_cache.stats()['hits'] == 1
+
+
+def test_unknown_game_is_not_found(api):
+    (response,) = get(api, (10 ** 9, None))
+    assert response.status_code == 404
+    assert response.json()['detail'] == 'Game not found'
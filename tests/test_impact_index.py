@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from impact_index import (
+    IMPACT_LEVELS, IMPACT_POSTING_BYTES, ImpactScorer, allocate_budget, disjunctive_terms, impact_sections
+)
+from index_snapshot import IndexSnapshot
+from synthetic import generate_queries
+
+# term -> {doc id: score}
+POSTINGS = {
+    'dragon': {0: 1.0, 2: 4.0, 5: 2.0, 7: 4.0},
+    'empty': {},
+    'knight': {1: 0.5, 2: 3.0, 3: 1.5},
+}
+
+
+class ListSnapshot:
+    """The part of IndexSnapshot an ImpactScorer reads, over POSTINGS"""
+
+    def __init__(self, postings):
+        self.terms = sorted(postings)
+        offsets = [0]
+        docs, scores = [], []
+        for term in self.terms:
+            for doc, score in sorted(postings[term].items()):
+                docs.append(doc)
+                scores.append(score)
+            offsets.append(len(docs))
+        self.posting_offsets = np.asarray(offsets, dtype=np.int64)
+        sections = impact_sections(offsets, docs, scores)
+        self.impact_docs = sections['impact_docs']
+        self.impact_scores = sections['impact_scores']
+        self.impact_scales = sections['impact_scales']
+
+    def term_id(self, term):
+        return self.terms.index(term) if term in self.terms else None
+
+    document_frequency = IndexSnapshot.document_frequency
+    impact_postings = IndexSnapshot.impact_postings
+
+
+def scorer(postings):
+    return ImpactScorer(ListSnapshot(POSTINGS), postings * IMPACT_POSTING_BYTES)
+
+
+def test_impact_lists_are_ordered_by_score_then_doc_id():
+    snapshot = ListSnapshot(POSTINGS)
+    dragon = snapshot.term_id('dragon')
+    docs, scores = snapshot.impact_postings(dragon)
+    assert docs.tolist() == [2, 7, 5, 0]
+    assert scores.tolist() == pytest.approx([4.0, 4.0, 2.0, 1.0], abs=4.0 / IMPACT_LEVELS)
+
+
+def test_impacts_are_quantized_against_the_term_maximum():
+    snapshot = ListSnapshot(POSTINGS)
+    knight = snapshot.term_id('knight')
+    start = int(snapshot.posting_offsets[knight])
+    assert int(snapshot.impact_scores[start]) == IMPACT_LEVELS
+    assert float(snapshot.impact_scales[knight]) == pytest.approx(3.0 / IMPACT_LEVELS)
+    # A term without postings keeps a neutral scale
+    assert float(snapshot.impact_scales[snapshot.term_id('empty')]) == 1.0
+
+
+def test_budget_reads_short_lists_whole_and_shares_the_rest():
+    assert allocate_budget([2, 10, 10], 12) == [2, 5, 5]
+    assert allocate_budget([1, 3, 100], 9) == [1, 3, 5]
+    assert allocate_budget([4, 4], 100) == [4, 4]
+    assert allocate_budget([7, 7, 7], 3) == [1, 1, 1]
+    assert sum(allocate_budget([5, 50, 500], 40)) == 40
+
+
+def test_full_budget_matches_exact_scores():
+    result, postings_read = scorer(100).score(['dragon', 'knight'])
+    assert postings_read == 7
+    exact = {0: 1.0, 1: 0.5, 2: 7.0, 3: 1.5, 5: 2.0, 7: 4.0}
+    assert result.docs.tolist() == sorted(exact)
+    assert result.scores.tolist() == pytest.approx([exact[doc] for doc in sorted(exact)], abs=0.05)
+    assert result.matched['knight'].tolist() == [False, True, True, True, False, False]
+
+
+def test_small_budget_reads_only_the_heads():
+    result, postings_read = scorer(2).score(['dragon', 'knight'])
+    assert postings_read == 2
+    # The best posting of each list, summed where they meet
+    assert result.docs.tolist() == [2]
+    assert result.scores.tolist() == pytest.approx([7.0], abs=0.05)
+
+
+def test_unknown_and_empty_terms_read_nothing():
+    result, postings_read = scorer(10).score(['missing', 'empty'])
+    assert postings_read == 0
+    assert len(result) == 0
+
+
+def test_scoring_leaves_no_state_on_the_scorer():
+    shared = scorer(100)
+    _, first = shared.score(['dragon'])
+    _, second = shared.score(['knight'])
+    assert (first, second) == (4, 3)
+
+
+def test_coverage_needs_an_even_share_per_term():
+    assert scorer(40).covers(['dragon'], 40)
+    assert scorer(40).covers(['dragon', 'knight'], 20)
+    assert not scorer(40).covers(['dragon', 'knight'], 21)
+
+
+@pytest.fixture(scope='module')
+def snapshot(ingest, tmp_path_factory):
+    processor = ingest('impact')
+    path = str(tmp_path_factory.mktemp('impact') / 'index.snap')
+    processor.export_snapshot(path)
+    snapshot = IndexSnapshot(path)
+    yield processor, snapshot
+    snapshot.close()
+
+
+def test_filtered_and_deep_pages_are_ranked_exactly(snapshot):
+    import api
+    processor, snapshot = snapshot
+    # Two postings per query: far too few for any filter or later page
+    budgeted = api.SearchEngine(database=processor.db, snapshot=snapshot, impact_budget=2 * IMPACT_POSTING_BYTES)
+    exact = api.SearchEngine(database=processor.db, snapshot=snapshot, impact_budget=0)
+    assert budgeted.impact is not None and exact.impact is None
+
+    checked = 0
+    for query in generate_queries(30):
+        for page in (1, 2):
+            args = (query['q'], query['platform'], query['genre'], query['min_rating'], 'relevance', page, 5)
+            filtered = query['platform'] or query['genre'] or query['min_rating'] is not None
+            terms = disjunctive_terms(budgeted.plan(query['q']).query)
+            if not filtered and terms is not None and budgeted.impact.covers(terms, page * 5):
+                continue
+            expected = [(result.id, result.relevance_score) for result in exact.run_search(*args)]
+            assert [(result.id, result.relevance_score) for result in budgeted.run_search(*args)] == expected, query
+            checked += 1
+    assert checked
@@ -0,0 +1,115 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from index_snapshot import HEADER, SECTION_ENTRY, IndexSnapshot, SnapshotError
+from synthetic import generate_queries
+
+CATALOG = 'snapshots'
+
+
+@pytest.fixture(scope='module')
+def processor(ingest):
+    return ingest(CATALOG)
+
+
+@pytest.fixture(scope='module')
+def snapshot_path(processor, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('snapshot') / 'index.snap')
+    processor.export_snapshot(path)
+    return path
+
+
+@pytest.fixture
+def snapshot(snapshot_path):
+    snapshot = IndexSnapshot(snapshot_path)
+    yield snapshot
+    snapshot.close()
+
+
+def corrupted_copy(path, tmp_path, offset, length=None):
+    """Copy of a snapshot with the byte at `offset` flipped, or cut to `length` bytes"""
+    copy = str(tmp_path / 'corrupt.snap')
+    shutil.copyfile(path, copy)
+    with open(copy, 'r+b') as file:
+        if length is not None:
+            file.truncate(length)
+        else:
+            file.seek(offset)
+            byte = file.read(1)
+            file.seek(offset)
+            file.write(bytes([byte[0] ^ 0xFF]))
+    return copy
+
+
+def test_round_trip_matches_the_inverted_index(processor, snapshot):
+    assert snapshot.meta['catalog'] == CATALOG
+    assert snapshot.meta['catalog_version'] == processor.db.version
+    assert snapshot.doc_count == processor.db.games.count_documents({})
+    assert snapshot.term_count == processor.db.inverted_index.count_documents({})
+
+    for term_doc in processor.db.inverted_index.find():
+        term_id = snapshot.term_id(term_doc['term'])
+        assert term_id is not None and snapshot.term(term_id) == term_doc['term']
+        docs, scores, fields = snapshot.postings(term_id)
+        assert docs.tolist() == sorted({ref['doc_id'] for ref in term_doc['game_refs']})
+        assert snapshot.document_frequency(term_id) == len(docs)
+        assert (scores > 0).all() and (fields > 0).all()
+    assert snapshot.term_id('no-such-term') is None
+
+
+def test_doc_values_map_game_ids(processor, snapshot):
+    for game in processor.db.games.find({}, {'game_id': 1, 'doc_id': 1}):
+        assert snapshot.doc_values.doc_id(game['game_id']) == game['doc_id']
+        assert int(snapshot.doc_values.game_ids[game['doc_id']]) == game['game_id']
+
+
+def test_search_from_snapshot_matches_mongodb(processor, snapshot):
+    import api
+    from_snapshot = api.SearchEngine(database=processor.db, snapshot=snapshot)
+    from_mongodb = api.SearchEngine(database=processor.db)
+    for query in generate_queries(30):
+        args = (query['q'], query['platform'], query['genre'], query['min_rating'], query['sort_by'])
+        expected = from_mongodb.run_search(*args)
+        results = from_snapshot.run_search(*args)
+        assert sorted(result.id for result in results) == sorted(result.id for result in expected), query
+        assert [result.relevance_score for result in results] == pytest.approx(
+            [result.relevance_score for result in expected], rel=1e-5), query
+
+
+def test_verify_passes_on_an_exported_snapshot(snapshot):
+    assert snapshot.verify()
+
+
+def test_verify_detects_a_corrupt_section(snapshot, snapshot_path, tmp_path):
+    offset, length, _ = snapshot.sections['posting_scores']
+    corrupt = IndexSnapshot(corrupted_copy(snapshot_path, tmp_path, offset + length // 2))
+    try:
+        # Opening doesn't read the sections
+        assert corrupt.term_count == snapshot.term_count
+        with pytest.raises(SnapshotError, match='posting_scores'):
+            corrupt.verify()
+    finally:
+        corrupt.close()
+
+
+def test_corrupt_header_is_rejected_on_open(snapshot_path, tmp_path):
+    with pytest.raises(SnapshotError, match='corrupt header'):
+        IndexSnapshot(corrupted_copy(snapshot_path, tmp_path, HEADER.size + SECTION_ENTRY.size + 20))
+
+
+def test_truncated_and_foreign_files_are_rejected(snapshot, snapshot_path, tmp_path):
+    offset, _, _ = snapshot.sections['posting_docs']
+    with pytest.raises(SnapshotError, match='truncated'):
+        IndexSnapshot(corrupted_copy(snapshot_path, tmp_path, 0, length=offset + 4))
+
+    empty = tmp_path / 'empty.snap'
+    empty.write_bytes(b'')
+    with pytest.raises(SnapshotError, match='empty'):
+        IndexSnapshot(str(empty))
+
+    foreign = tmp_path / 'foreign.snap'
+    foreign.write_bytes(np.arange(64, dtype=np.uint32).tobytes())
+    with pytest.raises(SnapshotError, match='not an index snapshot'):
+        IndexSnapshot(str(foreign))
@@ -0,0 +1,115 @@
+import pytest
+
+from mongo import GameDataProcessor
+from synthetic import write_corpus
+
+BATCH_SIZE = 50
+
+
+class SimulatedCrash(Exception):
+    pass
+
+
+def processor(catalog):
+    processor = GameDataProcessor(catalog=catalog)
+    processor.batch_size = BATCH_SIZE
+    return processor
+
+
+def crash_on_batch(processor, batch):
+    """Fail batch `batch` (1-based) after its postings are written and before its games are"""
+    write_postings = processor.write_postings
+    calls = []
+
+    def crashing(postings, doc_ids):
+        write_postings(postings, doc_ids)
+        calls.append(1)
+        if len(calls) == batch:
+            raise SimulatedCrash()
+    processor.write_postings = crashing
+
+
+def index_contents(processor):
+    """Games, postings and per-term counters of the live version, comparable across ingests"""
+    namespace = processor.registry.live(processor.catalog)
+    postings = {
+        term_doc['term']: sorted(
+            (ref['doc_id'], ref['field'], ref['tf'], round(ref['tf_idf'], 6)) for ref in term_doc['game_refs']
+        )
+        for term_doc in namespace.inverted_index.find()
+    }
+    counters = {
+        term_doc['term']: (term_doc.get('document_frequency'), term_doc.get('total_occurrences'))
+        for term_doc in namespace.inverted_index.find()
+    }
+    games = sorted((game['game_id'], game['doc_id']) for game in namespace.games.find())
+    return games, postings, counters
+
+
+@pytest.fixture(scope='module')
+def clean_ingest(corpus_path):
+    clean = processor('resume-clean')
+    assert clean.process_json_file(corpus_path)
+    return index_contents(clean)
+
+
+def test_crashed_ingest_is_not_published(corpus_path):
+    crashed = processor('resume-unpublished')
+    crash_on_batch(crashed, 3)
+    assert not crashed.process_json_file(corpus_path)
+    assert crashed.registry.live('resume-unpublished') is None
+
+    checkpoint = crashed.ingest_checkpoints.find_one()
+    assert checkpoint['offset'] == 2 * BATCH_SIZE
+    assert checkpoint['batch'] == 2
+    assert not checkpoint['completed']
+
+
+def test_resume_matches_a_clean_ingest(corpus_path, clean_ingest, capsys):
+    crashed = processor('resume')
+    crash_on_batch(crashed, 3)
+    assert not crashed.process_json_file(corpus_path)
+
+    resumed = processor('resume')
+    assert resumed.process_json_file(corpus_path)
+    assert f"Resuming {corpus_path} at game {2 * BATCH_SIZE}" in capsys.readouterr().out
+    assert resumed.ingest_checkpoints.find_one()['completed']
+    assert index_contents(resumed) == clean_ingest
+
+
+def test_resume_after_repeated_crashes(corpus_path, clean_ingest):
+    for batch in (2, 1):
+        crashed = processor('resume-twice')
+        crash_on_batch(crashed, batch)
+        assert not crashed.process_json_file(corpus_path)
+
+    resumed = processor('resume-twice')
+    assert resumed.process_json_file(corpus_path)
+    assert index_contents(resumed) == clean_ingest
+
+
+def test_another_file_starts_over(corpus_path, tmp_path, capsys):
+    crashed = processor('resume-other')
+    crash_on_batch(crashed, 3)
+    assert not crashed.process_json_file(corpus_path)
+
+    other_path = str(tmp_path / 'other.json')
+    write_corpus(other_path, 120, seed=2)
+    restarted = processor('resume-other')
+    assert restarted.process_json_file(other_path)
+    assert 'Resuming' not in capsys.readouterr().out
+
+    expected = processor('resume-other-clean')
+    assert expected.process_json_file(other_path)
+    assert index_contents(restarted) == index_contents(expected)
+
+
+def test_resume_can_be_turned_off(corpus_path, clean_ingest, capsys):
+    crashed = processor('resume-off')
+    crash_on_batch(crashed, 3)
+    assert not crashed.process_json_file(corpus_path)
+
+    restarted = processor('resume-off')
+    assert restarted.process_json_file(corpus_path, resume=False)
+    assert 'Resuming' not in capsys.readouterr().out
+    assert index_contents(restarted) == clean_ingest
@@ -0,0 +1,60 @@
+import re
+import time
+
+import profiling
+from profiling import Profile, stage
+
+# "frame;frame;frame count"
+COLLAPSED_LINE = re.compile(r'[^;\s][^;]*(;[^;]+)* \d+')
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_stage_is_a_shared_no_op_without_a_profile():
+    assert not profiling.active()
+    first, second = stage('tokenize'), stage('rank')
+    assert first is second is profiling._NO_STAGE
+    with stage('tokenize'):
+        pass
+
+
+def test_stages_are_timed_by_path():
+    profile = Profile(interval=0.001)
+    with profile.activate('search'):
+        assert profiling.active()
+        with stage('rank'):
+            busy(0.01)
+        with stage('fetch'):
+            with stage('decode'):
+                pass
+    assert not profiling.active()
+    assert set(profile.stage_times) == {'search', 'search;rank', 'search;fetch', 'search;fetch;decode'}
+    assert profile.stage_times['search;rank'] >= 0.01
+    assert profile.stage_summary()[0][0] == 'search'
+    assert 'rank;dur=' in profile.server_timing()
+
+
+def test_write_emits_collapsed_stacks(tmp_path):
+    profile = Profile(interval=0.001, cprofile=True)
+    with profile.activate('ingest'):
+        with stage('tokenize'):
+            busy(0.05)
+    collapsed, stages, stats = profile.write(str(tmp_path / 'out' / 'ingest'))
+
+    lines = open(collapsed, encoding='utf-8').read().splitlines()
+    assert lines
+    for line in lines:
+        assert COLLAPSED_LINE.fullmatch(line), line
+        assert line.startswith('ingest;')
+    # Stage names are the root frames; frames of the profiler itself are left out
+    assert any(line.startswith('ingest;tokenize;') and 'busy (test_profiling.py' in line for line in lines)
+    assert not any('(profiling.py:' in line for line in lines)
+
+    stage_lines = dict(line.rsplit(' ', 1) for line in open(stages, encoding='utf-8').read().splitlines())
+    assert set(stage_lines) == {'ingest', 'ingest;tokenize'}
+    assert int(stage_lines['ingest;tokenize']) >= 50000
+    assert stats.endswith('.prof')
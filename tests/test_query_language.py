@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+from index_snapshot import FIELD_BITS
+from query_language import ALL_FIELDS, BooleanQuery, QueryEvaluator, TermQuery, parse_query, query_terms
+
+
+def shape(node):
+    """A query tree as plain values: (term, fields) leaves, dicts of the non-empty clause lists"""
+    if isinstance(node, TermQuery):
+        return node.term, node.fields
+    return {name: [shape(child) for child in getattr(node, name)]
+            for name in ('must', 'should', 'must_not') if getattr(node, name)}
+
+
+def test_plain_query_is_an_or_over_terms():
+    assert shape(parse_query('Witcher  RPG')) == {'should': [('witcher', ALL_FIELDS), ('rpg', ALL_FIELDS)]}
+    assert shape(parse_query('witcher')) == ('witcher', ALL_FIELDS)
+
+
+def test_lower_case_operators_are_terms():
+    assert shape(parse_query('dark and souls')) == {
+        'should': [('dark', ALL_FIELDS), ('and', ALL_FIELDS), ('souls', ALL_FIELDS)]
+    }
+
+
+def test_field_restriction():
+    assert shape(parse_query('name:witcher')) == ('witcher', FIELD_BITS['name'])
+    assert shape(parse_query('Platform:PC')) == ('pc', FIELD_BITS['platform'])
+    # Not a posting field: the whole word is the term
+    assert shape(parse_query('foo:bar')) == ('foo:bar', ALL_FIELDS)
+
+
+def test_phrase_needs_every_word_in_the_field():
+    assert shape(parse_query('tag:"open world"')) == {
+        'must': [('open', FIELD_BITS['tag']), ('world', FIELD_BITS['tag'])]
+    }
+    assert shape(parse_query('"witcher"')) == ('witcher', ALL_FIELDS)
+
+
+def test_required_and_excluded_clauses():
+    assert shape(parse_query('+souls -platform:android')) == {
+        'must': [('souls', ALL_FIELDS)], 'must_not': [('android', FIELD_BITS['platform'])]
+    }
+
+
+def test_boolean_operators_and_groups():
+    assert shape(parse_query('rpg AND (dark OR souls) NOT remaster')) == {
+        'should': [{'must': [('rpg', ALL_FIELDS), {'should': [('dark', ALL_FIELDS), ('souls', ALL_FIELDS)]}]}],
+        'must_not': [('remaster', ALL_FIELDS)]
+    }
+    assert shape(parse_query('dark AND NOT souls')) == {
+        'must': [('dark', ALL_FIELDS)], 'must_not': [('souls', ALL_FIELDS)]
+    }
+
+
+@pytest.mark.parametrize('text', ['witcher)', 'OR witcher', 'witcher AND', '(witcher', '((', ')', '"unclosed', '+', ''])
+def test_malformed_queries_parse(text):
+    node = parse_query(text)
+    assert isinstance(node, (TermQuery, BooleanQuery))
+    if 'witcher' in text:
+        assert query_terms(node) == ['witcher']
+
+
+def test_query_terms():
+    node = parse_query('rpg AND (dark OR souls) NOT remaster')
+    assert query_terms(node) == ['rpg', 'dark', 'souls']
+    assert query_terms(node, positive=False) == ['rpg', 'dark', 'souls', 'remaster']
+
+
+# term -> (doc ids, scores, FIELD_BITS masks)
+POSTINGS = {
+    'dark': ([1, 2, 3, 5], [1.0, 1.0, 1.0, 1.0], [FIELD_BITS['name'], FIELD_BITS['tag'], FIELD_BITS['name'], 3]),
+    'souls': ([2, 3, 4], [2.0, 2.0, 2.0], [FIELD_BITS['name']] * 3),
+    'remaster': ([3], [0.5], [FIELD_BITS['description']])
+}
+
+
+def postings(term):
+    docs, scores, fields = POSTINGS.get(term, ([], [], []))
+    return np.array(docs, dtype=np.uint32), np.array(scores), np.array(fields, dtype=np.uint8)
+
+
+def evaluate(text):
+    result = QueryEvaluator(postings).evaluate(parse_query(text))
+    return dict(zip(result.docs.tolist(), result.scores.tolist()))
+
+
+def test_or_scores_every_matched_term():
+    assert evaluate('dark souls') == {1: 1.0, 2: 3.0, 3: 3.0, 4: 2.0, 5: 1.0}
+    assert evaluate('dark unknown') == {1: 1.0, 2: 1.0, 3: 1.0, 5: 1.0}
+
+
+def test_required_terms_intersect():
+    assert evaluate('+dark +souls') == {2: 3.0, 3: 3.0}
+    assert evaluate('dark AND souls') == {2: 3.0, 3: 3.0}
+    # Optional clauses beside required ones only add to the score
+    assert evaluate('+souls dark') == {2: 3.0, 3: 3.0, 4: 2.0}
+    assert evaluate('+dark +unknown') == {}
+
+
+def test_excluded_terms_are_subtracted():
+    assert evaluate('dark -remaster') == {1: 1.0, 2: 1.0, 5: 1.0}
+    assert evaluate('dark NOT souls') == {1: 1.0, 5: 1.0}
+    # Nothing to score, so nothing matches
+    assert evaluate('-dark') == {}
+
+
+def test_field_restricted_terms_match_their_field():
+    assert evaluate('name:dark') == {1: 1.0, 3: 1.0, 5: 1.0}
+    assert evaluate('tag:dark') == {2: 1.0}
+    assert evaluate('description:dark') == {5: 1.0}
+    # A term scores once per game, whatever fields it matched in
+    assert evaluate('name:dark tag:dark') == {1: 1.0, 2: 1.0, 3: 1.0, 5: 1.0}
+
+
+def test_matched_terms():
+    result = QueryEvaluator(postings).evaluate(parse_query('dark souls'))
+    matched = {doc: result.matched_terms(i) for i, doc in enumerate(result.docs.tolist())}
+    assert matched == {1: ['dark'], 2: ['dark', 'souls'], 3: ['dark', 'souls'], 4: ['souls'], 5: ['dark']}
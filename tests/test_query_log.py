@@ -0,0 +1,89 @@
+import random
+import time
+
+import pytest
+
+from query_log import QueryLog, normalize_query, read_query_log
+from replay import diff_results, summarize
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / 'logs' / 'queries.log')
+
+
+def test_queries_are_normalized_like_coalesced_searches():
+    assert normalize_query('  dark   souls\t') == 'dark souls'
+    assert normalize_query('Dark AND souls') == 'Dark AND souls'
+
+
+def test_records_are_written_without_empty_fields(log_path):
+    log = QueryLog(log_path, sample_rate=1)
+    log.record(q='dark souls', platform=None, page=1, status=200)
+    log.close()
+    (record,) = read_query_log(log_path)
+    assert record.keys() == {'t', 'q', 'page', 'status'}
+    assert record['q'] == 'dark souls' and log.stats()['written'] == 1
+
+
+def test_sampling(log_path, monkeypatch):
+    always, never, some = QueryLog(log_path, 1), QueryLog(log_path, 0), QueryLog(log_path, 0.25)
+    monkeypatch.setattr(random, 'random', iter([0.1, 0.3, 0.24, 0.9, 0.0]).__next__)
+    assert [some.sample() for _ in range(4)] == [True, False, True, False]
+    assert always.sample() and not never.sample()
+    for log in (always, never, some):
+        log.close()
+
+
+def test_records_are_dropped_when_the_writer_falls_behind(log_path, monkeypatch):
+    # A writer that never drains the queue
+    monkeypatch.setattr(QueryLog, '_write', lambda self: None)
+    log = QueryLog(log_path, sample_rate=1, queue_size=2)
+    for i in range(5):
+        log.record(q=f'query {i}')
+    assert log.stats()['dropped'] == 3 and log.stats()['queued'] == 2
+
+
+def test_the_file_is_rotated_past_max_bytes(log_path):
+    log = QueryLog(log_path, sample_rate=1, max_bytes=100)
+    for i in range(5):
+        log.record(q=f'query {i}')
+        wait_for(lambda: log.written == i + 1 and log.records.empty())
+    log.close()
+
+    assert log.stats()['rotations'] == 1
+    rotated = [record['q'] for record in read_query_log(log_path + '.1')]
+    current = [record['q'] for record in read_query_log(log_path)]
+    assert len(rotated) >= 3
+    assert rotated + current == [f'query {i}' for i in range(5)]
+
+
+def outcome(*ids):
+    return list(ids), 200, 1.0
+
+
+def test_replay_diff_classifies_each_query():
+    records = [{'q': q} for q in ('same', 'reordered', 'different', 'failed')]
+    baseline = [outcome(1, 2, 3), outcome(1, 2, 3), outcome(1, 2, 3, 4), outcome(1)]
+    candidate = [outcome(1, 2, 3), outcome(3, 1, 2), outcome(1, 2, 5, 6), (None, 503, 1.0)]
+    diff = diff_results(records, baseline, candidate, k=10)
+
+    assert (diff['identical'], diff['reordered'], diff['different'], diff['failed']) == (1, 1, 1, 1)
+    # Top-k overlap is the Jaccard index of the two top-k sets
+    assert diff['mean_overlap'] == pytest.approx((1 + 1 + 2 / 6) / 3)
+    assert [entry['q'] for entry in diff['most_changed']] == ['different', 'reordered']
+    assert diff['most_changed'][0]['hits'] == [4, 4]
+
+
+def test_replay_summary_counts_errors_apart():
+    summary = summarize([outcome(1, 2), outcome(1), (None, 429, 3.0), (None, 'URLError', 9.0)], wall_s=2.0)
+    assert summary['requests'] == 4 and summary['throughput_qps'] == 1.0
+    assert summary['errors'] == {'429': 1, 'URLError': 1}
+    assert summary['avg_hits'] == 1.5 and summary['latency']['count'] == 2
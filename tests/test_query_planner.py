@@ -0,0 +1,72 @@
+from query_language import TermQuery, query_terms
+from query_planner import QueryPlanner
+
+STOP_WORDS = {'the', 'of', 'a'}
+COMMON_TERMS = {'game', 'pc'}
+
+
+def planner(**kwargs):
+    return QueryPlanner(STOP_WORDS, COMMON_TERMS, **kwargs)
+
+
+def terms(plan):
+    return query_terms(plan.query, positive=False) if plan.query is not None else []
+
+
+def test_stopwords_are_dropped():
+    plan = planner().plan('the witcher of rivia')
+    assert terms(plan) == ['witcher', 'rivia']
+    assert sorted(plan.dropped) == ['of', 'the']
+
+
+def test_stopword_only_query_is_empty():
+    plan = planner().plan('the of a')
+    assert plan.empty
+    assert plan.terms == []
+
+
+def test_common_optional_terms_are_dropped_beside_selective_ones():
+    plan = planner().plan('dragon game pc')
+    assert isinstance(plan.query, TermQuery) and plan.query.term == 'dragon'
+    assert sorted(plan.dropped) == ['game', 'pc']
+
+
+def test_query_of_only_common_terms_is_kept():
+    plan = planner().plan('game pc')
+    assert terms(plan) == ['game', 'pc']
+    assert plan.dropped == []
+
+
+def test_required_common_terms_are_kept():
+    assert terms(planner().plan('+game dragon')) == ['game', 'dragon']
+    assert terms(planner().plan('game AND dragon')) == ['game', 'dragon']
+    assert terms(planner().plan('+(game OR pc) dragon')) == ['game', 'pc', 'dragon']
+
+
+def test_field_restricted_common_terms_are_kept():
+    assert terms(planner().plan('name:game dragon')) == ['game', 'dragon']
+
+
+def test_excluded_terms_are_kept():
+    plan = planner().plan('dragon -game')
+    assert terms(plan) == ['dragon', 'game']
+    assert plan.dropped == []
+
+
+def test_plans_are_cached_per_normalized_query():
+    queries = planner()
+    assert queries.plan('dark  souls ') is queries.plan('dark souls')
+    assert queries.plans.stats()['hits'] == 1
+
+
+def test_scopes_share_a_cache_without_mixing_plans():
+    first = QueryPlanner(STOP_WORDS, COMMON_TERMS, scope=('pc', 1))
+    second = QueryPlanner(STOP_WORDS, (), plans=first.plans, scope=('console', 1))
+    assert terms(first.plan('dragon game')) == ['dragon']
+    assert terms(second.plan('dragon game')) == ['dragon', 'game']
+
+
+def test_plan_with_other_common_terms():
+    queries = planner()
+    assert terms(queries.plan_with('dragon game', {'dragon'})) == ['game']
+    assert len(queries.plans) == 0
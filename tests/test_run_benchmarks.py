@@ -0,0 +1,27 @@
+from catalogs import CatalogNamespace
+from run_benchmarks import collection_size
+
+
+class Database:
+    """A database answering collStats the way mongod does"""
+
+    def __init__(self):
+        self.commands = []
+
+    def command(self, name, collection):
+        self.commands.append((name, collection))
+        return {'count': 3, 'size': 300, 'storageSize': 100, 'totalIndexSize': 50}
+
+
+def test_collection_size_asks_the_server_for_the_versioned_collection():
+    database = Database()
+    size = collection_size(CatalogNamespace(database, 'pc', 3), 'games')
+    assert database.commands == [('collStats', 'pc.v3.games')]
+    assert size == {'documents': 3, 'data_bytes': 300, 'storage_bytes': 100, 'index_bytes': 50}
+
+
+def test_collection_size_measures_documents_on_mongomock(ingest):
+    processor = ingest('default')
+    size = collection_size(processor.db, 'games')
+    assert size['documents'] == processor.db.games.count_documents({})
+    assert size['data_bytes'] > 0 and size['storage_bytes'] is None
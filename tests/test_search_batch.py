@@ -0,0 +1,100 @@
+import asyncio
+
+import httpx
+import pytest
+
+from index_snapshot import IndexSnapshot
+from synthetic import generate_queries
+
+CATALOG = 'batches'
+
+
+@pytest.fixture(scope='module')
+def engines(ingest, tmp_path_factory):
+    """(MongoDB engine, snapshot engine) over the same catalog version"""
+    import api
+    processor = ingest(CATALOG)
+    path = str(tmp_path_factory.mktemp('batches') / 'index.snap')
+    processor.export_snapshot(path)
+    snapshot = IndexSnapshot(path)
+    # Exact scoring, so both paths rank alike
+    yield api.SearchEngine(database=processor.db), api.SearchEngine(database=processor.db, snapshot=snapshot,
+                                                                    impact_budget=0)
+    snapshot.close()
+
+
+def batch(count, paged=True):
+    """SearchRequests mixing filters, sorts and pages; the same query recurs with other pages"""
+    import api
+    requests = []
+    for i, query in enumerate(generate_queries(count)):
+        page = (i % 3 or None) if paged else None
+        requests.append(api.SearchRequest(**query, page=page, page_size=3 + i % 5))
+        if paged and i % 4 == 0:
+            requests.append(api.SearchRequest(**query, page=2, page_size=2))
+    return requests
+
+
+def single(engine, request):
+    return engine.run_search(request.q, request.platform, request.genre, request.min_rating,
+                             request.sort_by, request.page, request.page_size)
+
+
+def ranked(results):
+    return [(result.id, result.relevance_score) for result in results]
+
+
+@pytest.mark.parametrize('path', ['mongodb', 'snapshot'])
+def test_batch_matches_searches_run_one_by_one(engines, path):
+    engine = engines[path == 'snapshot']
+    requests = batch(20)
+    results = engine.run_search_batch(requests)
+    assert len(results) == len(requests)
+    for request, page in zip(requests, results):
+        assert ranked(page) == ranked(single(engine, request)), request
+    assert any(results)
+
+
+def test_batch_order_follows_the_requests(engines):
+    mongodb, _ = engines
+    requests = batch(20)
+    forward = mongodb.run_search_batch(requests)
+    backward = mongodb.run_search_batch(requests[::-1])
+    assert [ranked(page) for page in backward] == [ranked(page) for page in forward[::-1]]
+
+
+def test_snapshot_and_mongodb_batches_agree(engines):
+    mongodb, snapshot = engines
+    requests = batch(40, paged=False)
+    for request, expected, results in zip(requests, mongodb.run_search_batch(requests),
+                                          snapshot.run_search_batch(requests)):
+        assert sorted(result.id for result in results) == sorted(result.id for result in expected), request
+        assert sorted(result.relevance_score for result in results) == pytest.approx(
+            sorted(result.relevance_score for result in expected), rel=1e-5), request
+
+
+def post_batch(api, queries):
+    async def send():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.post('/search/batch', params={'catalog': CATALOG}, json={'queries': queries})
+    return asyncio.run(send())
+
+
+def test_api_batch_returns_one_page_per_query(engines):
+    import api
+    mongodb, _ = engines
+    requests = batch(10)
+    response = post_batch(api, [request.model_dump() for request in requests])
+    assert response.status_code == 200
+    assert [[game['id'] for game in page] for page in response.json()] == [
+        [result.id for result in single(mongodb, request)] for request in requests
+    ]
+
+
+def test_api_batch_size_is_capped(engines):
+    import api
+    query = {'q': 'dark'}
+    assert post_batch(api, [query] * api.MAX_BATCH_QUERIES).status_code == 200
+    assert post_batch(api, [query] * (api.MAX_BATCH_QUERIES + 1)).status_code == 422
+    assert post_batch(api, []).status_code == 422
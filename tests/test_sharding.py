@@ -0,0 +1,130 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from synthetic import generate_queries
+from sharding import MAX_SHARD_RESULTS, SHARD_SECRET_HEADER, HttpShard, ShardCoordinator, parse_shard, shard_of
+
+SHARDS = 2
+# Longest wait for a shard process to ingest its games and start serving
+SHARD_STARTUP_S = 120
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_serving(process, url):
+    started = time.monotonic()
+    while time.monotonic() - started < SHARD_STARTUP_S:
+        if process.poll() is not None:
+            raise RuntimeError(f"Shard process exited with {process.returncode}")
+        try:
+            with urllib.request.urlopen(url + '/catalogs/', timeout=1):
+                return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f"Shard at {url} did not start in {SHARD_STARTUP_S}s")
+
+
+@pytest.fixture(scope='module')
+def shard_urls(corpus_path):
+    """Base URLs of SHARDS API processes, each serving one shard of the corpus"""
+    server = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shard_server.py')
+    processes, urls = [], []
+    try:
+        for index in range(SHARDS):
+            port = free_port()
+            processes.append(subprocess.Popen([sys.executable, server, corpus_path, str(index), str(SHARDS), str(port)],
+                                              stdout=subprocess.DEVNULL))
+            urls.append(f"http://127.0.0.1:{port}")
+        for process, url in zip(processes, urls):
+            wait_until_serving(process, url)
+        yield urls
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+
+
+@pytest.fixture(scope='module')
+def coordinator(shard_urls):
+    import api
+    shards = [HttpShard(f"{url}/?catalog=default-{index}of{SHARDS}", os.environ['GAME_SHARD_SECRET'])
+              for index, url in enumerate(shard_urls)]
+    coordinator = ShardCoordinator(shards, api.shared_resources.stop_words, api.MAX_TERM_DF, timeout=10.0)
+    yield coordinator
+    coordinator.close()
+
+
+def post(url, body, headers=None):
+    request = urllib.request.Request(url, data=json.dumps(body).encode('utf-8'),
+                                     headers=dict({'Content-Type': 'application/json'}, **(headers or {})))
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_shard_of_spreads_games():
+    counts = [0] * 4
+    for game_id in range(4000):
+        counts[shard_of(game_id, 4)] += 1
+    assert min(counts) > 900
+    assert shard_of(1234, 4) == shard_of(1234, 4)
+
+
+def test_parse_shard():
+    assert parse_shard('2/4') == (2, 4)
+    for text in ('4/4', '-1/4', '2'):
+        with pytest.raises(ValueError):
+            parse_shard(text)
+
+
+def test_http_shards_match_single_index(ingest, coordinator):
+    import api
+    ingest('default')
+    engine = api.catalog_router.get('default')
+
+    hits = 0
+    for query in generate_queries(40):
+        args = (query['q'], query['platform'], query['genre'], query['min_rating'], query['sort_by'])
+        merged = coordinator.search(*args)
+        single = engine.run_search(*args)
+        hits += len(single)
+        # Games tied on the sort key may come in another order
+        assert sorted(result['id'] for result in merged) == sorted(result.id for result in single), query
+        assert [result['relevance_score'] for result in merged] == pytest.approx(
+            [result.relevance_score for result in single], rel=1e-5), query
+
+        if query['sort_by'] == 'relevance':
+            page = coordinator.search(*args, page=1, page_size=5)
+            assert [result['relevance_score'] for result in page] == pytest.approx(
+                [result.relevance_score for result in single[:5]], rel=1e-5), query
+    assert hits > 0
+
+
+def test_shard_endpoints_require_the_secret(shard_urls):
+    url = f"{shard_urls[0]}/shard/stats?catalog=default-0of{SHARDS}"
+    secret = os.environ['GAME_SHARD_SECRET']
+    assert post(url, {'terms': ['game']}) == 403
+    assert post(url, {'terms': ['game']}, {SHARD_SECRET_HEADER: 'wrong'}) == 403
+    assert post(url, {'terms': ['game']}, {SHARD_SECRET_HEADER: secret}) == 200
+
+
+def test_shard_search_limit_is_capped(shard_urls):
+    url = f"{shard_urls[0]}/shard/search?catalog=default-0of{SHARDS}"
+    headers = {SHARD_SECRET_HEADER: os.environ['GAME_SHARD_SECRET']}
+    body = {'q': 'game', 'total_docs': 100, 'document_frequency': {'game': 10}}
+    assert post(url, dict(body, limit=MAX_SHARD_RESULTS), headers) == 200
+    assert post(url, dict(body, limit=MAX_SHARD_RESULTS + 1), headers) == 422
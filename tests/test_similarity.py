@@ -0,0 +1,87 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+from scipy import sparse
+
+from similarity import NO_NEIGHBOUR, build_game_vectors, top_neighbours
+
+
+def vectors(*games, term_count=6):
+    """L2-normalized vectors of games given as {term id: weight}"""
+    rows, cols, weights = [], [], []
+    for doc, terms in enumerate(games):
+        for term, weight in terms.items():
+            rows.append(doc)
+            cols.append(term)
+            weights.append(weight)
+    return build_game_vectors(rows, cols, weights, len(games), term_count, max_df=1.0)
+
+
+GAMES = [
+    {0: 1.0, 1: 1.0},   # 0
+    {0: 1.0, 1: 1.0},   # 1: same as 0
+    {0: 1.0, 2: 1.0},   # 2: half like 0 and 1
+    {3: 1.0},           # 3: like nothing else
+    {0: 1.0, 1: 1.0},   # 4: same as 0 and 1
+]
+
+
+def test_rows_are_normalized_and_common_terms_dropped():
+    rows, cols, weights = [0, 0, 1, 2], [0, 1, 0, 0], [3.0, 4.0, 1.0, 1.0]
+    normalized = build_game_vectors(rows, cols, weights, 3, 2, max_df=1.0).toarray()
+    assert normalized[0].tolist() == pytest.approx([0.6, 0.8])
+    # Term 0 is in every game; without it game 1 and 2 are empty
+    dropped = build_game_vectors(rows, cols, weights, 3, 2, max_df=0.5).toarray()
+    assert dropped.tolist() == [[0.0, 1.0], [0.0, 0.0], [0.0, 0.0]]
+
+
+def test_a_game_is_not_its_own_neighbour():
+    neighbours, scores = top_neighbours(vectors(*GAMES), top_n=4)
+    for doc in range(len(GAMES)):
+        assert doc not in neighbours[doc].tolist()
+    assert scores[0, 0] == pytest.approx(1.0)
+
+
+def test_neighbours_are_best_first_with_lower_doc_ids_on_ties():
+    neighbours, scores = top_neighbours(vectors(*GAMES), top_n=3)
+    assert neighbours[0].tolist() == [1, 4, 2]
+    assert neighbours[2].tolist() == [0, 1, 4]
+    assert scores[0].tolist() == pytest.approx([1.0, 1.0, 0.5])
+    assert (np.diff(scores, axis=1) <= 0).all()
+
+
+def test_missing_neighbours_are_padded():
+    neighbours, scores = top_neighbours(vectors(*GAMES), top_n=5)
+    assert neighbours[3].tolist() == [NO_NEIGHBOUR] * 5
+    assert scores[3].tolist() == [0.0] * 5
+    # Only three other games share a term with game 2
+    assert neighbours[2, 3:].tolist() == [NO_NEIGHBOUR] * 2
+
+
+def test_blocks_do_not_change_the_result():
+    games = vectors(*GAMES)
+    whole = top_neighbours(games, top_n=3)
+    for block_size in (1, 2, 3):
+        neighbours, scores = top_neighbours(games, top_n=3, block_size=block_size)
+        assert np.array_equal(neighbours, whole[0]) and np.allclose(scores, whole[1])
+
+
+def test_empty_catalog():
+    neighbours, scores = top_neighbours(sparse.csr_matrix((0, 4), dtype=np.float32), top_n=3)
+    assert neighbours.shape == scores.shape == (0, 3)
+
+
+def test_similar_games_need_a_snapshot(ingest):
+    import api
+    processor = ingest('default')
+    game_id = processor.db.games.find_one()['game_id']
+
+    async def send():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.get(f'/game/{game_id}/similar')
+
+    response = asyncio.run(send())
+    assert response.status_code == 503
@@ -0,0 +1,74 @@
+import asyncio
+
+from admission import SingleFlight
+
+
+def test_single_flight_shares_one_execution():
+    calls = []
+
+    async def search():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def scenario():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.run('q', search) for _ in range(5)))
+        # Once the first finishes, the same key runs again
+        results.append(await flights.run('q', search))
+        return results, flights.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == [1, 1, 1, 1, 1, 2]
+    assert stats['executions'] == 2 and stats['coalesced'] == 4 and stats['in_flight'] == 0
+
+
+def test_single_flight_survives_a_cancelled_caller():
+    async def search():
+        await asyncio.sleep(0.02)
+        return 'done'
+
+    async def scenario():
+        flights = SingleFlight()
+        first = asyncio.ensure_future(flights.run('q', search))
+        second = asyncio.ensure_future(flights.run('q', search))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == 'done'
+
+
+def test_single_flight_shares_a_failure_then_runs_again():
+    attempts = []
+
+    async def search():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise ConnectionError('mongod went away')
+        return 'done'
+
+    async def scenario():
+        flights = SingleFlight()
+        failed = await asyncio.gather(*(flights.run('q', search) for _ in range(3)), return_exceptions=True)
+        return failed, await flights.run('q', search), flights.stats()
+
+    failed, retried, stats = asyncio.run(scenario())
+    assert all(isinstance(result, ConnectionError) for result in failed)
+    assert retried == 'done'
+    assert stats['executions'] == 2 and stats['coalesced'] == 2 and stats['in_flight'] == 0
+
+
+def test_single_flight_keys_run_apart():
+    async def search():
+        await asyncio.sleep(0.01)
+        return 'done'
+
+    async def scenario():
+        flights = SingleFlight()
+        await asyncio.gather(flights.run('dark', search), flights.run('souls', search))
+        return flights.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['executions'] == 2 and stats['coalesced'] == 0 and stats['coalesced_ratio'] == 0.0